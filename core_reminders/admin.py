@@ -1,36 +1,123 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.conf import settings
-from .models import Customer, Loan, Reminder
+from .models import Customer, Loan, Reminder, RenderCacheEntry, ReminderRun, StoredVideo, TranslatedTemplate
+from .utils import video_storage
 import os
 
+# Below this many rows an exact COUNT(*) is cheap enough.
+ESTIMATE_COUNTS_ABOVE = 100_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the planner's row estimate instead of COUNT(*) for unfiltered
+    changelists on PostgreSQL, where counting a large table means scanning it.
+    Filtered lists, and other databases, still get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [query.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > ESTIMATE_COUNTS_ABOVE:
+                return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) Django runs for "x of y selected".
+    show_full_result_count = False
+
+
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
-    pass
+class CustomerAdmin(LargeTableAdmin):
+    list_display = ('name', 'whatsapp_number', 'preferred_language')
+    # Exact matches only, so searches stay on the unique index.
+    search_fields = ('whatsapp_number__exact',)
+
 
 @admin.register(Loan)
-class LoanAdmin(admin.ModelAdmin):
-    pass
+class LoanAdmin(LargeTableAdmin):
+    list_display = ('loan_number', 'customer', 'emi_amount', 'due_date', 'is_active', 'nach_active', 'bounce_count')
+    list_select_related = ('customer',)
+    list_filter = ('is_active', 'nach_active')
+    # Owned by event detection; a stale change form would rewind it.
+    readonly_fields = ('bounces_reminded',)
+    date_hierarchy = 'due_date'
+    search_fields = ('loan_number__exact', 'customer__whatsapp_number__exact')
+    raw_id_fields = ('customer',)
+
+
+def video_src(video_url):
+    if video_url.startswith((settings.MEDIA_URL, video_storage.get_storage().url(''), 'http://', 'https://')):
+        return video_url
+    # Older rows hold a local filesystem path.
+    if video_url.startswith('/') or video_url.startswith('C:'):
+        filename = os.path.basename(video_url)
+        return f"{settings.MEDIA_URL}reminder_videos/{filename}"
+    return video_url
+
 
-class ReminderAdmin(admin.ModelAdmin):
-    list_display = ('customer', 'loan', 'event_type', 'status', 'sent_at', 'video_preview')
+class ReminderAdmin(LargeTableAdmin):
+    # The changelist links to each video; only the change page embeds a player,
+    # and that one fetches nothing until it is played.
+    list_display = ('customer', 'loan', 'event_type', 'status', 'delivery_status', 'sent_at', 'video_link')
+    list_select_related = ('customer', 'loan__customer')
+    list_filter = ('status', 'delivery_status', 'event_type')
+    date_hierarchy = 'sent_at'
+    search_fields = ('loan__loan_number__exact', 'customer__whatsapp_number__exact', 'message_sid__exact')
+    raw_id_fields = ('customer', 'loan')
     readonly_fields = ('video_preview',)
 
+    def video_link(self, obj):
+        if obj.video_url:
+            return format_html('<a href="{}" target="_blank" rel="noopener">Play</a>', video_src(obj.video_url))
+        return '-'
+
+    video_link.short_description = 'Video'
+
     def video_preview(self, obj):
         if obj.video_url:
-            if obj.video_url.startswith('/') or obj.video_url.startswith('C:') or obj.video_url.startswith('/home'):
-                filename = os.path.basename(obj.video_url)
-                video_url = f"{settings.MEDIA_URL}reminder_videos/{filename}"
-            else:
-                video_url = obj.video_url
-            
             return format_html(
                 '<video width="480" height="240" controls preload="none">'
                 '<source src="{}" type="video/mp4"></video>',
-                video_url
+                video_src(obj.video_url)
             )
         return "Video not available"
 
     video_preview.short_description = 'Video'
 
-admin.site.register(Reminder, ReminderAdmin)
\ No newline at end of file
+admin.site.register(Reminder, ReminderAdmin)
+
+
+@admin.register(RenderCacheEntry)
+class RenderCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'filename', 'size_bytes', 'hits', 'last_used_at')
+
+
+@admin.register(StoredVideo)
+class StoredVideoAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size_bytes', 'created_at', 'archived_at')
+    search_fields = ('=sha256',)
+    date_hierarchy = 'created_at'
+
+
+@admin.register(TranslatedTemplate)
+class TranslatedTemplateAdmin(admin.ModelAdmin):
+    list_display = ('event_type', 'language', 'created_at')
+    list_filter = ('language', 'event_type')
+
+
+@admin.register(ReminderRun)
+class ReminderRunAdmin(admin.ModelAdmin):
+    list_display = ('command', 'host', 'started_at', 'finished_at', 'outcomes')
+    list_filter = ('command',)
+    readonly_fields = ('command', 'host', 'started_at', 'updated_at', 'finished_at', 'outcomes', 'stages', 'errors')
@@ -0,0 +1,242 @@
+import json
+import logging
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from core_reminders.models import Customer, Loan, Reminder, RenderCacheEntry
+from core_reminders.providers.fake import FakeTwilioServer
+from core_reminders.utils import metrics, throttle
+from core_reminders.utils.dispatcher import release_scheduled
+from core_reminders.utils.video_poller import poll_once
+
+
+SEED_BATCH_SIZE = 5000
+LANGUAGES = ["en", "Hindi", "en", "Tamil"]
+
+
+class QueryCounter:
+    """execute_wrapper that counts queries on every connection it is attached to, from any thread."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def attach(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds synthetic customers and loans at several scales in a throwaway database, runs '
+        'send_reminders against the fake providers and reports timings as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,10000,100000', help='Comma-separated loan counts.')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--no-wait', action='store_true', help='Submit renders, then drain them with the poller.')
+        parser.add_argument('--async', action='store_true', dest='use_async', help='Use the event-loop runner; --workers is loans in flight.')
+        parser.add_argument('--latency-ms', type=float, default=0, help='Simulated latency of every fake provider call.')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of fake provider calls that fail.')
+        parser.add_argument(
+            '--unavailable-rate', type=float, default=0.0,
+            help='Share of fake provider calls that fail like an outage (429/5xx), exercising the circuit breakers.',
+        )
+        parser.add_argument('--video-bytes', type=int, default=1024, help='Size of each fake downloaded video.')
+        parser.add_argument(
+            '--twilio', action='store_true',
+            help='Send through TwilioMessagingProvider against a local fake Twilio server instead of the in-process fake.',
+        )
+        parser.add_argument('--senders', type=int, default=1, help='Sender numbers to spread WhatsApp sends over (with --twilio).')
+        parser.add_argument(
+            '--sender-rate', type=int, default=20,
+            help='Messages per second each sender may send; the fake Twilio server answers 429 above it.',
+        )
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+        parser.add_argument('--log-level', default='WARNING', help='Pipeline log level during the run; INFO logs every call.')
+
+    def handle(self, *args, **options):
+        scales = [int(s) for s in options['scales'].split(',') if s.strip()]
+        logging.getLogger().setLevel(options['log_level'].upper())
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = [self.run_scale(n, options) for n in scales]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            "benchmark": "send_reminders",
+            "created_at": datetime.now(dt_timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "options": {
+                key: options[key]
+                for key in (
+                    'workers', 'use_async', 'no_wait', 'latency_ms', 'failure_rate', 'unavailable_rate', 'video_bytes',
+                    'twilio', 'senders', 'sender_rate',
+                )
+            },
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def providers(self, options, twilio_url=None):
+        latency = options['latency_ms'] / 1000
+        common = {
+            "latency": (latency, latency),
+            "failure_rate": options['failure_rate'],
+            "unavailable_rate": options['unavailable_rate'],
+            "seed": 0,
+        }
+        return {
+            "translate": {"class": "core_reminders.providers.fake.FakeTranslationProvider", "options": common},
+            "voice": {"class": "core_reminders.providers.fake.FakeVoiceProvider", "options": common},
+            "video": {
+                "class": "core_reminders.providers.fake.FakeVideoProvider",
+                "options": {**common, "video_bytes": options['video_bytes']},
+            },
+            "messaging": (
+                {
+                    "class": "core_reminders.providers.twilio.TwilioMessagingProvider",
+                    "options": {"account_sid": "ACbench", "auth_token": "bench", "api_url": twilio_url},
+                }
+                if twilio_url
+                else {"class": "core_reminders.providers.fake.FakeMessagingProvider", "options": common}
+            ),
+        }
+
+    def seed(self, n):
+        Reminder.objects.all().delete()
+        Loan.objects.all().delete()
+        Customer.objects.all().delete()
+        RenderCacheEntry.objects.all().delete()
+
+        due = date.today() + timedelta(days=3)
+        for start in range(0, n, SEED_BATCH_SIZE):
+            stop = min(n, start + SEED_BATCH_SIZE)
+            customers = Customer.objects.bulk_create([
+                Customer(
+                    name=f"Bench Customer {i}",
+                    whatsapp_number=f"+91{i:010d}",
+                    preferred_language=LANGUAGES[i % len(LANGUAGES)],
+                )
+                for i in range(start, stop)
+            ])
+            Loan.objects.bulk_create([
+                Loan(
+                    customer=customer,
+                    loan_number=f"BENCH-{i:08d}",
+                    emi_amount=1000 + i % 5000,
+                    due_date=due,
+                )
+                for i, customer in zip(range(start, stop), customers)
+            ])
+
+    def run_scale(self, n, options):
+        self.stderr.write(f"Seeding {n} loans...")
+        self.seed(n)
+        metrics.reset()
+
+        counter = QueryCounter()
+        connection.execute_wrappers.append(counter)
+        connection_created.connect(counter.attach)
+        media_root = tempfile.mkdtemp(prefix="reminder_bench_")
+        twilio = None
+        senders = []
+        if options['twilio']:
+            latency = options['latency_ms'] / 1000
+            twilio = FakeTwilioServer(
+                sender_rate=options['sender_rate'], latency=(latency, latency),
+                failure_rate=options['failure_rate'], unavailable_rate=options['unavailable_rate'], seed=0,
+            )
+            senders = [f"+1415555{i:04d}" for i in range(options['senders'])]
+        dispatch = {"senders": senders, "sender_rate": options['sender_rate']}
+        try:
+            with (
+                twilio or nullcontext(),
+                override_settings(
+                    REMINDER_PROVIDERS=self.providers(options, twilio and twilio.url),
+                    REMINDER_DISPATCH=dispatch,
+                    MEDIA_ROOT=media_root,
+                ),
+            ):
+                self.stderr.write(f"Running send_reminders for {n} loans...")
+                start = time.perf_counter()
+                call_command(
+                    'send_reminders',
+                    workers=options['workers'],
+                    use_async=options['use_async'],
+                    no_wait=options['no_wait'],
+                    stdout=StringIO(),
+                )
+                if options['no_wait']:
+                    while waits := [w for w in (poll_once(), release_scheduled()) if w is not None]:
+                        time.sleep(min(waits))
+                wall = time.perf_counter() - start
+                # Read before override_settings exits, which reloads the providers.
+                provider_counters = throttle.counters()
+        finally:
+            connection_created.disconnect(counter.attach)
+            connection.execute_wrappers.remove(counter)
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        statuses = Counter(Reminder.objects.values_list('status', flat=True))
+        return {
+            "loans": n,
+            "wall_seconds": round(wall, 3),
+            "loans_per_second": round(n / wall, 2) if wall else None,
+            "db_queries": counter.count,
+            "db_queries_per_loan": round(counter.count / n, 2) if n else None,
+            "peak_rss_mb": round(peak_rss_bytes() / 1024 ** 2, 1),
+            "statuses": dict(statuses),
+            "stages": metrics.summaries(),
+            "providers": provider_counters,
+            "twilio": {"sent": dict(twilio.sent), "throttled": dict(twilio.throttled)} if twilio else None,
+        }
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def git_revision():
+    try:
+        out = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
@@ -0,0 +1,56 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from core_reminders.utils import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Upserts customers and loans from a CSV or Parquet loan book (Parquet needs pyarrow). '
+        'Customers are matched on whatsapp_number, loans on loan_number.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='.csv, or .parquet / .pq')
+        parser.add_argument('--chunk-size', type=int, default=importer.DEFAULT_CHUNK_SIZE, help='Rows per transaction.')
+        parser.add_argument('--rejects', help='Write rejected rows to this CSV, with the reason in a "reject_reason" column.')
+        parser.add_argument('--progress-every', type=int, default=50, help='Print progress every N chunks (0 for none).')
+
+    def handle(self, *args, **options):
+        rejects_file = writer = None
+
+        def on_reject(row, reason):
+            nonlocal writer
+            if rejects_file is None:
+                return
+            if writer is None:
+                writer = csv.DictWriter(rejects_file, fieldnames=[*row, 'reject_reason'], extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow({**row, 'reject_reason': reason})
+
+        chunks = 0
+
+        def on_chunk(stats):
+            nonlocal chunks
+            chunks += 1
+            if options['progress_every'] and chunks % options['progress_every'] == 0:
+                self.stderr.write(f'{stats.rows} rows, {stats.rows_per_second:.0f} rows/s')
+
+        try:
+            if options['rejects']:
+                rejects_file = open(options['rejects'], 'w', newline='', encoding='utf-8')
+            stats = importer.import_file(
+                options['path'], chunk_size=max(1, options['chunk_size']), on_reject=on_reject, on_chunk=on_chunk,
+            )
+        except (OSError, ImportError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+
+        rejected = sum(stats.rejected.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.rows - rejected} of {stats.rows} rows in {stats.seconds:.1f}s '
+            f'({stats.rows_per_second:.0f} rows/s): {stats.customers} customer and {stats.loans} loan upserts.'
+        ))
+        if rejected:
+            self.stdout.write(self.style.WARNING(f'Rejected {rejected} rows: {dict(stats.rejected.most_common())}'))
@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand
+from core_reminders.utils.downloads import DownloadPool
+from core_reminders.utils.dispatcher import release_scheduled
+from core_reminders.utils.runs import RunRecorder
+from core_reminders.utils.video_poller import poll_once, requeue_interrupted_downloads
+
+class Command(BaseCommand):
+    help = (
+        'Tracks every in-flight HeyGen render from one loop and sends the videos as they finish, '
+        'or when their send slot comes round.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single tick and exit.')
+        parser.add_argument('--exit-when-idle', action='store_true', help='Stop once no renders are in flight and no sends are waiting for a slot.')
+        parser.add_argument('--timeout', type=int, default=480, help='Seconds before an unfinished render is marked FAILED.')
+        parser.add_argument('--idle-sleep', type=float, default=30, help='Seconds to sleep when nothing is in flight.')
+        parser.add_argument('--download-workers', type=int, help='Concurrent downloads (default VIDEO_DOWNLOAD_CONCURRENCY).')
+        parser.add_argument(
+            '--summary-interval', type=float, default=60,
+            help='Seconds between updates of this run\'s summary for the metrics endpoint.',
+        )
+
+    def handle(self, *args, **options):
+        requeue_interrupted_downloads()
+        # Leaving the block waits for downloads that are still running.
+        with RunRecorder('poll_videos') as run, DownloadPool(options['download_workers']) as downloads:
+            last_summary = time.monotonic()
+            while True:
+                waits = [
+                    poll_once(timeout=options['timeout'], downloads=downloads),
+                    release_scheduled(),
+                ]
+                waits = [w for w in waits if w is not None]
+                wait = min(waits) if waits else None
+                if time.monotonic() - last_summary >= options['summary_interval']:
+                    run.checkpoint()
+                    last_summary = time.monotonic()
+                if options['once']:
+                    return
+                if wait is None:
+                    if options['exit_when_idle']:
+                        self.stdout.write(self.style.SUCCESS('No renders in flight or sends waiting.'))
+                        return
+                    wait = options['idle_sleep']
+                time.sleep(max(1, wait))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from core_reminders.utils import video_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes (or archives) stored reminder videos older than the retention period '
+        'that no unsent or recently sent reminder still needs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help=f'Retention in days (default REMINDER_VIDEO_RETENTION_DAYS, {video_storage.DEFAULT_RETENTION_DAYS}).',
+        )
+        parser.add_argument('--archive', action='store_true', help='Move videos to the archive storage instead of deleting them.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed.')
+        parser.add_argument('--compact', action='store_true', help='Also adopt pre-sharding files and remove empty directories.')
+
+    def handle(self, *args, **options):
+        if options['compact']:
+            adopted, removed_dirs = video_storage.compact()
+            self.stdout.write(f'Adopted {adopted} unsharded videos, removed {removed_dirs} empty directories.')
+
+        count, size = video_storage.prune(days=options['days'], archive=options['archive'], dry_run=options['dry_run'])
+        verb = 'Would remove' if options['dry_run'] else ('Archived' if options['archive'] else 'Removed')
+        self.stdout.write(self.style.SUCCESS(f'{verb} {count} videos ({size / 1024 ** 2:.1f} MiB).'))
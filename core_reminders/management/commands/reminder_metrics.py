@@ -0,0 +1,52 @@
+import json
+from django.core.management.base import BaseCommand
+from core_reminders.models import ReminderRun
+from core_reminders.utils import prometheus
+
+
+class Command(BaseCommand):
+    help = 'Prints the metrics the /reminders/metrics/ endpoint serves, or summaries of recent runs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, help='Show the last N run summaries instead of Prometheus text.')
+        parser.add_argument('--command', dest='run_command', help='Only runs of this command (with --runs).')
+        parser.add_argument('--json', action='store_true', help='Run summaries as JSON (with --runs).')
+
+    def handle(self, *args, **options):
+        if not options['runs']:
+            self.stdout.write(prometheus.render(), ending='')
+            return
+
+        runs = ReminderRun.objects.order_by('-started_at')
+        if options['run_command']:
+            runs = runs.filter(command=options['run_command'])
+        runs = list(runs[:options['runs']])
+
+        if options['json']:
+            self.stdout.write(json.dumps([
+                {
+                    'id': run.id,
+                    'command': run.command,
+                    'host': run.host,
+                    'started_at': run.started_at.isoformat(),
+                    'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+                    'outcomes': run.outcomes,
+                    'stages': run.stages,
+                    'errors': run.errors,
+                }
+                for run in runs
+            ], indent=2))
+            return
+
+        for run in runs:
+            duration = (run.finished_at or run.updated_at) - run.started_at
+            state = 'finished' if run.finished_at else 'running'
+            self.stdout.write(f'#{run.id} {run.command} on {run.host}, {state} after {duration.total_seconds():.1f}s')
+            self.stdout.write(f'  outcomes: {run.outcomes}')
+            for stage, s in sorted(run.stages.items()):
+                self.stdout.write(
+                    f"  {stage:<10} n={s.get('count', 0):<7} p50={s.get('p50') or 0:.3f}s "
+                    f"p90={s.get('p90') or 0:.3f}s p99={s.get('p99') or 0:.3f}s"
+                )
+            if run.errors:
+                self.stdout.write(f'  errors: {run.errors}')
@@ -1,50 +1,107 @@
+import asyncio
+import logging
 from django.core.management.base import BaseCommand
-from core_reminders.models import Loan, Reminder
-from core_reminders.utils.reminder_utils import generate_script, generate_video, send_whatsapp_video
-from datetime import date, timedelta
+from django.utils import timezone
+from core_reminders.models import Reminder
+from core_reminders.utils import dispatcher, events, job_queue, metrics, scheduler, throttle, translations
+from core_reminders.utils.http import aclose_async_client
+from core_reminders.utils.pipeline import ReminderUpdates, aprocess_loan, process_loan, run_async, run_pool
+from core_reminders.utils.runs import RunRecorder
 
 class Command(BaseCommand):
-    def handle(self, *args, **options):        
-        due_date_threshold = date.today() + timedelta(days=3)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of loans processed concurrently. 1 keeps the old one-by-one behaviour.',
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='use_async',
+            help='Run loans as coroutines on one event loop; --workers is then the number of loans in flight.',
+        )
+        parser.add_argument(
+            '--no-wait',
+            action='store_true',
+            help='Only submit renders; poll_videos downloads and sends them when they finish.',
+        )
+        parser.add_argument(
+            '--enqueue-only',
+            action='store_true',
+            help='Queue reminders for loans that need one, but leave processing to other runs.',
+        )
+        parser.add_argument(
+            '--drain-only',
+            action='store_true',
+            help='Skip queueing and only work through reminders already queued (e.g. on extra hosts).',
+        )
 
-        upcoming_loans = Loan.objects.filter(
-            due_date=due_date_threshold,
-            is_active=True,
-            reminder__isnull=True 
+    def handle(self, *args, **options):
+        if not options['drain_only']:
+            # Today's share of everything due within the scheduling window, not just
+            # loans due in exactly three days (see core_reminders.utils.scheduler).
+            queued, plan = scheduler.queue_backlog()
+            self.stdout.write(f'Queued {queued} reminders.')
+            later = {str(day): n for day, n in plan.items() if day > timezone.localdate()}
+            if later:
+                self.stdout.write(f'Planned for later days: {later}')
+            # NACH and bounce reminders for loans changed since the last run
+            # (see core_reminders.utils.events); they go through the same queue.
+            for event_type, n in events.detect().items():
+                if n:
+                    self.stdout.write(f'Queued {n} {event_type} reminders.')
+            if options['enqueue_only']:
+                return
+
+        # One batched translation request per missing language instead of one per customer.
+        translations.prefetch(
+            Reminder.objects.filter(job_queue.claimable())
+            .values_list('customer__preferred_language', flat=True).distinct()
         )
 
-        for loan in upcoming_loans:
+        wait = not options['no_wait']
+        handler = lambda item: process_loan(item, wait=wait)
+        updates = ReminderUpdates()
+        # Finished videos are queued; this sends them in batches while the run goes on.
+        dispatch = dispatcher.DispatchStage()
+
+        def on_result(item, result):
+            reminder = item[1]
+            job_queue.release(reminder)
+            updates.add(reminder)
+            metrics.outcome(reminder.status)
+            self.report(result)
+            dispatch.tick(updates)
+
+        owner = job_queue.new_owner()
+        workers = max(1, options['workers'])
+        # Reminders are claimed a few per worker at a time under a lease, so several processes
+        # or hosts can drain the same queue, and a crashed run's work is picked up again.
+        work = job_queue.iter_claimed(owner, job_queue.claim_size(workers))
+        with RunRecorder('send_reminders'), job_queue.Heartbeat(owner):
             try:
-                reminder = Reminder.objects.create(
-                    customer=loan.customer,
-                    loan=loan,
-                    event_type='EMI_DUE',
-                    status='GENERATING'
-                )
-
-                script = generate_script(reminder.event_type, loan.customer, loan)
-                video_url = generate_video(script,customer=loan.customer)
-
-                if not video_url:
-                    reminder.status = 'FAILED'
-                    reminder.save()
-                    self.stdout.write(self.style.ERROR('Video generation failed.'))
-                    continue
-
-                whatsapp_sid = send_whatsapp_video(loan.customer.whatsapp_number, video_url)
-                
-                if whatsapp_sid:
-                    reminder.status = 'SENT'
-                    reminder.video_url = video_url
-                    reminder.save()
-                    self.stdout.write(self.style.SUCCESS(f'Successfully sent reminder for {loan.customer.name}!'))
+                if options['use_async']:
+                    asyncio.run(self.run_async(work, wait, workers, on_result))
+                elif workers == 1:
+                    for item in work:
+                        on_result(item, handler(item))
                 else:
-                    reminder.status = 'FAILED'
-                    reminder.save()
-                    self.stdout.write(self.style.ERROR(f'Failed to send WhatsApp message for {loan.customer.name}.'))
-
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'An error occurred for loan {loan.loan_number}: {e}'))
-                if 'reminder' in locals():
-                    reminder.status = 'FAILED'
-                    reminder.save()
\ No newline at end of file
+                    run_pool(work, handler, workers, on_result=on_result)
+                updates.flush()
+                dispatch.drain()
+            finally:
+                updates.flush()
+                logging.info(f"Provider counters: {throttle.counters()}")
+
+    async def run_async(self, work, wait, concurrency, on_result):
+        try:
+            await run_async(work, lambda item: aprocess_loan(item, wait=wait), concurrency, on_result=on_result)
+        finally:
+            await aclose_async_client()
+
+    def report(self, result):
+        ok, message = result
+        style = self.style.SUCCESS if ok else self.style.ERROR
+        self.stdout.write(style(message))
@@ -0,0 +1,52 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core_reminders.utils import webhooks
+from core_reminders.utils.http import get_session
+from core_reminders.utils.video_poller import in_flight
+
+
+class Command(BaseCommand):
+    help = (
+        'Posts signed HeyGen completion callbacks to a running server, as HeyGen would. '
+        'Without --video-id, one is sent for every render currently in flight.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000/reminders/webhooks/heygen/',
+            help='Webhook endpoint to call.',
+        )
+        parser.add_argument('--video-id', action='append', dest='video_ids', help='Render to report on; repeatable.')
+        parser.add_argument('--fail', action='store_true', help='Report the renders as failed instead of finished.')
+        parser.add_argument(
+            '--video-url',
+            default='fake://videos/{video_id}.mp4',
+            help='Download URL to report; {video_id} is filled in. The default suits FakeVideoProvider.',
+        )
+        parser.add_argument('--secret', help='Signing secret (default HEYGEN_WEBHOOK_SECRET).')
+
+    def handle(self, *args, **options):
+        secret = options['secret'] or getattr(settings, 'HEYGEN_WEBHOOK_SECRET', '')
+        if not secret:
+            raise CommandError('No signing secret: set HEYGEN_WEBHOOK_SECRET or pass --secret.')
+
+        video_ids = options['video_ids'] or list(in_flight().values_list('heygen_video_id', flat=True).distinct())
+        for video_id in video_ids:
+            if options['fail']:
+                event = {'event_type': webhooks.FAIL_EVENT, 'event_data': {'video_id': video_id, 'msg': 'simulated failure'}}
+            else:
+                event = {
+                    'event_type': webhooks.SUCCESS_EVENT,
+                    'event_data': {'video_id': video_id, 'url': options['video_url'].format(video_id=video_id)},
+                }
+            body = json.dumps(event).encode()
+            resp = get_session().post(
+                options['url'],
+                data=body,
+                headers={'Content-Type': 'application/json', webhooks.SIGNATURE_HEADER: webhooks.signature(body, secret)},
+                timeout=30,
+            )
+            style = self.style.SUCCESS if resp.status_code == 200 else self.style.ERROR
+            self.stdout.write(style(f'{video_id}: HTTP {resp.status_code} {resp.text}'))
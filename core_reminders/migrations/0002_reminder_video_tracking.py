@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminder",
+            name="heygen_video_id",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=100, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="next_poll_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="poll_attempts",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="submitted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
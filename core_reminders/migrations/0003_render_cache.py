@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0002_reminder_video_tracking"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RenderCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("filename", models.CharField(max_length=255)),
+                ("size_bytes", models.BigIntegerField(default=0)),
+                ("hits", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "last_used_at",
+                    models.DateTimeField(auto_now_add=True, db_index=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="render_key",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
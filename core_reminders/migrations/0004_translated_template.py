@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0003_render_cache"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TranslatedTemplate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("event_type", models.CharField(max_length=50)),
+                ("language", models.CharField(max_length=50)),
+                ("source_hash", models.CharField(max_length=64)),
+                ("text", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("event_type", "language", "source_hash"),
+                        name="unique_template_translation",
+                    )
+                ],
+            },
+        ),
+    ]
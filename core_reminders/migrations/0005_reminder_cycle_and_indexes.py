@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:37
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_reminder_due_date(apps, schema_editor):
+    # Existing reminders are attributed to their loan's current cycle.
+    Loan = apps.get_model("core_reminders", "Loan")
+    Reminder = apps.get_model("core_reminders", "Reminder")
+    Reminder.objects.filter(due_date__isnull=True).update(
+        due_date=Subquery(
+            Loan.objects.filter(pk=OuterRef("loan_id")).values("due_date")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0004_translated_template"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminder",
+            name="due_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_reminder_due_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(
+                fields=["due_date", "is_active"], name="loan_due_active_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["loan", "event_type", "status"],
+                name="reminder_loan_event_status_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="reminder",
+            constraint=models.UniqueConstraint(
+                fields=("loan", "event_type", "due_date"),
+                name="unique_reminder_per_cycle",
+            ),
+        ),
+    ]
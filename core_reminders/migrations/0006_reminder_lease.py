@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0005_reminder_cycle_and_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminder",
+            name="attempts",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="available_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="lease_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="lease_owner",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=100, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["status", "lease_expires_at"], name="reminder_status_lease_idx"
+            ),
+        ),
+    ]
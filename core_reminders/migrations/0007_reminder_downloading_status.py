@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0006_reminder_lease"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reminder",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("GENERATING", "Generating Video"),
+                    ("DOWNLOADING", "Downloading Video"),
+                    ("SENT", "Sent"),
+                    ("FAILED", "Failed"),
+                ],
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0007_reminder_downloading_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("command", models.CharField(max_length=50)),
+                ("host", models.CharField(max_length=255)),
+                ("started_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("outcomes", models.JSONField(default=dict)),
+                ("stages", models.JSONField(default=dict)),
+                ("errors", models.JSONField(default=dict)),
+            ],
+        ),
+    ]
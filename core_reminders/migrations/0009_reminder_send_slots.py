@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0008_reminder_run"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminder",
+            name="dispatched_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="send_after",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="reminder",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("GENERATING", "Generating Video"),
+                    ("DOWNLOADING", "Downloading Video"),
+                    ("SCHEDULED", "Waiting for Send Slot"),
+                    ("SENT", "Sent"),
+                    ("FAILED", "Failed"),
+                ],
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["status", "send_after"], name="reminder_status_send_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["dispatched_at"], name="reminder_dispatched_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0009_reminder_send_slots"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["event_type", "status"], name="reminder_event_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(fields=["sent_at"], name="reminder_sent_at_idx"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0010_reminder_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredVideo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("name", models.CharField(max_length=255)),
+                ("url", models.CharField(db_index=True, max_length=500)),
+                ("size_bytes", models.BigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("archived_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(fields=["video_url"], name="reminder_video_url_idx"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0011_stored_video"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reminder",
+            name="delivery_error",
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="delivery_status",
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="delivery_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="message_sid",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(fields=["message_sid"], name="reminder_message_sid_idx"),
+        ),
+    ]
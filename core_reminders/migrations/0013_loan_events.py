@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:28
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_bounces_reminded(apps, schema_editor):
+    # Bounces from before event detection existed don't get a reminder now.
+    Loan = apps.get_model("core_reminders", "Loan")
+    Loan.objects.update(bounces_reminded=F("bounce_count"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0012_reminder_delivery"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventCursor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("position", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="bounces_reminded",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(mark_existing_bounces_reminded, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="loan",
+            name="nach_active",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(fields=["updated_at", "id"], name="loan_updated_idx"),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_reminders", "0013_loan_events"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reminder",
+            index=models.Index(
+                fields=["delivery_status", "status"],
+                name="reminder_delivery_status_idx",
+            ),
+        ),
+    ]
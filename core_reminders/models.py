@@ -1,6 +1,7 @@
 # core_reminders/models.py
 
 from django.db import models
+from django.db.models import Exists, OuterRef
 
 class Customer(models.Model):
     name = models.CharField(max_length=255)
@@ -10,6 +11,21 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
 
+class LoanQuerySet(models.QuerySet):
+    def needing_reminder(self, event_type, due_date):
+        """Active loans due on due_date with no event_type reminder for that cycle yet."""
+        return self.needing_reminder_between(event_type, due_date, due_date)
+
+    def needing_reminder_between(self, event_type, first_due_date, last_due_date):
+        """Same as needing_reminder() for every due date from first_due_date to last_due_date inclusive."""
+        return self.filter(due_date__range=(first_due_date, last_due_date)).without_reminder(event_type)
+
+    def without_reminder(self, event_type):
+        """Active loans with no event_type reminder for their current cycle yet."""
+        already_reminded = Reminder.objects.filter(loan=OuterRef('pk'), event_type=event_type, due_date=OuterRef('due_date'))
+        return self.filter(is_active=True).filter(~Exists(already_reminded))
+
+
 class Loan(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loans')
     loan_number = models.CharField(max_length=100, unique=True)
@@ -17,6 +33,22 @@ class Loan(models.Model):
     due_date = models.DateField()
     is_active = models.BooleanField(default=True)
     bounce_count = models.IntegerField(default=0)
+    # Repaid by NACH auto-debit: also gets a NACH_REMINDER before each presentation.
+    nach_active = models.BooleanField(default=False)
+    # bounce_count when the last BOUNCE_REMINDER was queued (see core_reminders.utils.events).
+    bounces_reminded = models.IntegerField(default=0)
+    # High-water mark for incremental event detection; import_loans upserts set it too.
+    # QuerySet.update() doesn't, so bulk updates must pass updated_at=Now() themselves.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LoanQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # due_date leads: Django renders is_active=True as a bare column, which can't drive an index seek.
+            models.Index(fields=['due_date', 'is_active'], name='loan_due_active_idx'),
+            models.Index(fields=['updated_at', 'id'], name='loan_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Loan {self.loan_number} for {self.customer.name}"
@@ -25,6 +57,8 @@ class Reminder(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
         ('GENERATING', 'Generating Video'),
+        ('DOWNLOADING', 'Downloading Video'),
+        ('SCHEDULED', 'Waiting for Send Slot'),
         ('SENT', 'Sent'),
         ('FAILED', 'Failed'),
     ]
@@ -38,9 +72,132 @@ class Reminder(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE)
     event_type = models.CharField(max_length=50, choices=EVENT_CHOICES)
+    # The loan's due date this reminder is for; one reminder per loan, event and cycle.
+    due_date = models.DateField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     video_url = models.URLField(blank=True, null=True)
     sent_at = models.DateTimeField(auto_now_add=True)
-    
+
+    # In-flight HeyGen render, tracked by the poll_videos command.
+    heygen_video_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    submitted_at = models.DateTimeField(blank=True, null=True)
+    next_poll_at = models.DateTimeField(blank=True, null=True)
+    poll_attempts = models.IntegerField(default=0)
+    render_key = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+
+    # Work-queue lease (see core_reminders.utils.job_queue). A worker owns a reminder
+    # until lease_expires_at; heartbeats push that out while it is still working.
+    lease_owner = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(blank=True, null=True)
+
+    # Send slots (see core_reminders.utils.scheduler). A finished video is held as
+    # SCHEDULED until send_after and an open slot; dispatched_at is when it went out.
+    send_after = models.DateTimeField(blank=True, null=True)
+    dispatched_at = models.DateTimeField(blank=True, null=True)
+
+    # WhatsApp delivery (see core_reminders.utils.dispatcher). delivery_status follows
+    # the provider's status callbacks: queued, sent, delivered, read, undelivered or failed.
+    message_sid = models.CharField(max_length=64, blank=True, null=True)
+    delivery_status = models.CharField(max_length=20, blank=True, null=True)
+    delivery_error = models.CharField(max_length=32, blank=True, null=True)
+    delivery_updated_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'event_type', 'due_date'], name='unique_reminder_per_cycle'),
+        ]
+        indexes = [
+            models.Index(fields=['loan', 'event_type', 'status'], name='reminder_loan_event_status_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='reminder_status_lease_idx'),
+            models.Index(fields=['status', 'send_after'], name='reminder_status_send_idx'),
+            models.Index(fields=['dispatched_at'], name='reminder_dispatched_idx'),
+            # Admin changelist filters and date drill-down.
+            models.Index(fields=['event_type', 'status'], name='reminder_event_status_idx'),
+            models.Index(fields=['sent_at'], name='reminder_sent_at_idx'),
+            # Retention checks which reminders still point at a stored video.
+            models.Index(fields=['video_url'], name='reminder_video_url_idx'),
+            # Status callbacks look reminders up by message SID.
+            models.Index(fields=['message_sid'], name='reminder_message_sid_idx'),
+            # Admin changelist filter on delivery status.
+            models.Index(fields=['delivery_status', 'status'], name='reminder_delivery_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reminder for {self.customer.name} - {self.event_type} - {self.status}"
+
+
+class RenderCacheEntry(models.Model):
+    """A finished render in the reminder_videos storage, keyed by a hash of its inputs."""
+    key = models.CharField(max_length=64, unique=True)
+    # Storage name (see core_reminders.utils.video_storage).
+    filename = models.CharField(max_length=255)
+    size_bytes = models.BigIntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.key[:12]} -> {self.filename}"
+
+
+class StoredVideo(models.Model):
+    """One video file in the reminder_videos storage. Identical content is stored once."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    url = models.CharField(max_length=500, db_index=True)
+    size_bytes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set when prune_videos --archive moved the file to the archive storage.
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class EventCursor(models.Model):
+    """How far an incremental event detector has read Loan.updated_at (see core_reminders.utils.events)."""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class TranslatedTemplate(models.Model):
+    """A BASE_SCRIPTS template translated with its {placeholders} intact."""
+    event_type = models.CharField(max_length=50)
+    language = models.CharField(max_length=50)
+    # Hash of the English template + prompt version; editing either invalidates old rows.
+    source_hash = models.CharField(max_length=64)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event_type', 'language', 'source_hash'], name='unique_template_translation'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.language})"
+
+
+class ReminderRun(models.Model):
+    """Summary of one send_reminders / poll_videos run, so any process can report on it."""
+    command = models.CharField(max_length=50)
+    host = models.CharField(max_length=255)
+    started_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # {status: count} of reminders this run moved to a final or parked state.
+    outcomes = models.JSONField(default=dict)
+    # {stage: {count, mean, p50, p90, p99, max}} in seconds.
+    stages = models.JSONField(default=dict)
+    # {"provider/reason": count}
+    errors = models.JSONField(default=dict)
+
     def __str__(self):
-        return f"Reminder for {self.customer.name} - {self.event_type} - {self.status}"
\ No newline at end of file
+        return f"{self.command} @ {self.started_at:%Y-%m-%d %H:%M}"
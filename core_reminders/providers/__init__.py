@@ -0,0 +1,56 @@
+"""
+External service backends for the reminder pipeline.
+
+Each stage (script, translate, voice, video, messaging) talks to whatever
+class settings.REMINDER_PROVIDERS names for it. An entry is either a dotted
+path or {"class": path, "options": {...}}; options are passed to __init__.
+Entries may also set "rate_limit" and "circuit_breaker" (see utils.throttle).
+"""
+import threading
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+
+DEFAULT_PROVIDERS = {
+    "script": "core_reminders.providers.templates.TemplateScriptProvider",
+    "translate": "core_reminders.providers.openai.OpenAITranslationProvider",
+    "voice": "core_reminders.providers.elevenlabs.ElevenLabsVoiceProvider",
+    "video": "core_reminders.providers.heygen.HeyGenVideoProvider",
+    "messaging": "core_reminders.providers.fake.FakeMessagingProvider",
+}
+
+_instances = {}
+_lock = threading.Lock()
+
+
+def get_provider(kind):
+    # Imported here: throttle itself depends on providers.base.
+    from core_reminders.utils.throttle import GuardedProvider
+
+    with _lock:
+        if kind not in _instances:
+            entry = {**DEFAULT_PROVIDERS, **getattr(settings, "REMINDER_PROVIDERS", {})}[kind]
+            if isinstance(entry, str):
+                entry = {"class": entry}
+            provider = import_string(entry["class"])(**entry.get("options", {}))
+            _instances[kind] = GuardedProvider(
+                kind, provider, rate_limit=entry.get("rate_limit"), circuit_breaker=entry.get("circuit_breaker"),
+            )
+        return _instances[kind]
+
+
+def reset_providers():
+    from core_reminders.utils import throttle
+
+    with _lock:
+        _instances.clear()
+        throttle.reset()
+
+
+def _on_setting_changed(setting, **kwargs):
+    if setting == "REMINDER_PROVIDERS":
+        reset_providers()
+
+
+setting_changed.connect(_on_setting_changed)
@@ -0,0 +1,75 @@
+"""
+Provider interfaces. The a-prefixed coroutines are what the async pipeline
+calls; by default they run the blocking method in a worker thread, and
+providers with a native async client override them.
+"""
+from asgiref.sync import sync_to_async
+
+
+class ProviderUnavailable(Exception):
+    """
+    Raised by providers when the service is throttling us (429) or failing
+    (5xx, connection errors). retry_after is in seconds, if the service said;
+    status_code is the HTTP status, if there was a response.
+    """
+
+    def __init__(self, message, retry_after=None, status_code=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class ScriptProvider:
+    def generate_script(self, event_type, customer, loan):
+        raise NotImplementedError
+
+    def generate_scripts(self, event_type, loans, chunk_size=2000):
+        """(loan_id, script) for each loan in a Loan queryset, one generate_script() call at a time."""
+        for loan in loans.select_related("customer").iterator(chunk_size=chunk_size):
+            yield loan.id, self.generate_script(event_type, loan.customer, loan)
+
+
+class TranslationProvider:
+    def translate_text(self, text, target_lang):
+        raise NotImplementedError
+
+    def translate_templates(self, templates, target_lang):
+        """{key: template} -> {key: translated template}, placeholders untouched."""
+        raise NotImplementedError
+
+
+class VoiceProvider:
+    def synthesize(self, text, output_path):
+        """Writes speech audio to output_path and returns it, or None on failure."""
+        raise NotImplementedError
+
+
+class VideoProvider:
+    def submit(self, script, voice_id, avatar_id, dimension):
+        """Starts a render and returns its job id, or None."""
+        raise NotImplementedError
+
+    def status(self, video_id):
+        """Returns (status, video_url) with status in completed / failed / pending / unknown."""
+        raise NotImplementedError
+
+    def download(self, video_url, output_path):
+        raise NotImplementedError
+
+    async def asubmit(self, script, voice_id, avatar_id, dimension):
+        return await sync_to_async(self.submit, thread_sensitive=False)(script, voice_id, avatar_id, dimension)
+
+    async def astatus(self, video_id):
+        return await sync_to_async(self.status, thread_sensitive=False)(video_id)
+
+    async def adownload(self, video_url, output_path):
+        return await sync_to_async(self.download, thread_sensitive=False)(video_url, output_path)
+
+
+class MessagingProvider:
+    def send_video(self, to_number, video_url, sender=None):
+        """
+        Returns the message id, or None if the send failed. sender is the number
+        to send from; None uses the provider's default.
+        """
+        raise NotImplementedError
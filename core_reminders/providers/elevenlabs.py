@@ -0,0 +1,44 @@
+import logging
+import os
+from django.conf import settings
+from django.utils.functional import cached_property
+from elevenlabs import ElevenLabs
+from elevenlabs.core.api_error import ApiError
+from core_reminders.providers.base import ProviderUnavailable, VoiceProvider
+from core_reminders.utils.http import retry_after
+
+
+class ElevenLabsVoiceProvider(VoiceProvider):
+    def __init__(self, voice_id="KSsyodh37PbfWy29kPtx", model_id="eleven_multilingual_v2"):
+        self.voice_id = voice_id
+        self.model_id = model_id
+
+    @cached_property
+    def client(self):
+        return ElevenLabs(api_key=settings.ELEVENLABS_API_KEY)
+
+    def synthesize(self, text, output_path):
+        try:
+            audio = self.client.text_to_speech.convert(
+                voice_id=self.voice_id,
+                model_id=self.model_id,
+                text=text
+            )
+
+            with open(output_path, "wb") as f:
+                for chunk in audio:
+                    f.write(chunk)
+
+            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+                logging.info(f"Voice generated successfully: {output_path}")
+                return output_path
+            logging.error("Voice file was not created or is empty.")
+            return None
+        except ApiError as e:
+            if e.status_code == 429 or (e.status_code or 0) >= 500:
+                raise ProviderUnavailable(f"ElevenLabs returned HTTP {e.status_code}", retry_after=retry_after(e.headers), status_code=e.status_code)
+            logging.error(f"ElevenLabs voice generation failed: {e}")
+            return None
+        except Exception as e:
+            logging.error(f"ElevenLabs voice generation failed: {e}")
+            return None
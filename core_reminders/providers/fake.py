@@ -0,0 +1,252 @@
+"""
+In-process stand-ins for the external services, for local runs and load tests.
+
+Every fake takes latency=(min_s, max_s), failure_rate (0..1) for ordinary
+failures and unavailable_rate (0..1) for outage-style ProviderUnavailable
+errors, with retry_after seconds if set. The video fake
+also mimics HeyGen's job lifecycle: the job is not found (reported as pending, like
+HeyGen's 404) for the first not_found_polls checks, pending until ready_after
+seconds have passed, then completed. Configure through settings, e.g.
+
+    REMINDER_PROVIDERS = {
+        "video": {
+            "class": "core_reminders.providers.fake.FakeVideoProvider",
+            "options": {"latency": (0.05, 0.2), "ready_after": 30, "not_found_polls": 1},
+        },
+    }
+"""
+import asyncio
+import itertools
+import json
+import logging
+import random
+import struct
+import threading
+import time
+import uuid
+import wave
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from core_reminders.providers.base import (
+    MessagingProvider,
+    ProviderUnavailable,
+    TranslationProvider,
+    VideoProvider,
+    VoiceProvider,
+)
+
+
+class FakeProvider:
+    def __init__(self, latency=(0, 0), failure_rate=0.0, unavailable_rate=0.0, retry_after=None, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.unavailable_rate = unavailable_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.calls = 0
+
+    def _roll(self):
+        with self.random_lock:
+            self.calls += 1
+            delay = self.random.uniform(*self.latency)
+            failed = self.random.random() < self.failure_rate
+            unavailable = self.random.random() < self.unavailable_rate
+        return delay, failed, unavailable
+
+    def _outcome(self, failed, unavailable):
+        if unavailable:
+            raise ProviderUnavailable(f"{type(self).__name__} is unavailable", retry_after=self.retry_after)
+        return not failed
+
+    def simulate(self):
+        """Sleeps for the configured latency and returns False if this call should fail."""
+        delay, failed, unavailable = self._roll()
+        if delay:
+            time.sleep(delay)
+        return self._outcome(failed, unavailable)
+
+    async def asimulate(self):
+        """simulate() for the async pipeline: waits without blocking the event loop."""
+        delay, failed, unavailable = self._roll()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._outcome(failed, unavailable)
+
+
+class FakeTranslationProvider(FakeProvider, TranslationProvider):
+    """Prefixes text with the language name, leaving placeholders alone."""
+
+    def translate_text(self, text, target_lang):
+        if not self.simulate():
+            return text
+        return f"[{target_lang}] {text}"
+
+    def translate_templates(self, templates, target_lang):
+        if not self.simulate():
+            return {}
+        return {key: f"[{target_lang}] {template}" for key, template in templates.items()}
+
+
+class FakeVoiceProvider(FakeProvider, VoiceProvider):
+    """Writes a silent 16 kHz mono WAV roughly as long as the text would take to read."""
+
+    def __init__(self, seconds_per_char=0.06, **kwargs):
+        super().__init__(**kwargs)
+        self.seconds_per_char = seconds_per_char
+
+    def synthesize(self, text, output_path):
+        if not self.simulate():
+            return None
+        frames = int(16000 * max(0.5, len(text) * self.seconds_per_char))
+        with wave.open(output_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(struct.pack("<h", 0) * frames)
+        return output_path
+
+
+class FakeVideoProvider(FakeProvider, VideoProvider):
+    def __init__(self, ready_after=0, not_found_polls=0, render_failure_rate=0.0, video_bytes=64 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.ready_after = ready_after
+        self.not_found_polls = not_found_polls
+        self.render_failure_rate = render_failure_rate
+        self.video_bytes = video_bytes
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+
+    def submit(self, script, voice_id, avatar_id, dimension):
+        return self._submit(self.simulate())
+
+    async def asubmit(self, script, voice_id, avatar_id, dimension):
+        return self._submit(await self.asimulate())
+
+    def status(self, video_id):
+        return self._status(video_id, self.simulate())
+
+    async def astatus(self, video_id):
+        return self._status(video_id, await self.asimulate())
+
+    def _submit(self, ok):
+        if not ok:
+            logging.error("Fake video submit failed.")
+            return None
+        video_id = uuid.uuid4().hex
+        with self.random_lock:
+            fails = self.random.random() < self.render_failure_rate
+        with self.jobs_lock:
+            self.jobs[video_id] = {"submitted": time.monotonic(), "polls": 0, "fails": fails}
+        return video_id
+
+    def _status(self, video_id, ok):
+        if not ok:
+            return "unknown", None
+        with self.jobs_lock:
+            job = self.jobs.get(video_id)
+            if job is None:
+                return "failed", None
+            job["polls"] += 1
+            if job["polls"] <= self.not_found_polls:
+                return "pending", None
+            if time.monotonic() - job["submitted"] < self.ready_after:
+                return "pending", None
+        if job["fails"]:
+            return "failed", None
+        return "completed", f"fake://videos/{video_id}.mp4"
+
+    def download(self, video_url, output_path):
+        if not self.simulate():
+            raise IOError(f"Fake download of {video_url} failed")
+        with open(output_path, "wb") as f:
+            f.write(b"\0" * self.video_bytes)
+        return output_path
+
+
+class FakeMessagingProvider(FakeProvider, MessagingProvider):
+    """Logs the send and returns a made-up message id. This is also the default until a real sender is configured."""
+
+    _ids = itertools.count(1)
+
+    def send_video(self, to_number, video_url, sender=None):
+        ok = self.simulate()
+        logging.info(f"Sending WhatsApp video to {to_number}")
+        logging.info(f"Video URL: {video_url}")
+        if not ok:
+            return None
+        return f"simulated_message_sid_{next(self._ids)}"
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server.fake
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        form = {key: values[0] for key, values in parse_qs(body).items()}
+        delay, failed, unavailable = server.roll(form.get("From"))
+        if delay:
+            time.sleep(delay)
+        if unavailable:
+            self.reply(429, {"code": 20429, "message": "Too Many Requests"}, {"Retry-After": "1"})
+        elif failed or not form.get("To", "").startswith("whatsapp:"):
+            self.reply(400, {"code": 21211, "message": "Invalid 'To' Phone Number"})
+        else:
+            self.reply(201, {"sid": f"SM{uuid.uuid4().hex}", "status": "queued", "to": form["To"], "from": form.get("From")})
+
+    def reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeTwilioServer(FakeProvider):
+    """
+    Local HTTP stand-in for Twilio's Messages API, so TwilioMessagingProvider can
+    be load tested over real connections. Besides the usual fake options it
+    answers 429 once a sender goes over sender_rate messages per second, like
+    Twilio's per-number throughput limit. Use as a context manager; .url is the
+    provider's api_url.
+    """
+
+    def __init__(self, sender_rate=None, **kwargs):
+        super().__init__(**kwargs)
+        self.sender_rate = sender_rate
+        self.sent = Counter()
+        self.throttled = Counter()
+        self.windows = {}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeTwilioHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def roll(self, sender):
+        delay, failed, unavailable = self._roll()
+        with self.random_lock:
+            second = int(time.monotonic())
+            window_second, count = self.windows.get(sender, (second, 0))
+            count = count + 1 if window_second == second else 1
+            self.windows[sender] = (second, count)
+            if self.sender_rate and count > self.sender_rate:
+                unavailable = True
+            if unavailable:
+                self.throttled[sender] += 1
+            elif not failed:
+                self.sent[sender] += 1
+        return delay, failed, unavailable
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,116 @@
+import logging
+import httpx
+import requests
+from django.conf import settings
+from core_reminders.providers.base import ProviderUnavailable, VideoProvider
+from core_reminders.utils.downloads import fetch_to_file
+from core_reminders.utils.metrics import log_payload
+from core_reminders.utils.http import get_async_client, get_session, raise_if_unavailable
+
+
+class HeyGenVideoProvider(VideoProvider):
+    generate_url = "https://api.heygen.com/v2/video/generate"
+    status_url = "https://api.heygen.com/v1/video_status.get"
+
+    def __init__(self, test_mode=True):
+        self.test_mode = test_mode
+
+    def headers(self):
+        return {
+            "X-Api-Key": settings.HEYGEN_API_KEY,
+            "Content-Type": "application/json",
+        }
+
+    def payload(self, script, voice_id, avatar_id, dimension):
+        return {
+            "video_inputs": [
+                {
+                    "character": {
+                        "type": "avatar",
+                        "avatar_id": avatar_id
+                    },
+                    "voice": {
+                        "type": "text",
+                        "input_text": script,
+                        "voice_id": voice_id,
+                    }
+                }
+            ],
+            "dimension": dimension,
+            "aspect_ratio": "16:9",
+            "test": self.test_mode
+        }
+
+    def submit(self, script, voice_id, avatar_id, dimension):
+        try:
+            resp = get_session().post(
+                self.generate_url, headers=self.headers(), json=self.payload(script, voice_id, avatar_id, dimension), timeout=60,
+            )
+        except requests.RequestException as e:
+            raise ProviderUnavailable(f"HeyGen generate request failed: {e}")
+        return self.submitted(resp)
+
+    async def asubmit(self, script, voice_id, avatar_id, dimension):
+        try:
+            resp = await get_async_client().post(
+                self.generate_url, headers=self.headers(), json=self.payload(script, voice_id, avatar_id, dimension), timeout=60,
+            )
+        except httpx.HTTPError as e:
+            raise ProviderUnavailable(f"HeyGen generate request failed: {e}")
+        return self.submitted(resp)
+
+    def submitted(self, resp):
+        log_payload(f"Video generation response: {resp.status_code} {resp.text}")
+        raise_if_unavailable(resp, "HeyGen generate")
+
+        if resp.status_code not in [200, 201]:
+            logging.error(f"Video generation request failed: {resp.text}")
+            return None
+
+        video_id = resp.json().get("data", {}).get("video_id")
+        if not video_id:
+            logging.error("No video_id returned from HeyGen.")
+        return video_id
+
+    def status(self, video_id):
+        try:
+            status_resp = get_session().get(self.status_url, params={"video_id": video_id}, headers=self.headers(), timeout=30)
+        except requests.RequestException as e:
+            raise ProviderUnavailable(f"HeyGen status request failed: {e}")
+        return self.parse_status(video_id, status_resp)
+
+    async def astatus(self, video_id):
+        try:
+            status_resp = await get_async_client().get(
+                self.status_url, params={"video_id": video_id}, headers=self.headers(), timeout=30,
+            )
+        except httpx.HTTPError as e:
+            raise ProviderUnavailable(f"HeyGen status request failed: {e}")
+        return self.parse_status(video_id, status_resp)
+
+    def parse_status(self, video_id, status_resp):
+        log_payload(f"Status response for {video_id}: {status_resp.status_code} {status_resp.text}")
+        raise_if_unavailable(status_resp, "HeyGen status")
+
+        if status_resp.status_code == 404:
+            logging.warning(f"404 - Video {video_id} not ready yet.")
+            return "pending", None
+
+        if status_resp.status_code != 200:
+            logging.error(f"Status check failed: {status_resp.text}")
+            return "unknown", None
+
+        status_data = status_resp.json().get("data", {})
+        status = status_data.get("status")
+
+        if status == "completed" and status_data.get("video_url"):
+            return "completed", status_data["video_url"]
+        if status in ["failed", "error"]:
+            logging.error(f"Video generation failed: {status_data}")
+            return "failed", None
+        return "pending", None
+
+    def download(self, video_url, output_path):
+        logging.info(f"Downloading video from {video_url} ...")
+        fetch_to_file(video_url, output_path, session=get_session())
+        return output_path
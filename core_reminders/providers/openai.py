@@ -0,0 +1,72 @@
+import json
+import logging
+from django.conf import settings
+from django.utils.functional import cached_property
+from openai import APIConnectionError, InternalServerError, OpenAI, RateLimitError
+from core_reminders.providers.base import ProviderUnavailable, TranslationProvider
+from core_reminders.utils.http import retry_after
+
+
+def _unavailable(e):
+    response = getattr(e, "response", None)
+    return ProviderUnavailable(
+        f"OpenAI unavailable: {e}",
+        retry_after=retry_after(response.headers if response is not None else None),
+        status_code=getattr(e, "status_code", None),
+    )
+
+
+class OpenAITranslationProvider(TranslationProvider):
+    def __init__(self, model="gpt-4o-mini", timeout=60):
+        self.model = model
+        self.timeout = timeout
+
+    @cached_property
+    def client(self):
+        # Built on first use, so merely configuring the provider opens no connections.
+        return OpenAI(api_key=settings.OPENAI_API_KEY)
+
+    def translate_text(self, text, target_lang):
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": f"Translate this sentence into {target_lang}. Use polite and natural tone with numerals in {target_lang} script.",
+                    },
+                    {"role": "user", "content": text},
+                ],
+                timeout=self.timeout,
+            )
+            return response.choices[0].message.content.strip()
+        except (RateLimitError, InternalServerError, APIConnectionError) as e:
+            raise _unavailable(e)
+        except Exception as e:
+            logging.error(f"Translation failed: {e}")
+            return text
+
+    def translate_templates(self, templates, target_lang):
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            f"Translate every value of the JSON object into {target_lang}. Use polite and natural tone. "
+                            "Keep the keys and every {placeholder} in curly braces exactly as they are. "
+                            "Reply with the JSON object only."
+                        ),
+                    },
+                    {"role": "user", "content": json.dumps(templates, ensure_ascii=False)},
+                ],
+                response_format={"type": "json_object"},
+                timeout=self.timeout,
+            )
+            return json.loads(response.choices[0].message.content)
+        except (RateLimitError, InternalServerError, APIConnectionError) as e:
+            raise _unavailable(e)
+        except Exception as e:
+            logging.error(f"Template translation failed: {e}")
+            return {}
@@ -0,0 +1,74 @@
+import logging
+from django.db.models import QuerySet
+from core_reminders.providers.base import ProviderUnavailable, ScriptProvider
+from core_reminders.utils import translations
+from core_reminders.utils.metrics import log_payload
+from core_reminders.utils.reminder_utils import BASE_SCRIPTS, SCRIPT_FIELDS, context_for, script_context
+
+
+DEFAULT_SCRIPT = "Default reminder: Please pay your EMI."
+
+
+class TemplateScriptProvider(ScriptProvider):
+    """Fills BASE_SCRIPTS (or their cached translations) with the loan's details."""
+
+    def template_for(self, event_type, language):
+        """
+        The template to fill in for `language`: its cached translation, translated
+        now (in one batched request for the language) if there isn't one yet.
+        While the translation provider is down this raises ProviderUnavailable,
+        so the reminder is parked until the batch can be retried; a translation
+        that came back unusable falls back to the English template.
+        """
+        template = BASE_SCRIPTS.get(event_type)
+        if language == "en":
+            return template
+        translated_template = translations.get_template(event_type, language)
+        if translated_template is None:
+            translations.prefetch([language], [event_type])
+            translated_template = translations.get_template(event_type, language)
+        if translated_template is not None:
+            return translated_template
+        retry_in = translations.retry_in(language)
+        if retry_in:
+            raise ProviderUnavailable(f"Translation into {language} is unavailable", retry_after=retry_in)
+        return template
+
+    def generate_script(self, event_type, customer, loan):
+        if not BASE_SCRIPTS.get(event_type):
+            return DEFAULT_SCRIPT
+
+        customer_lang = getattr(customer, "preferred_language", "en")
+        script = self.template_for(event_type, customer_lang).format(**script_context(customer, loan))
+        if customer_lang != "en":
+            log_payload(f"Translated Script ({customer_lang}): {script}")
+        else:
+            log_payload(f"English Script: {script}")
+        return script
+
+    def generate_scripts(self, event_type, loans, chunk_size=2000):
+        """
+        Same scripts as generate_script(), for many loans at once. Querysets are
+        read as values() rows through iterator(chunk_size), so memory stays flat
+        for any number of loans. Each language's template is resolved once, and
+        amounts and dates are formatted once per distinct value.
+        """
+        if isinstance(loans, QuerySet):
+            loans = loans.values(*SCRIPT_FIELDS).iterator(chunk_size=chunk_size)
+        if not BASE_SCRIPTS.get(event_type):
+            for row in loans:
+                yield row["id"], DEFAULT_SCRIPT
+            return
+
+        templates = {}
+        count = 0
+        for row in loans:
+            language = row["customer__preferred_language"] or "en"
+            if language not in templates:
+                templates[language] = self.template_for(event_type, language).format_map
+            script = templates[language](context_for(
+                row["customer__name"], row["loan_number"], row["emi_amount"], row["due_date"], language,
+            ))
+            count += 1
+            yield row["id"], script
+        logging.info(f"Generated {count} {event_type} scripts in {len(templates)} languages")
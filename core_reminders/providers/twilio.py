@@ -0,0 +1,51 @@
+import logging
+from urllib.parse import urljoin
+import requests
+from django.conf import settings
+from core_reminders.providers.base import MessagingProvider, ProviderUnavailable
+from core_reminders.utils.http import get_session, raise_if_unavailable
+from core_reminders.utils.metrics import log_payload
+
+
+class TwilioMessagingProvider(MessagingProvider):
+    """
+    WhatsApp video messages through Twilio's Messages API, over the shared
+    pooled session. api_url can point at FakeTwilioServer for load tests.
+    """
+
+    api_url = "https://api.twilio.com"
+
+    def __init__(self, account_sid=None, auth_token=None, from_number=None, status_callback=None, api_url=None):
+        self.account_sid = account_sid or getattr(settings, "TWILIO_ACCOUNT_SID", "")
+        self.auth_token = auth_token or getattr(settings, "TWILIO_AUTH_TOKEN", "")
+        self.from_number = from_number or getattr(settings, "TWILIO_WHATSAPP_FROM", "")
+        self.status_callback = status_callback or getattr(settings, "TWILIO_STATUS_CALLBACK_URL", "")
+        if api_url:
+            self.api_url = api_url
+
+    def messages_url(self):
+        return f"{self.api_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+
+    def media_url(self, video_url):
+        # Twilio fetches the media itself, so site-relative URLs need our public address.
+        return urljoin(getattr(settings, "REMINDER_PUBLIC_BASE_URL", ""), video_url)
+
+    def send_video(self, to_number, video_url, sender=None):
+        data = {
+            "From": f"whatsapp:{sender or self.from_number}",
+            "To": f"whatsapp:{to_number}",
+            "MediaUrl": self.media_url(video_url),
+        }
+        if self.status_callback:
+            data["StatusCallback"] = self.status_callback
+        try:
+            resp = get_session().post(self.messages_url(), data=data, auth=(self.account_sid, self.auth_token), timeout=30)
+        except requests.RequestException as e:
+            raise ProviderUnavailable(f"Twilio send request failed: {e}")
+
+        log_payload(f"Twilio send response: {resp.status_code} {resp.text}")
+        raise_if_unavailable(resp, "Twilio send")
+        if resp.status_code not in [200, 201]:
+            logging.error(f"WhatsApp send to {to_number} failed: {resp.text}")
+            return None
+        return resp.json().get("sid")
@@ -1,3 +1,1402 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Now
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core_reminders.models import Customer, EventCursor, Loan, Reminder, RenderCacheEntry, StoredVideo
+from core_reminders.providers.base import ProviderUnavailable, ScriptProvider
+from core_reminders.providers.fake import FakeTwilioServer
+from core_reminders.providers.heygen import HeyGenVideoProvider
+from core_reminders.utils import (
+    composition, dispatcher, downloads, events, http, job_queue, local_render, pipeline, render_cache, scheduler, throttle,
+    translations, video_poller, video_storage, webhooks,
+)
+from core_reminders.utils.dispatcher import release_scheduled
+from core_reminders.utils.formatting import format_amount, format_date, group_indian
+from core_reminders.utils.reminder_utils import BASE_SCRIPTS, arun_steps, generate_script, generate_scripts, run_steps
 
-# Create your tests here.
+
+class CompositionTests(TestCase):
+    def test_split_template(self):
+        self.assertEqual(
+            composition.split_template("Hello {customer_name}, loan {loan_number}. Thanks."),
+            [("static", "Hello"), ("slot", "customer_name"), ("static", ", loan"), ("slot", "loan_number"), ("static", ". Thanks.")],
+        )
+
+    @skipUnless(shutil.which(settings.FFMPEG_BINARY), "ffmpeg not installed")
+    def test_compose_video_with_fixture_clips(self):
+        customer = Customer.objects.create(name="Ravi", whatsapp_number="+910000000001")
+        loan = Loan.objects.create(customer=customer, loan_number="EMI-1", emi_amount=1500, due_date=date(2025, 10, 27))
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            url = composition.compose_video("EMI_DUE", customer, loan, render=composition.fixture_renderer(media_root))
+            self.assertTrue(os.path.getsize(video_storage.local_path(url)) > 0)
+
+            # Second call is served from the render cache without rendering anything.
+            self.assertEqual(composition.compose_video("EMI_DUE", customer, loan, render=lambda texts: None), url)
+
+
+class SameScriptProvider(ScriptProvider):
+    """Gives every loan the same script, so their renders are identical."""
+
+    def generate_script(self, event_type, customer, loan):
+        return "Your EMI is due soon. Thank you."
+
+
+class RenderCacheTests(TestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def store(self, key, size):
+        path = os.path.join(video_storage.incoming_dir(), f"{key}.mp4")
+        with open(path, "wb") as f:
+            f.write(key.encode() * (size // len(key)))
+        stored = video_storage.save(path)
+        render_cache.store(key, stored)
+        return stored
+
+    def test_hit_and_miss(self):
+        before = render_cache.stats()
+        self.assertIsNone(render_cache.lookup("k1"))
+        stored = self.store("k1", 100)
+        self.assertEqual(render_cache.lookup("k1"), stored.url)
+        after = render_cache.stats()
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["stores"] - before["stores"], 1)
+        self.assertEqual(RenderCacheEntry.objects.get(key="k1").hits, 1)
+
+    def test_least_recently_used_entries_go_first(self):
+        stored = {key: self.store(key, 100) for key in ("old", "mid", "new")}
+        start = timezone.now() - timedelta(hours=3)
+        for i, key in enumerate(stored):
+            RenderCacheEntry.objects.filter(key=key).update(last_used_at=start + timedelta(hours=i))
+        # Used again, so "mid" becomes the oldest.
+        render_cache.lookup("old")
+
+        self.assertEqual(render_cache.evict(max_bytes=250), 1)
+        self.assertEqual(set(RenderCacheEntry.objects.values_list("key", flat=True)), {"old", "new"})
+        self.assertFalse(video_storage.get_storage().exists(stored["mid"].name))
+        self.assertIsNone(render_cache.lookup("mid"))
+
+        self.assertEqual(render_cache.evict(max_bytes=100), 1)
+        self.assertEqual(list(RenderCacheEntry.objects.values_list("key", flat=True)), ["old"])
+
+    def test_identical_scripts_share_one_render(self):
+        for i in range(2):
+            customer = Customer.objects.create(name=f"Twin {i}", whatsapp_number=f"+91730000000{i}", preferred_language="en")
+            Loan.objects.create(customer=customer, loan_number=f"TWIN-{i}", emi_amount=800, due_date=date.today() + timedelta(days=3))
+        providers = {**FAKE_PROVIDERS, "script": "core_reminders.tests.SameScriptProvider"}
+        with override_settings(REMINDER_PROVIDERS=providers):
+            call_command("send_reminders", no_wait=True, stdout=StringIO())
+            self.assertEqual(throttle.counters()["video"]["calls"], 1)
+            self.assertEqual(len(set(Reminder.objects.values_list("heygen_video_id", flat=True))), 1)
+
+            Reminder.objects.update(next_poll_at=None)
+            video_poller.poll_once()
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), 2)
+        self.assertEqual(len(set(Reminder.objects.values_list("video_url", flat=True))), 1)
+        self.assertEqual(RenderCacheEntry.objects.count(), 1)
+
+
+class TranslationCacheTests(TestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.calls = []
+
+    def fake_translate(self, templates, language):
+        self.calls.append((language, sorted(templates)))
+        return {event_type: f"[{language}] {template}" for event_type, template in templates.items()}
+
+    def test_prefetch_batches_one_request_per_language(self):
+        translations.prefetch(["Tamil", "Hindi", "en", "Tamil"], translate_batch=self.fake_translate)
+        self.assertEqual(sorted(self.calls), [("Hindi", sorted(BASE_SCRIPTS)), ("Tamil", sorted(BASE_SCRIPTS))])
+
+        translations.clear_memo()
+        translations.prefetch(["Tamil"], translate_batch=self.fake_translate)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_generate_script_uses_translated_template(self):
+        translations.prefetch(["Tamil"], translate_batch=self.fake_translate)
+        customer = Customer.objects.create(name="Kavya", whatsapp_number="+910000000002", preferred_language="Tamil")
+        loan = Loan.objects.create(customer=customer, loan_number="EMI-2", emi_amount=900, due_date=date(2025, 10, 27))
+
+        script = generate_script("EMI_DUE", customer, loan)
+        self.assertTrue(script.startswith("[Tamil] Hello Kavya"))
+
+    def test_translation_with_broken_placeholders_is_discarded(self):
+        translations.prefetch(["Hindi"], ["EMI_DUE"], translate_batch=lambda templates, language: {"EMI_DUE": "नमस्ते"})
+        self.assertIsNone(translations.get_template("EMI_DUE", "Hindi"))
+
+    def test_unusable_translation_falls_back_to_english(self):
+        translations.prefetch(["Hindi"], ["EMI_DUE"], translate_batch=lambda templates, language: {"EMI_DUE": "नमस्ते"})
+        customer = Customer.objects.create(name="Asha", whatsapp_number="+910000000003", preferred_language="Hindi")
+        loan = Loan.objects.create(customer=customer, loan_number="EMI-3", emi_amount=900, due_date=date(2025, 10, 27))
+
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS):
+            script = generate_script("EMI_DUE", customer, loan)
+            self.assertNotIn("translate", throttle.counters())
+        self.assertTrue(script.startswith("Hello Asha, your EMI of ₹900"))
+
+    def test_outage_parks_scripts_without_a_request_per_customer(self):
+        providers = {
+            **FAKE_PROVIDERS,
+            "translate": {
+                "class": "core_reminders.providers.fake.FakeTranslationProvider",
+                "options": {"unavailable_rate": 1.0, "retry_after": 60},
+            },
+        }
+        with override_settings(REMINDER_PROVIDERS=providers):
+            for i in range(3):
+                customer = Customer.objects.create(name=f"Down {i}", whatsapp_number=f"+91000000001{i}", preferred_language="Tamil")
+                loan = Loan.objects.create(customer=customer, loan_number=f"TR-{i}", emi_amount=900, due_date=date(2025, 10, 27))
+                with self.assertRaises(ProviderUnavailable) as raised:
+                    generate_script("EMI_DUE", customer, loan)
+                self.assertGreater(raised.exception.retry_after, 0)
+            # One batched request for the language, not one per customer.
+            self.assertEqual(throttle.counters()["translate"]["calls"], 1)
+
+
+FAKE_PROVIDERS = {
+    "translate": "core_reminders.providers.fake.FakeTranslationProvider",
+    "voice": "core_reminders.providers.fake.FakeVoiceProvider",
+    "video": "core_reminders.providers.fake.FakeVideoProvider",
+    "messaging": "core_reminders.providers.fake.FakeMessagingProvider",
+}
+
+
+class FakeProviderPipelineTests(TransactionTestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        due = date.today() + timedelta(days=3)
+        for i in range(12):
+            customer = Customer.objects.create(
+                name=f"Customer {i}",
+                whatsapp_number=f"+9190000{i:05d}",
+                preferred_language="Hindi" if i % 3 == 0 else "en",
+            )
+            Loan.objects.create(customer=customer, loan_number=f"EMI-{i}", emi_amount=1000 + i, due_date=due)
+
+    def test_send_reminders_with_workers(self):
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, MEDIA_ROOT=self.media_root):
+            call_command("send_reminders", workers=4, stdout=StringIO())
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), 12)
+
+    def test_workers_process_each_loan_exactly_once(self):
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, MEDIA_ROOT=self.media_root):
+            call_command("send_reminders", workers=5, stdout=StringIO())
+            counters = throttle.counters()
+        self.assertEqual(counters["script"]["calls"], 12)
+        self.assertEqual(counters["messaging"]["calls"], 12)
+        reminders = Reminder.objects.all()
+        self.assertEqual(sorted(reminders.values_list("loan__loan_number", flat=True)), sorted(f"EMI-{i}" for i in range(12)))
+        self.assertEqual(set(reminders.values_list("status", "attempts")), {("SENT", 1)})
+        self.assertEqual(len(set(reminders.values_list("message_sid", flat=True))), 12)
+
+    def test_run_pool_hands_every_item_to_one_worker(self):
+        handled = Counter()
+        lock = threading.Lock()
+        results = []
+
+        def handler(item):
+            with lock:
+                handled[item] += 1
+            return threading.current_thread().name
+
+        def on_result(item, worker):
+            results.append((item, worker, threading.current_thread()))
+
+        pipeline.run_pool(range(50), handler, 4, on_result=on_result)
+        self.assertEqual(handled, Counter(range(50)))
+        self.assertEqual(sorted(item for item, _, _ in results), list(range(50)))
+        self.assertTrue(all(caller is threading.current_thread() for _, _, caller in results))
+        self.assertTrue(all(worker.startswith("reminder-worker-") for _, worker, _ in results))
+
+    def test_async_runner(self):
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, MEDIA_ROOT=self.media_root):
+            call_command("send_reminders", use_async=True, workers=50, stdout=StringIO())
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), 12)
+        self.assertFalse(Reminder.objects.filter(lease_owner__isnull=False).exists())
+
+    def test_sync_and_async_runners_take_the_same_steps(self):
+        loan = Loan.objects.select_related("customer").get(loan_number="EMI-1")
+        outcomes = {"script": "Hello", "compose": None, "lookup": None, "shared": None, "submit": None, "fallback": "/media/local.mp4"}
+
+        def record(steps):
+            def call(name):
+                return lambda *args: steps.append(name) or outcomes[name]
+            return {name: call(name) for name in outcomes}
+
+        def arecord(steps):
+            calls = record(steps)
+
+            async def call(name, *args):
+                return calls[name](*args)
+            return {name: lambda *args, name=name: call(name, *args) for name in outcomes}
+
+        sync_steps, async_steps = [], []
+        with override_settings(REMINDER_VIDEO_MODE="composed"):
+            sync = Reminder(loan=loan, customer=loan.customer, event_type="EMI_DUE")
+            result = run_steps(pipeline.loan_steps(loan, sync, wait=False), record(sync_steps))
+            coro = Reminder(loan=loan, customer=loan.customer, event_type="EMI_DUE")
+            aresult = asyncio.run(arun_steps(pipeline.loan_steps(loan, coro, wait=False), arecord(async_steps)))
+        self.assertEqual(sync_steps, ["script", "compose", "lookup", "shared", "submit", "fallback"])
+        self.assertEqual(async_steps, sync_steps)
+        self.assertEqual(aresult, result)
+        self.assertEqual((coro.status, coro.video_url), ("SCHEDULED", "/media/local.mp4"))
+
+    def test_no_wait_then_poll(self):
+        providers = {
+            **FAKE_PROVIDERS,
+            "video": {"class": "core_reminders.providers.fake.FakeVideoProvider", "options": {"not_found_polls": 1}},
+        }
+        with override_settings(REMINDER_PROVIDERS=providers, MEDIA_ROOT=self.media_root):
+            call_command("send_reminders", no_wait=True, stdout=StringIO())
+            self.assertEqual(Reminder.objects.filter(status="GENERATING").count(), 12)
+
+            # First tick gets "not found" for every job and backs off; the second finishes them.
+            for _ in range(2):
+                Reminder.objects.update(next_poll_at=None)
+                call_command("poll_videos", once=True, stdout=StringIO())
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), 12)
+
+
+class VideoPollerTests(TestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        for i in range(3):
+            customer = Customer.objects.create(name=f"Poll {i}", whatsapp_number=f"+91740000000{i}", preferred_language="en")
+            Loan.objects.create(customer=customer, loan_number=f"POLL-{i}", emi_amount=800, due_date=date.today() + timedelta(days=3))
+        providers = {
+            **FAKE_PROVIDERS,
+            "video": {"class": "core_reminders.providers.fake.FakeVideoProvider", "options": {"not_found_polls": 1}},
+        }
+        settings_override = override_settings(REMINDER_PROVIDERS=providers, MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command("send_reminders", no_wait=True, stdout=StringIO())
+        # Renders left in flight mustn't be shared with the next test's identical scripts.
+        for key in Reminder.objects.values_list("render_key", flat=True):
+            self.addCleanup(pipeline.forget_render, key)
+
+    def tick(self):
+        calls = lambda: throttle.counters().get("video", {}).get("calls", 0)
+        before = calls()
+        wait = video_poller.poll_once()
+        return calls() - before, wait
+
+    def test_tick_polls_every_due_render(self):
+        Reminder.objects.update(next_poll_at=None)
+        self.assertEqual(self.tick()[0], 3)
+        for reminder in Reminder.objects.all():
+            self.assertEqual(reminder.poll_attempts, 1)
+            self.assertAlmostEqual(
+                (reminder.next_poll_at - timezone.now()).total_seconds(), pipeline.next_poll_delay(1).total_seconds(), delta=5,
+            )
+
+        # Only renders whose next poll has come round are checked.
+        due = Reminder.objects.first()
+        Reminder.objects.filter(pk=due.pk).update(next_poll_at=None)
+        wait = video_poller.poll_once()
+        self.assertEqual(Reminder.objects.get(pk=due.pk).status, "SENT")
+        self.assertEqual(set(Reminder.objects.exclude(pk=due.pk).values_list("poll_attempts", flat=True)), {1})
+        self.assertTrue(0 < wait <= pipeline.POLL_MAX_INTERVAL)
+
+    def test_poll_interval_backs_off_and_caps(self):
+        delays = [pipeline.next_poll_delay(n).total_seconds() for n in range(12)]
+        self.assertEqual(delays[0], pipeline.POLL_MIN_INTERVAL)
+        self.assertEqual(delays, sorted(delays))
+        self.assertEqual(delays[-1], pipeline.POLL_MAX_INTERVAL)
+        with override_settings(HEYGEN_WEBHOOK_SECRET="s", VIDEO_POLL_FALLBACK_INTERVAL=300):
+            self.assertEqual(pipeline.next_poll_delay(0), timedelta(seconds=300))
+
+    def test_completed_failed_and_timed_out_renders(self):
+        done, lost, slow = Reminder.objects.order_by("id")
+        Reminder.objects.filter(pk=lost.pk).update(heygen_video_id="unknown-to-heygen")
+        Reminder.objects.filter(pk=slow.pk).update(submitted_at=timezone.now() - timedelta(hours=1))
+
+        for _ in range(2):
+            Reminder.objects.update(next_poll_at=None)
+            video_poller.poll_once(timeout=480)
+
+        statuses = dict(Reminder.objects.values_list("id", "status"))
+        self.assertEqual(statuses, {done.id: "SENT", lost.id: "FAILED", slow.id: "FAILED"})
+        self.assertIsNone(video_poller.poll_once())
+
+
+class QueryBudgetTests(TestCase):
+    # Per loan: render cache lookup + store (BEGIN/INSERT/COMMIT). Loading loans, creating
+    # reminders and writing statuses are batched and only show up in the fixed part.
+    # Per claim (job_queue.claim_size loans): fail exhausted, pick, lease and load them.
+    QUERIES_PER_LOAN = 5
+    QUERIES_PER_CLAIM = 4
+    FIXED_QUERIES = 25
+
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def seed(self, n):
+        due = date.today() + timedelta(days=3)
+        for i in range(n):
+            customer = Customer.objects.create(
+                name=f"Customer {i}",
+                whatsapp_number=f"+9180000{i:05d}",
+                preferred_language="Tamil" if i % 2 else "en",
+            )
+            Loan.objects.create(customer=customer, loan_number=f"QB-{i}", emi_amount=500, due_date=due)
+
+    def test_send_reminders_query_budget(self):
+        n = 40
+        self.seed(n)
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, MEDIA_ROOT=self.media_root):
+            with CaptureQueriesContext(connection) as ctx:
+                call_command("send_reminders", stdout=StringIO())
+
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), n)
+        claims = -(-n // job_queue.claim_size(1))
+        self.assertLessEqual(
+            len(ctx.captured_queries), self.FIXED_QUERIES + self.QUERIES_PER_LOAN * n + self.QUERIES_PER_CLAIM * claims,
+        )
+
+
+class LoanSelectionTests(TestCase):
+    def test_needing_reminder_is_per_cycle_and_event(self):
+        due = date(2025, 11, 5)
+        customer = Customer.objects.create(name="Asha", whatsapp_number="+910000000003")
+        loan = Loan.objects.create(customer=customer, loan_number="EMI-3", emi_amount=700, due_date=due)
+        Reminder.objects.create(customer=customer, loan=loan, event_type="EMI_DUE", due_date=date(2025, 10, 5), status="SENT")
+        Reminder.objects.create(customer=customer, loan=loan, event_type="BOUNCE_REMINDER", due_date=due, status="SENT")
+
+        self.assertEqual(list(Loan.objects.needing_reminder("EMI_DUE", due)), [loan])
+
+        Reminder.objects.create(customer=customer, loan=loan, event_type="EMI_DUE", due_date=due, status="FAILED")
+        self.assertEqual(list(Loan.objects.needing_reminder("EMI_DUE", due)), [])
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        due = date(2025, 11, 5)
+        for i in range(6):
+            customer = Customer.objects.create(name=f"Customer {i}", whatsapp_number=f"+9170000{i:05d}")
+            Loan.objects.create(customer=customer, loan_number=f"JQ-{i}", emi_amount=500, due_date=due)
+        self.loan_ids = list(Loan.objects.values_list("id", flat=True))
+        job_queue.enqueue(self.loan_ids)
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(job_queue.enqueue(self.loan_ids), 0)
+        Loan.objects.filter(id=self.loan_ids[0]).update(due_date=date(2025, 12, 5))
+        # Only the loan that moved on to a new cycle is counted.
+        self.assertEqual(job_queue.enqueue(self.loan_ids), 1)
+        self.assertEqual(Reminder.objects.filter(status="PENDING").count(), 7)
+
+    def test_owners_claim_disjoint_batches(self):
+        first = job_queue.claim_batch("worker-a", 4)
+        second = job_queue.claim_batch("worker-b", 4)
+        self.assertEqual(len(first), 4)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({r.id for r in first} & {r.id for r in second})
+        self.assertEqual(job_queue.claim_batch("worker-c", 4), [])
+
+    def test_claims_follow_the_number_of_workers(self):
+        single = job_queue.iter_claimed("single-worker", job_queue.claim_size(1))
+        next(single)
+        self.assertEqual(Reminder.objects.filter(lease_owner="single-worker").count(), 2)
+        # The rest is left for other processes draining the same queue.
+        self.assertEqual(len(job_queue.claim_batch("drain-only", job_queue.claim_size(2))), 4)
+        with override_settings(REMINDER_CLAIM_SIZE=5):
+            self.assertEqual(job_queue.claim_size(1), 5)
+
+    def test_expired_lease_is_reclaimed_until_attempts_run_out(self):
+        claimed = job_queue.claim_batch("crashed-worker", 6)
+        self.assertEqual(len(claimed), 6)
+        expire = lambda: Reminder.objects.update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        expire()
+        self.assertEqual(len(job_queue.claim_batch("rescuer", 6)), 6)
+
+        for _ in range(job_queue.MAX_ATTEMPTS - 2):
+            expire()
+            job_queue.claim_batch("rescuer", 6)
+        expire()
+        self.assertEqual(job_queue.fail_exhausted(), 6)
+        self.assertEqual(job_queue.claim_batch("rescuer", 6), [])
+
+
+class FlakyRangeHandler(BaseHTTPRequestHandler):
+    """Serves VIDEO with Range support; the first full request is cut off half way."""
+
+    VIDEO = b"\0\0\0\x18ftypmp42" + os.urandom(200_000)
+    cut_first = True
+
+    def do_GET(self):
+        start = 0
+        if "Range" in self.headers:
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(self.VIDEO) - 1}/{len(self.VIDEO)}")
+        else:
+            self.send_response(200)
+        body = self.VIDEO[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if type(self).cut_first and not start:
+            type(self).cut_first = False
+            body = body[: len(body) // 2]
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves VIDEO with Range support, answering 416 for ranges past its end."""
+
+    VIDEO = b"\0\0\0\x18ftypmp42" + os.urandom(50_000)
+
+    def do_GET(self):
+        start = 0
+        if "Range" in self.headers:
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            if start >= len(self.VIDEO):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(self.VIDEO)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(self.VIDEO) - 1}/{len(self.VIDEO)}")
+        else:
+            self.send_response(200)
+        body = self.VIDEO[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloadTests(SimpleTestCase):
+    def setUp(self):
+        FlakyRangeHandler.cut_first = True
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyRangeHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/video.mp4"
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def test_truncated_transfer_is_resumed_and_verified(self):
+        dest = os.path.join(self.dir, "video.mp4")
+        digest = downloads.fetch_to_file(self.url, dest, expected_sha256=hashlib.sha256(FlakyRangeHandler.VIDEO).hexdigest())
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), FlakyRangeHandler.VIDEO)
+        self.assertEqual(digest, hashlib.sha256(FlakyRangeHandler.VIDEO).hexdigest())
+        self.assertFalse(os.path.exists(dest + ".part"))
+
+    def test_stale_partial_file_past_the_end_is_downloaded_again(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/video.mp4"
+        dest = os.path.join(self.dir, "video.mp4")
+
+        # Left over from a longer version of the file: the server answers 416 for its range.
+        with open(dest + ".part", "wb") as f:
+            f.write(b"\0\0\0\x18ftypmp42" + b"old" * 30_000)
+        downloads.fetch_to_file(url, dest)
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), RangeHandler.VIDEO)
+
+        # A .part that is already the whole file is kept.
+        os.rename(dest, dest + ".part")
+        digest = downloads.fetch_to_file(url, dest)
+        self.assertEqual(digest, hashlib.sha256(RangeHandler.VIDEO).hexdigest())
+
+    def test_checksum_mismatch_leaves_no_file(self):
+        dest = os.path.join(self.dir, "video.mp4")
+        with self.assertRaises(downloads.DownloadError):
+            downloads.fetch_to_file(self.url, dest, expected_sha256="0" * 64, retries=2)
+        self.assertFalse(os.path.exists(dest))
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledSessionTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.server.server_close)
+        http.reset_stats()
+
+    def test_requests_reuse_one_connection_per_host(self):
+        url = f"http://127.0.0.1:{self.server.server_port}/status"
+        session = http.get_session()
+        for _ in range(5):
+            self.assertEqual(session.get(url, timeout=5).json(), {"ok": True})
+
+        host = http.stats()["127.0.0.1"]
+        self.assertEqual(host["requests"], 5)
+        self.assertEqual(host["connections_opened"], 1)
+        self.assertEqual(host["connections_reused"], 4)
+        self.assertGreater(host["handshake_seconds"], 0)
+
+    @override_settings(HTTP_HOST_POOL_LIMITS={"127.0.0.1": 2})
+    def test_async_client_shares_limits_and_stats(self):
+        url = f"http://127.0.0.1:{self.server.server_port}/status"
+
+        async def run():
+            try:
+                client = http.get_async_client()
+                self.assertIs(http.get_async_client(), client)
+                # Eight calls at once still only get the host's two connections.
+                responses = await asyncio.gather(*(client.get(url) for _ in range(8)))
+                return [response.json() for response in responses]
+            finally:
+                await http.aclose_async_client()
+
+        self.assertEqual(asyncio.run(run()), [{"ok": True}] * 8)
+        host = http.stats()["127.0.0.1"]
+        self.assertEqual(host["requests"], 8)
+        self.assertEqual(host["connections_opened"], 2)
+        self.assertEqual(host["connections_reused"], 6)
+        self.assertGreater(host["handshake_seconds"], 0)
+
+
+class ThrottleTests(SimpleTestCase):
+    def test_rate_limiter_spaces_calls_and_backs_off(self):
+        limiter = throttle.RateLimiter(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+        limiter.throttled(retry_after=0.2)
+        self.assertEqual(limiter.rate, 25)
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+        for _ in range(40):
+            limiter.succeeded()
+        self.assertEqual(limiter.rate, 50)
+
+    def test_breaker_opens_then_probes(self):
+        breaker = throttle.CircuitBreaker(failure_threshold=0.5, window=4, min_calls=4, reset_after=0.1)
+        for ok in (True, False, False, True):
+            breaker.check()
+            breaker.record(ok)
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(throttle.CircuitOpen):
+            breaker.check()
+
+        time.sleep(0.12)
+        breaker.check()  # the single probe
+        with self.assertRaises(throttle.CircuitOpen):
+            breaker.check()
+        breaker.record(True)
+        self.assertEqual(breaker.state, "closed")
+
+
+class ProviderOutageTests(TransactionTestCase):
+    def setUp(self):
+        translations.clear_memo()
+        customer = Customer.objects.create(name="Asha", whatsapp_number="+919000000001", preferred_language="en")
+        for i in range(8):
+            Loan.objects.create(customer=customer, loan_number=f"OUT-{i}", emi_amount=1000, due_date=date.today() + timedelta(days=3))
+
+    def run_with_video(self, options, circuit_breaker=None):
+        providers = {
+            **FAKE_PROVIDERS,
+            "video": {
+                "class": "core_reminders.providers.fake.FakeVideoProvider",
+                "options": options,
+                "circuit_breaker": circuit_breaker or {},
+            },
+        }
+        with override_settings(REMINDER_PROVIDERS=providers):
+            call_command("send_reminders", no_wait=True, stdout=StringIO())
+            return throttle.counters()["video"]
+
+    def assertAllParked(self):
+        self.assertEqual(Reminder.objects.filter(status="PENDING").count(), 8)
+        self.assertFalse(Reminder.objects.filter(attempts__gt=0).exists())
+        self.assertFalse(Reminder.objects.filter(available_at__lte=timezone.now()).exists())
+
+    def test_outage_opens_circuit_and_parks_reminders(self):
+        counters = self.run_with_video({"unavailable_rate": 1.0}, {"min_calls": 3, "reset_after": 60})
+        self.assertAllParked()
+        # Three calls reach the provider, then the open circuit turns the rest away.
+        self.assertEqual(counters["calls"], 3)
+        self.assertEqual(counters["rejected"], 5)
+        self.assertEqual(counters["circuit"], "open")
+
+    def test_long_retry_after_defers_instead_of_blocking(self):
+        counters = self.run_with_video({"unavailable_rate": 1.0, "retry_after": 30})
+        self.assertAllParked()
+        self.assertEqual(counters["calls"], 1)
+        self.assertEqual(counters["deferred"], 7)
+        self.assertEqual(counters["seconds_waited"], 0)
+
+
+class DispatchTests(TransactionTestCase):
+    SENDERS = ["+14155550100", "+14155550101"]
+
+    def setUp(self):
+        self.twilio = FakeTwilioServer(sender_rate=2)
+        self.twilio.__enter__()
+        self.addCleanup(self.twilio.__exit__)
+        for i in range(6):
+            customer = Customer.objects.create(name=f"Send {i}", whatsapp_number=f"+91800000000{i}", preferred_language="en")
+            loan = Loan.objects.create(customer=customer, loan_number=f"SEND-{i}", emi_amount=900, due_date=date.today() + timedelta(days=3))
+            Reminder.objects.create(
+                customer=customer, loan=loan, due_date=loan.due_date, status="SCHEDULED", video_url=f"/reminders/videos/{i}.mp4",
+            )
+        providers = {
+            **FAKE_PROVIDERS,
+            "messaging": {
+                "class": "core_reminders.providers.twilio.TwilioMessagingProvider",
+                "options": {"account_sid": "AC1", "auth_token": "token", "from_number": "+14155550199", "api_url": self.twilio.url},
+            },
+        }
+        dispatch = {"senders": self.SENDERS, "sender_rate": 5, "backoff": 0.1}
+        settings_override = override_settings(REMINDER_PROVIDERS=providers, REMINDER_DISPATCH=dispatch, TWILIO_AUTH_TOKEN="token")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_batch_is_spread_over_senders_and_retries_throttling(self):
+        while release_scheduled() == 0:
+            pass
+        self.assertEqual(Reminder.objects.filter(status="SENT", delivery_status="queued", message_sid__startswith="SM").count(), 6)
+        # Each customer goes out from the sender its number hashes to.
+        numbers = Customer.objects.values_list("whatsapp_number", flat=True)
+        expected = Counter(f"whatsapp:{dispatcher.sender_for(number, self.SENDERS)}" for number in numbers)
+        self.assertEqual(self.twilio.sent, expected)
+        self.assertTrue(sum(self.twilio.throttled.values()) > 0)
+
+    def test_status_callbacks_only_move_forward(self):
+        from twilio.request_validator import RequestValidator
+
+        release_scheduled()
+        reminder = Reminder.objects.filter(status="SENT").first()
+        url = "http://testserver" + reverse("core_reminders:twilio_status")
+
+        def callback(status, signature=None):
+            params = {"MessageSid": reminder.message_sid, "MessageStatus": status}
+            signature = signature or RequestValidator("token").compute_signature(url, params)
+            return self.client.post(url, params, HTTP_X_TWILIO_SIGNATURE=signature)
+
+        self.assertEqual(callback("delivered").status_code, 204)
+        self.assertEqual(callback("sent").status_code, 204)
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.delivery_status, "delivered")
+
+        self.assertEqual(callback("read", signature="bad").status_code, 403)
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.delivery_status, "delivered")
+
+
+class FakeHeyGenHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def reply(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.reply(429, {"error": "slow down"}, [("Retry-After", "7")])
+
+    def do_GET(self):
+        self.reply(200, {"data": {"status": "completed", "video_url": "https://cdn.example/v1.mp4"}})
+
+    def log_message(self, *args):
+        pass
+
+
+class HeyGenAsyncTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHeyGenHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.server.server_close)
+        self.provider = HeyGenVideoProvider()
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        self.provider.generate_url = f"{base}/v2/video/generate"
+        self.provider.status_url = f"{base}/v1/video_status.get"
+
+    def test_async_submit_and_status(self):
+        async def run():
+            try:
+                with self.assertRaises(ProviderUnavailable) as raised:
+                    await self.provider.asubmit("Hello", "voice", "avatar", {"width": 640, "height": 360})
+                return raised.exception, await self.provider.astatus("v1")
+            finally:
+                await http.aclose_async_client()
+
+        error, status = asyncio.run(run())
+        self.assertEqual(error.retry_after, 7)
+        self.assertEqual(status, ("completed", "https://cdn.example/v1.mp4"))
+
+
+@skipUnless(shutil.which(settings.FFMPEG_BINARY), "ffmpeg not installed")
+class LocalRenderTests(TransactionTestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.addCleanup(local_render.shutdown)
+        self.local = {"enabled": True, "workers": 2, "deadline": 60}
+
+    def streams(self, url):
+        probe = subprocess.run(
+            [settings.FFMPEG_BINARY, "-i", video_storage.local_path(url)], capture_output=True, text=True,
+        )
+        return "Video: h264" in probe.stderr, "Audio: aac" in probe.stderr
+
+    def test_still_avatar_with_reused_audio(self):
+        avatar = os.path.join(self.media_root, "avatar.png")
+        subprocess.run(
+            [settings.FFMPEG_BINARY, "-loglevel", "error", "-f", "lavfi", "-i", "color=c=red:s=320x320", "-frames:v", "1", avatar],
+            check=True,
+        )
+        customer = Customer(name="Local", preferred_language="en")
+        with override_settings(
+            MEDIA_ROOT=self.media_root, REMINDER_PROVIDERS=FAKE_PROVIDERS,
+            REMINDER_LOCAL_RENDER={**self.local, "avatar": avatar},
+        ):
+            first, same, other = local_render.render_many(
+                [("Your EMI is due.", customer), ("Your EMI is due.", customer), ("Your EMI has bounced.", customer)]
+            )
+            self.assertEqual(first, same)
+            self.assertNotEqual(first, other)
+            self.assertEqual(self.streams(first), (True, True))
+            self.assertEqual(len(os.listdir(os.path.join(self.media_root, "voice_cache"))), 2)
+
+            # Already rendered: served from the render cache without speaking it again.
+            self.assertEqual(local_render.fallback("Your EMI is due.", customer), first)
+            self.assertEqual(throttle.counters()["voice"]["calls"], 2)
+
+    def test_failure_callback_renders_locally(self):
+        for i in range(2):
+            customer = Customer.objects.create(name=f"Hook {i}", whatsapp_number=f"+91720000000{i}")
+            Loan.objects.create(customer=customer, loan_number=f"HOOKFAIL-{i}", emi_amount=800, due_date=date.today() + timedelta(days=3))
+        with override_settings(MEDIA_ROOT=self.media_root, REMINDER_PROVIDERS=FAKE_PROVIDERS, REMINDER_LOCAL_RENDER=self.local):
+            call_command("send_reminders", no_wait=True, stdout=StringIO())
+            video_id = Reminder.objects.values_list("heygen_video_id", flat=True).first()
+            event = {"event_type": webhooks.FAIL_EVENT, "event_data": {"video_id": video_id, "msg": "quota"}}
+            self.assertEqual(webhooks.handle_event(event, downloads=webhooks.download_pool()), 1)
+            webhooks.drain()
+            reminder = Reminder.objects.get(heygen_video_id=video_id)
+            self.assertEqual(reminder.status, "SENT")
+            self.assertEqual(self.streams(reminder.video_url), (True, True))
+            # A repeated callback finds nothing left to do.
+            self.assertEqual(webhooks.handle_event(event), 0)
+
+    def test_poller_renders_failures_on_the_download_pool(self):
+        for i in range(2):
+            customer = Customer.objects.create(name=f"Pool {i}", whatsapp_number=f"+91730000000{i}")
+            Loan.objects.create(customer=customer, loan_number=f"POOLFAIL-{i}", emi_amount=800, due_date=date.today() + timedelta(days=3))
+        providers = {
+            **FAKE_PROVIDERS,
+            "video": {"class": "core_reminders.providers.fake.FakeVideoProvider", "options": {"render_failure_rate": 1.0}},
+        }
+        submitted = []
+
+        class RecordingPool(downloads.DownloadPool):
+            def submit(self, fn, *args):
+                submitted.append(fn)
+                return super().submit(fn, *args)
+
+        with override_settings(MEDIA_ROOT=self.media_root, REMINDER_PROVIDERS=providers, REMINDER_LOCAL_RENDER=self.local):
+            call_command("send_reminders", no_wait=True, stdout=StringIO())
+            Reminder.objects.update(next_poll_at=None)
+            with RecordingPool() as pool:
+                video_poller.poll_once(downloads=pool)
+                self.assertEqual(submitted, [video_poller.render_locally_in_background])
+            self.assertEqual(Reminder.objects.filter(status="SENT").count(), 2)
+
+    def test_send_reminders_renders_locally_while_heygen_is_down(self):
+        for i in range(3):
+            customer = Customer.objects.create(name=f"Down {i}", whatsapp_number=f"+91710000000{i}")
+            Loan.objects.create(customer=customer, loan_number=f"DOWN-{i}", emi_amount=800, due_date=date.today() + timedelta(days=3))
+        providers = {
+            **FAKE_PROVIDERS,
+            "video": {"class": "core_reminders.providers.fake.FakeVideoProvider", "options": {"unavailable_rate": 1.0}},
+        }
+        with override_settings(MEDIA_ROOT=self.media_root, REMINDER_PROVIDERS=providers, REMINDER_LOCAL_RENDER=self.local):
+            call_command("send_reminders", workers=3, stdout=StringIO())
+            self.assertEqual(Reminder.objects.filter(status="SENT").count(), 3)
+            self.assertEqual(self.streams(Reminder.objects.first().video_url), (True, True))
+
+
+@override_settings(HEYGEN_WEBHOOK_SECRET="test-secret", REMINDER_PROVIDERS=FAKE_PROVIDERS)
+class HeyGenWebhookTests(LiveServerTestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        for i in range(3):
+            customer = Customer.objects.create(name=f"Hook {i}", whatsapp_number=f"+91700000000{i}", preferred_language="en")
+            Loan.objects.create(customer=customer, loan_number=f"HOOK-{i}", emi_amount=750, due_date=date.today() + timedelta(days=3))
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command("send_reminders", no_wait=True, stdout=StringIO())
+        self.url = reverse("core_reminders:heygen_webhook")
+
+    def test_simulated_callbacks_send_reminders(self):
+        # Without callbacks, the poller would only look again in five minutes.
+        reminder = Reminder.objects.first()
+        self.assertEqual(reminder.next_poll_at - reminder.submitted_at, timedelta(seconds=300))
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command("simulate_heygen_webhook", url=self.live_server_url + self.url, stdout=StringIO())
+            webhooks.drain()
+
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), 3)
+        self.assertFalse(Reminder.objects.filter(lease_owner__isnull=False).exists())
+
+    def test_repeated_callback_is_ignored(self):
+        video_id = Reminder.objects.values_list("heygen_video_id", flat=True).first()
+        event = {"event_type": webhooks.SUCCESS_EVENT, "event_data": {"video_id": video_id, "url": "fake://v.mp4"}}
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.assertEqual(webhooks.handle_event(event), 1)
+            self.assertEqual(webhooks.handle_event(event), 0)
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), 1)
+
+    def test_bad_signature_is_rejected(self):
+        body = json.dumps({"event_type": webhooks.FAIL_EVENT, "event_data": {"video_id": "x"}})
+        resp = self.client.post(self.url, data=body, content_type="application/json", HTTP_SIGNATURE="0" * 64)
+        self.assertEqual(resp.status_code, 403)
+
+        resp = self.client.post(
+            self.url, data=body, content_type="application/json", HTTP_SIGNATURE=webhooks.signature(body.encode()),
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Reminder.objects.filter(status="GENERATING").count(), 3)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        customer = Customer.objects.create(name="Meera", whatsapp_number="+919111111111", preferred_language="en")
+        for i in range(4):
+            Loan.objects.create(customer=customer, loan_number=f"MET-{i}", emi_amount=900, due_date=date.today() + timedelta(days=3))
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, MEDIA_ROOT=self.media_root):
+            call_command("send_reminders", stdout=StringIO())
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_endpoint_exposes_stages_statuses_and_last_run(self):
+        resp = self.client.get(reverse("core_reminders:metrics"), HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = resp.content.decode()
+        self.assertIn('emi_stage_seconds_count{stage="video"} 4', text)
+        self.assertIn('emi_stage_seconds_bucket{stage="video",le="+Inf"} 4', text)
+        self.assertIn('emi_reminders{status="SENT"} 4', text)
+        self.assertIn('emi_run_outcomes{command="send_reminders",status="SENT"} 4', text)
+        self.assertIn('emi_provider_calls_total{provider="video"}', text)
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_endpoint_token(self):
+        self.assertEqual(self.client.get(reverse("core_reminders:metrics")).status_code, 403)
+        resp = self.client.get(reverse("core_reminders:metrics"), HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(resp.status_code, 200)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_endpoint_without_a_token_is_closed_outside_debug(self):
+        self.assertEqual(self.client.get(reverse("core_reminders:metrics")).status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse("core_reminders:metrics")).status_code, 200)
+
+    def test_run_summary_command(self):
+        out = StringIO()
+        call_command("reminder_metrics", runs=1, stdout=out)
+        self.assertIn("send_reminders", out.getvalue())
+        self.assertIn("'SENT': 4", out.getvalue())
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.customer = Customer.objects.create(name="Kiran", whatsapp_number="+919222222222", preferred_language="en")
+        self.today = timezone.localdate()
+
+    def add_loans(self, days_until_due, count):
+        for i in range(count):
+            Loan.objects.create(
+                customer=self.customer, loan_number=f"SCH-{days_until_due}-{i}", emi_amount=800,
+                due_date=self.today + timedelta(days=days_until_due),
+            )
+
+    def send_reminders(self, **schedule):
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, MEDIA_ROOT=self.media_root, REMINDER_SCHEDULE=schedule):
+            out = StringIO()
+            call_command("send_reminders", stdout=out)
+            return out.getvalue()
+
+    def test_plan_moves_overflow_to_earlier_days(self):
+        d = self.today
+        day = lambda n: d + timedelta(days=n)
+        self.assertEqual(
+            scheduler.plan({day(3): 5, day(5): 12}, capacity=5, today=d),
+            {day(2): 2, day(3): 5, day(4): 5, day(5): 5},
+        )
+        # Missed days and anything that can't be moved earlier all land on today.
+        self.assertEqual(scheduler.plan({day(-1): 3, d: 8}, capacity=5, today=d), {d: 11})
+
+    def test_missed_days_are_caught_up_and_spikes_rendered_early(self):
+        self.add_loans(1, 1)  # its reminder should have gone out two days ago
+        self.add_loans(3, 1)
+        self.add_loans(4, 5)  # month-end spike, more than tomorrow can render
+        self.add_loans(20, 1)  # outside the window
+
+        out = self.send_reminders(daily_capacity=2)
+
+        self.assertIn("Queued 5 reminders.", out)
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), 2)
+        early = Reminder.objects.filter(status="SCHEDULED")
+        self.assertEqual(early.count(), 3)
+        self.assertTrue(all(r.due_date == self.today + timedelta(days=4) for r in early))
+        self.assertTrue(all(timezone.localdate(r.send_after) == self.today + timedelta(days=1) for r in early))
+        # Not yet time to send them.
+        self.assertIsNone(release_scheduled())
+        self.assertEqual(Reminder.objects.filter(status="SENT").count(), 2)
+
+    def test_sends_are_released_under_the_per_minute_cap(self):
+        self.add_loans(3, 3)
+        self.send_reminders(sends_per_minute=2)
+        self.assertEqual(Reminder.objects.filter(status="SCHEDULED").count(), 3)
+
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, REMINDER_SCHEDULE={"sends_per_minute": 2}):
+            release_scheduled()
+            self.assertEqual(Reminder.objects.filter(status="SENT").exclude(dispatched_at=None).count(), 2)
+            wait = release_scheduled()
+        self.assertGreater(wait, 0)
+        self.assertEqual(Reminder.objects.filter(status="SCHEDULED").count(), 1)
+
+    def test_no_sends_outside_the_send_window(self):
+        self.add_loans(3, 1)
+        closed_today = [day for day in range(7) if day != self.today.weekday()]
+        self.send_reminders(send_weekdays=closed_today)
+        reminder = Reminder.objects.get()
+        self.assertEqual(reminder.status, "SCHEDULED")
+        self.assertEqual(timezone.localdate(reminder.send_after), self.today + timedelta(days=1))
+
+        Reminder.objects.update(send_after=None)
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, REMINDER_SCHEDULE={"send_weekdays": closed_today}):
+            wait = release_scheduled()
+        self.assertGreater(wait, 0)
+        self.assertEqual(Reminder.objects.get().status, "SCHEDULED")
+
+
+class EventDetectionTests(TestCase):
+    def setUp(self):
+        translations.clear_memo()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        customer = Customer.objects.create(name="Meena", whatsapp_number="+919333333333", preferred_language="en")
+        self.today = timezone.localdate()
+        self.nach = Loan.objects.create(
+            customer=customer, loan_number="EV-NACH", emi_amount=900, due_date=self.today + timedelta(days=6), nach_active=True,
+        )
+        self.plain = Loan.objects.create(customer=customer, loan_number="EV-PLAIN", emi_amount=900, due_date=self.today + timedelta(days=3))
+
+    def test_only_changed_loans_are_queued_again(self):
+        self.assertEqual(events.detect(), {"BOUNCE_REMINDER": 0, "NACH_REMINDER": 1})
+        nach = Reminder.objects.get(event_type="NACH_REMINDER")
+        # Rendered and sent the day before the presentation, not now.
+        self.assertEqual(nach.available_at, nach.send_after)
+        self.assertEqual(timezone.localdate(nach.send_after), self.nach.due_date - timedelta(days=1))
+        self.assertEqual(events.detect(), {"BOUNCE_REMINDER": 0, "NACH_REMINDER": 0})
+
+        self.plain.bounce_count += 1
+        self.plain.save()
+        self.assertEqual(events.detect()["BOUNCE_REMINDER"], 1)
+        self.assertEqual(events.detect()["BOUNCE_REMINDER"], 0)
+
+        # The next cycle gets its own NACH reminder, but the old bounce isn't repeated.
+        self.plain.refresh_from_db()
+        self.nach.due_date += timedelta(days=30)
+        self.nach.save()
+        self.plain.due_date += timedelta(days=30)
+        self.plain.save()
+        self.assertEqual(events.detect(), {"BOUNCE_REMINDER": 0, "NACH_REMINDER": 1})
+
+    def test_bulk_updates_must_move_updated_at(self):
+        Loan.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        events.detect()
+        EventCursor.objects.update(position=timezone.now())
+        # QuerySet.update() leaves auto_now fields alone, so this bounce is invisible...
+        Loan.objects.filter(pk=self.plain.pk).update(bounce_count=F("bounce_count") + 1)
+        self.assertEqual(events.detect()["BOUNCE_REMINDER"], 0)
+        # ...until updated_at moves with it.
+        Loan.objects.filter(pk=self.plain.pk).update(bounce_count=F("bounce_count") + 1, updated_at=Now())
+        self.assertEqual(events.detect()["BOUNCE_REMINDER"], 1)
+
+    def test_admin_cannot_rewind_bounces_reminded(self):
+        from core_reminders.admin import LoanAdmin
+        from django.contrib.admin.sites import site
+
+        self.assertNotIn("bounces_reminded", LoanAdmin(Loan, site).get_form(None, self.plain).base_fields)
+
+    def test_reads_from_the_cursor(self):
+        events.detect()
+        EventCursor.objects.update(position=timezone.now() + timedelta(hours=1))
+        self.plain.bounce_count += 1
+        self.plain.save()
+        # Changed before the (moved) cursor, so this run doesn't look at it.
+        self.assertEqual(events.detect()["BOUNCE_REMINDER"], 0)
+
+    def test_all_event_types_go_through_one_run(self):
+        self.plain.bounce_count = 1
+        self.plain.save()
+        with override_settings(REMINDER_PROVIDERS=FAKE_PROVIDERS, MEDIA_ROOT=self.media_root):
+            out = StringIO()
+            call_command("send_reminders", stdout=out)
+        self.assertIn("Queued 1 BOUNCE_REMINDER reminders.", out.getvalue())
+        sent = Reminder.objects.filter(loan=self.plain, status="SENT")
+        self.assertEqual(set(sent.values_list("event_type", flat=True)), {"EMI_DUE", "BOUNCE_REMINDER"})
+        # The NACH reminder waits, unclaimed, for the day before its presentation.
+        self.assertEqual(Reminder.objects.get(event_type="NACH_REMINDER").status, "PENDING")
+
+
+class ScriptBatchTests(TestCase):
+    def setUp(self):
+        translations.clear_memo()
+        translations.prefetch(
+            ["Tamil"],
+            translate_batch=lambda templates, language: {et: f"[{language}] {t}" for et, t in templates.items()},
+        )
+        english = Customer.objects.create(name="Asha", whatsapp_number="+919333333333", preferred_language="en")
+        tamil = Customer.objects.create(name="Kavya", whatsapp_number="+919333333334", preferred_language="Tamil")
+        for i in range(6):
+            Loan.objects.create(
+                customer=tamil if i % 2 else english, loan_number=f"BAT-{i}",
+                emi_amount=Decimal("1234567.50") if i == 0 else 1500 + i, due_date=date(2025, 10, 27),
+            )
+
+    def test_indian_amounts_and_localized_dates(self):
+        self.assertEqual(group_indian("123456789"), "12,34,56,789")
+        self.assertEqual(group_indian("999"), "999")
+        self.assertEqual(format_amount(Decimal("1500.00")), "₹1,500")
+        self.assertEqual(format_amount(Decimal("1234567.5")), "₹12,34,567.50")
+        self.assertEqual(format_date(date(2025, 10, 7)), "07 October 2025")
+        self.assertEqual(format_date(date(2025, 10, 27), "Hindi"), "27 अक्टूबर 2025")
+        self.assertEqual(format_date(date(2025, 10, 27), "Kannada"), "27 ಅಕ್ಟೋಬರ್ 2025")
+        self.assertEqual(format_date(date(2025, 7, 1), "Telugu"), "01 జులై 2025")
+
+    def test_batch_matches_one_at_a_time(self):
+        expected = {loan.id: generate_script("EMI_DUE", loan.customer, loan) for loan in Loan.objects.select_related("customer")}
+        self.assertIn("₹12,34,567.50", expected[Loan.objects.get(loan_number="BAT-0").id])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(dict(generate_scripts("EMI_DUE", Loan.objects.all(), chunk_size=2)), expected)
+
+        rows = Loan.objects.values("id", "loan_number", "emi_amount", "due_date", "customer__name", "customer__preferred_language")
+        self.assertEqual(dict(generate_scripts("EMI_DUE", list(rows))), expected)
+
+
+class ImportLoansTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write_csv(self, name, lines):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def test_csv_upserts_and_rejects(self):
+        header = "whatsapp_number,customer_name,preferred_language,loan_number,emi_amount,due_date"
+        first = self.write_csv("book.csv", [
+            header,
+            "+91 90000 00001,Ravi,Hindi,IMP-1,1500,2025-11-05",
+            "+919000000002,Sita,en,IMP-2,\"2,500.50\",2025-11-06",
+            "+919000000002,Sita,en,IMP-3,700,2025-11-07",
+            "+919000000003,Nobody,en,IMP-4,abc,2025-11-07",
+            "+919000000004,Late,en,IMP-5,900,07/11/2025",
+            ",Blank,en,IMP-6,900,2025-11-07",
+        ])
+        rejects = os.path.join(self.dir, "rejects.csv")
+        out = StringIO()
+        call_command("import_loans", first, chunk_size=2, rejects=rejects, stdout=out)
+
+        self.assertIn("Imported 3 of 6 rows", out.getvalue())
+        self.assertIn("Rejected 3 rows", out.getvalue())
+        self.assertEqual(Customer.objects.count(), 2)
+        self.assertEqual(Loan.objects.get(loan_number="IMP-2").emi_amount, Decimal("2500.50"))
+        self.assertEqual(Loan.objects.get(loan_number="IMP-1").customer.whatsapp_number, "+919000000001")
+        with open(rejects, encoding="utf-8") as f:
+            reasons = [row["reject_reason"] for row in csv.DictReader(f)]
+        self.assertEqual(sorted(reasons), ["bad due_date", "bad emi_amount", "missing whatsapp_number"])
+
+        Loan.objects.filter(loan_number="IMP-3").update(is_active=False)
+        second = self.write_csv("update.csv", [
+            header,
+            "+919000000002,Sita Devi,Tamil,IMP-3,750,2025-12-07",
+        ])
+        call_command("import_loans", second, stdout=StringIO())
+
+        loan = Loan.objects.select_related("customer").get(loan_number="IMP-3")
+        self.assertEqual((loan.emi_amount, loan.due_date), (Decimal("750.00"), date(2025, 12, 7)))
+        self.assertEqual((loan.customer.name, loan.customer.preferred_language), ("Sita Devi", "Tamil"))
+        # is_active isn't in the file, so it is left alone.
+        self.assertFalse(loan.is_active)
+        self.assertEqual(Loan.objects.count(), 3)
+
+    def test_rows_the_database_would_refuse_are_rejected(self):
+        header = "whatsapp_number,customer_name,preferred_language,loan_number,emi_amount,due_date,bounce_count"
+        path = self.write_csv("odd.csv", [
+            header,
+            "+919000000011,Ravi,en,IMP-11,NaN,2025-11-05,0",
+            "+919000000012,Ravi,en,IMP-12,sNaN,2025-11-05,0",
+            f"+919000000013,Ravi,en,{'L' * 101},900,2025-11-05,0",
+            f"+919000000014,Ravi,{'x' * 51},IMP-14,900,2025-11-05,0",
+            "+919000000015,Ravi,en,IMP-15,900,2025-11-05,-1",
+            "+919000000016,Ravi,en,IMP-16,900,2025-11-05,2",
+        ])
+        rejects = os.path.join(self.dir, "rejects.csv")
+        out = StringIO()
+        call_command("import_loans", path, rejects=rejects, stdout=out)
+
+        self.assertIn("Imported 1 of 6 rows", out.getvalue())
+        self.assertEqual(list(Loan.objects.values_list("loan_number", flat=True)), ["IMP-16"])
+        with open(rejects, encoding="utf-8") as f:
+            reasons = [row["reject_reason"] for row in csv.DictReader(f)]
+        self.assertEqual(sorted(reasons), [
+            "bad bounce_count", "bad emi_amount", "bad emi_amount", "loan_number too long", "preferred_language too long",
+        ])
+
+    def test_row_the_database_refuses_only_rejects_itself(self):
+        # Stands in for a constraint only the database knows about.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TRIGGER refuse_loan BEFORE INSERT ON core_reminders_loan "
+                "WHEN NEW.loan_number = 'IMP-23' BEGIN SELECT RAISE(ABORT, 'loan refused'); END"
+            )
+        self.addCleanup(lambda: connection.cursor().execute("DROP TRIGGER IF EXISTS refuse_loan"))
+        header = "whatsapp_number,customer_name,loan_number,emi_amount,due_date"
+        path = self.write_csv("book.csv", [header] + [
+            f"+91900000002{i},Ravi {i},IMP-2{i},900,2025-11-05" for i in range(6)
+        ])
+        rejects = os.path.join(self.dir, "rejects.csv")
+        out = StringIO()
+        call_command("import_loans", path, chunk_size=4, rejects=rejects, stdout=out)
+
+        self.assertIn("Imported 5 of 6 rows", out.getvalue())
+        self.assertIn("5 customer and 5 loan upserts", out.getvalue())
+        self.assertEqual(
+            sorted(Loan.objects.values_list("loan_number", flat=True)), ["IMP-20", "IMP-21", "IMP-22", "IMP-24", "IMP-25"],
+        )
+        with open(rejects, encoding="utf-8") as f:
+            self.assertEqual(
+                [(row["loan_number"], row["reject_reason"]) for row in csv.DictReader(f)],
+                [("IMP-23", "rejected by the database")],
+            )
+
+    def test_reimported_bounces_are_detected(self):
+        header = "whatsapp_number,customer_name,loan_number,emi_amount,due_date,nach_active,bounce_count"
+        due = (timezone.localdate() + timedelta(days=20)).isoformat()
+        call_command("import_loans", self.write_csv("book.csv", [header, f"+919000000009,Ravi,IMP-9,900,{due},yes,0"]), stdout=StringIO())
+        self.assertEqual(events.detect(), {"NACH_REMINDER": 1, "BOUNCE_REMINDER": 0})
+
+        call_command("import_loans", self.write_csv("bounced.csv", [header, f"+919000000009,Ravi,IMP-9,900,{due},yes,1"]), stdout=StringIO())
+        self.assertEqual(events.detect(), {"NACH_REMINDER": 0, "BOUNCE_REMINDER": 1})
+
+    def test_missing_columns(self):
+        path = self.write_csv("bad.csv", ["loan_number,emi_amount", "X,1"])
+        with self.assertRaisesMessage(CommandError, "missing columns"):
+            call_command("import_loans", path, stdout=StringIO())
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+
+    def add_reminders(self, n, start=0):
+        for i in range(start, start + n):
+            customer = Customer.objects.create(name=f"Admin {i}", whatsapp_number=f"+9198{i:08d}")
+            loan = Loan.objects.create(customer=customer, loan_number=f"ADM-{i}", emi_amount=600, due_date=date(2025, 11, 1))
+            Reminder.objects.create(
+                customer=customer, loan=loan, event_type="EMI_DUE", due_date=loan.due_date,
+                status="SENT", video_url=f"/tmp/reminder_videos/adm_{i}.mp4",
+            )
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(queries), resp.content.decode()
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = [reverse(f"admin:core_reminders_{model}_changelist") for model in ("reminder", "loan", "customer")]
+        self.add_reminders(3)
+        few = [self.changelist_queries(url)[0] for url in urls]
+        self.add_reminders(30, start=3)
+        many = [self.changelist_queries(url)[0] for url in urls]
+        self.assertEqual(few, many)
+
+        _, html = self.changelist_queries(urls[0])
+        self.assertNotIn("<video", html)
+        self.assertIn("/media/reminder_videos/adm_0.mp4", html)
+
+    def test_delivery_status_filter_uses_an_index(self):
+        self.add_reminders(3)
+        url = reverse("admin:core_reminders_reminder_changelist")
+        self.assertEqual(self.client.get(url, {"delivery_status": "delivered"}).status_code, 200)
+        self.assertIn("reminder_delivery_status_idx", Reminder.objects.filter(delivery_status="delivered").explain())
+
+    def test_search_by_loan_number(self):
+        self.add_reminders(3)
+        _, html = self.changelist_queries(reverse("admin:core_reminders_reminder_changelist") + "?q=ADM-1")
+        self.assertIn("1 reminder", html)
+
+
+class ImportTimeTests(SimpleTestCase):
+    """Every manage.py command and WSGI worker pays for these imports, so provider SDKs must stay out."""
+
+    HEAVY_MODULES = {"openai", "elevenlabs", "httpx", "requests", "urllib3", "torch", "transformers", "pyarrow", "twilio"}
+    BUDGET_SECONDS = 1.5
+
+    def test_startup_imports(self):
+        code = "import django; django.setup(); import emi_reminders.urls, core_reminders.utils.pipeline"
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=settings.BASE_DIR, env={**os.environ, "DJANGO_SETTINGS_MODULE": "emi_reminders.settings"},
+            capture_output=True, text=True, check=True,
+        )
+        modules, total = set(), 0
+        for line in result.stderr.splitlines():
+            fields = line.removeprefix("import time:").split("|")
+            if len(fields) != 3 or not fields[1].strip().isdigit():
+                continue
+            name = fields[2]
+            modules.add(name.strip().split(".")[0])
+            if not name.startswith("  "):  # top-level import; its cumulative time covers everything below it
+                total += int(fields[1])
+
+        self.assertEqual(modules & self.HEAVY_MODULES, set())
+        self.assertLess(total / 1e6, self.BUDGET_SECONDS)
+
+
+class VideoStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        customer = Customer.objects.create(name="Store", whatsapp_number="+919500000000")
+        self.loan = Loan.objects.create(customer=customer, loan_number="VID-1", emi_amount=900, due_date=date(2025, 11, 1))
+
+    def incoming(self, name, content):
+        path = os.path.join(video_storage.incoming_dir(), name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def reminder(self, url, **fields):
+        return Reminder.objects.create(
+            customer=self.loan.customer, loan=self.loan, event_type="EMI_DUE",
+            due_date=self.loan.due_date + timedelta(days=Reminder.objects.count()), video_url=url, **fields,
+        )
+
+    def test_identical_videos_are_stored_once(self):
+        first = video_storage.save(self.incoming("a.mp4", b"same render"))
+        second = video_storage.save(self.incoming("b.mp4", b"same render"))
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(StoredVideo.objects.count(), 1)
+        self.assertRegex(first.name, r"^\d{4}/\d{2}/\d{2}/[0-9a-f]{2}/[0-9a-f]{64}\.mp4$")
+        self.assertTrue(first.url.startswith(settings.REMINDER_VIDEO_URL))
+        self.assertEqual(os.listdir(video_storage.incoming_dir()), [])
+
+    def test_prune_keeps_videos_still_needed(self):
+        old = timezone.now() - timedelta(days=40)
+        sent = video_storage.save(self.incoming("sent.mp4", b"sent long ago"), moment=old)
+        waiting = video_storage.save(self.incoming("waiting.mp4", b"not sent yet"), moment=old)
+        StoredVideo.objects.update(created_at=old)
+        done = self.reminder(sent.url, status="SENT", dispatched_at=old)
+        self.reminder(waiting.url, status="SCHEDULED")
+
+        self.assertEqual(video_storage.prune(days=30, dry_run=True), (1, sent.size_bytes))
+        self.assertTrue(video_storage.get_storage().exists(sent.name))
+
+        call_command("prune_videos", days=30, stdout=StringIO())
+        self.assertFalse(video_storage.get_storage().exists(sent.name))
+        self.assertTrue(video_storage.get_storage().exists(waiting.name))
+        self.assertEqual(list(StoredVideo.objects.values_list("pk", flat=True)), [waiting.pk])
+        done.refresh_from_db()
+        self.assertIsNone(done.video_url)
+
+    def test_video_view(self):
+        stored = video_storage.save(self.incoming("v.mp4", b"video bytes"))
+        url = reverse("core_reminders:video", args=[stored.name])
+        self.assertEqual(url, stored.url)
+
+        resp = self.client.get(url)
+        self.assertEqual(b"".join(resp.streaming_content), b"video bytes")
+        self.assertEqual(self.client.get(url.replace(".mp4", ".mov")).status_code, 404)
+        self.assertEqual(self.client.get(reverse("core_reminders:video", args=["../../etc/passwd"])).status_code, 404)
+
+        with override_settings(REMINDER_VIDEO_SENDFILE="x-accel-redirect"):
+            resp = self.client.get(url)
+        self.assertEqual(resp["X-Accel-Redirect"], f"/internal/reminder_videos/{stored.name}")
+        self.assertEqual(resp.content, b"")
@@ -0,0 +1,11 @@
+from django.urls import path
+from core_reminders import views
+
+app_name = 'core_reminders'
+
+urlpatterns = [
+    path('webhooks/heygen/', views.heygen_webhook, name='heygen_webhook'),
+    path('webhooks/twilio/status/', views.twilio_status, name='twilio_status'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('videos/<path:name>', views.video, name='video'),
+]
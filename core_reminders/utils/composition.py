@@ -0,0 +1,173 @@
+"""
+Template-segment composition.
+
+Every BASE_SCRIPTS template is split into static text and {slot} segments.
+Static segments are rendered once per (text, voice) and served from the render
+cache afterwards; only the short slot segments are rendered per customer. The
+clips are then joined locally with ffmpeg's concat demuxer using stream copy,
+so nothing is re-encoded.
+"""
+import hashlib
+import logging
+import os
+import string
+import subprocess
+import tempfile
+import time
+from django.conf import settings
+from core_reminders.utils import render_cache, translations, video_storage
+from core_reminders.utils.reminder_utils import (
+    download_video,
+    get_video_status,
+    render_key_for,
+    script_context,
+    submit_video,
+)
+
+
+def ffmpeg_binary():
+    return getattr(settings, "FFMPEG_BINARY", "ffmpeg")
+
+
+def split_template(template):
+    """
+    "Hello {customer_name}, your EMI" -> [("static", "Hello"), ("slot", "customer_name"), ("static", ", your EMI")]
+    Whitespace-only static pieces are dropped; the avatar's pause between clips covers them.
+    """
+    segments = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        if literal.strip():
+            segments.append(("static", literal.strip()))
+        if field:
+            segments.append(("slot", field))
+    return segments
+
+
+def segment_texts(template, context):
+    return [text if kind == "static" else str(context[text]) for kind, text in split_template(template)]
+
+
+def heygen_renderer(customer, timeout=480, poll_interval=8):
+    """
+    Returns render(texts) -> [local clip paths]. Cache misses are all submitted
+    up front and then polled together, so a template's slots render in parallel.
+    """
+    def render(texts):
+        paths = [None] * len(texts)
+        pending = {}
+        for i, text in enumerate(texts):
+            key = render_key_for(text, customer)
+            url = render_cache.lookup(key)
+            if url:
+                paths[i] = video_storage.local_path(url)
+                continue
+            video_id = submit_video(text, customer)
+            if not video_id:
+                return None
+            pending[i] = (video_id, key)
+
+        elapsed = 0
+        while pending and elapsed < timeout:
+            for i, (video_id, key) in list(pending.items()):
+                status, video_url = get_video_status(video_id)
+                if status == "failed":
+                    return None
+                if status == "completed":
+                    paths[i] = video_storage.local_path(download_video(video_id, video_url, cache_key=key))
+                    del pending[i]
+            if pending:
+                time.sleep(poll_interval)
+                elapsed += poll_interval
+
+        if pending:
+            logging.error("Segment rendering timed out.")
+            return None
+        return paths
+
+    return render
+
+
+def fixture_renderer(work_dir, seconds_per_char=0.05, size="640x360"):
+    """
+    Offline stand-in for heygen_renderer: one solid-colour clip with a sine tone
+    per segment, generated with ffmpeg lavfi. Clips share codec parameters so
+    they can be concatenated exactly like real renders.
+    """
+    def render(texts):
+        paths = []
+        for text in texts:
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+            path = os.path.join(work_dir, f"fixture_{digest}.mp4")
+            if not os.path.exists(path):
+                duration = max(0.5, len(text) * seconds_per_char)
+                subprocess.run(
+                    [
+                        ffmpeg_binary(), "-y", "-loglevel", "error",
+                        "-f", "lavfi", "-i", f"color=c=0x{digest[:6]}:s={size}:r=25:d={duration}",
+                        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+                        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest",
+                        path,
+                    ],
+                    check=True,
+                )
+            paths.append(path)
+        return paths
+
+    return render
+
+
+def concat_segments(paths, output_path):
+    """Joins clips with the concat demuxer and -c copy (no re-encode)."""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+        list_path = f.name
+    try:
+        subprocess.run(
+            [
+                ffmpeg_binary(), "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy", "-movflags", "+faststart",
+                output_path,
+            ],
+            check=True,
+        )
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def compose_video(event_type, customer, loan, render=None):
+    """
+    Builds the reminder video from cached static segments plus per-customer slot
+    segments. Returns the web URL, or None when composition is not possible
+    (unknown template, language not translated yet, failed segment) so the
+    caller can fall back to a full render.
+    """
+    template = translations.get_template(event_type, getattr(customer, "preferred_language", "en"))
+    if not template:
+        return None
+
+    texts = segment_texts(template, script_context(customer, loan))
+    full_key = render_key_for("\n".join(texts), customer)
+    cached_url = render_cache.lookup(full_key)
+    if cached_url:
+        return cached_url
+
+    if render is None:
+        render = heygen_renderer(customer)
+    paths = render(texts)
+    if not paths:
+        return None
+
+    output_path = os.path.join(video_storage.incoming_dir(), f"composed_{full_key[:32]}.mp4")
+    try:
+        concat_segments(paths, output_path)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.error(f"Segment concatenation failed: {e}")
+        return None
+
+    stored = video_storage.save(output_path)
+    render_cache.store(full_key, stored)
+    return stored.url
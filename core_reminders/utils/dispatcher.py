@@ -0,0 +1,253 @@
+"""
+WhatsApp dispatch stage.
+
+Finished videos are not sent inline by the render pipeline. complete_reminder()
+queues them as SCHEDULED and release_scheduled() sends them in batches:
+poll_videos calls it on every tick, and send_reminders calls it as it goes
+(DispatchStage) unless sends are held for a window or rate (see scheduler).
+
+- Each batch is claimed under a lease, so two processes never send the same reminder.
+- Sends run concurrently on REMINDER_STAGE_LIMITS["whatsapp"] threads.
+- Every sender number has its own token bucket of sender_rate messages per
+  second, which is halved when that number gets throttled. Customers are spread
+  over the senders by a hash of their number, so a conversation stays on one sender.
+- ProviderUnavailable (429, 5xx, network errors) is retried up to max_attempts
+  times, with exponential backoff and full jitter so throttled workers don't
+  retry in lockstep. A reminder that still can't go out stays SCHEDULED until
+  the provider should be back.
+- Outcomes (status, message SID, first delivery status) are written back with
+  one bulk_update per batch.
+
+Delivery receipts arrive later at the status callback (views.twilio_status),
+and record_delivery() moves delivery_status forward.
+
+Settings go in REMINDER_DISPATCH; anything left out keeps DEFAULTS.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils import timezone
+from core_reminders.models import Reminder
+from core_reminders.providers.base import ProviderUnavailable
+from core_reminders.utils import metrics, scheduler
+from core_reminders.utils.pipeline import DEFAULT_STAGE_LIMITS, POLL_MAX_INTERVAL, REMINDER_BATCH_SIZE, ReminderUpdates
+from core_reminders.utils.reminder_utils import send_whatsapp_video
+from core_reminders.utils.throttle import CircuitOpen, RateLimiter
+
+
+DEFAULTS = {
+    # Numbers to send from, e.g. ["+14155550100", "+14155550101"]. Empty uses the provider's default.
+    "senders": [],
+    # Messages per second per sender number.
+    "sender_rate": 20,
+    "max_attempts": 4,
+    # Retry n waits uniform(0, min(max_backoff, backoff * 2 ** n)) seconds, or Retry-After if longer.
+    "backoff": 0.5,
+    "max_backoff": 20,
+}
+
+# A batch not written back after this long is assumed lost with its process.
+SEND_LEASE_SECONDS = 600
+
+# Provider message statuses in the order they happen. A late callback never moves a reminder backwards.
+DELIVERY_ORDER = {
+    "accepted": 0, "scheduled": 0, "queued": 1, "sending": 2, "sent": 3,
+    "delivered": 4, "undelivered": 4, "failed": 4, "canceled": 4, "read": 5,
+}
+
+_executor = None
+_limiters = {}
+_lock = threading.Lock()
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "REMINDER_DISPATCH", {})}
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            workers = {**DEFAULT_STAGE_LIMITS, **getattr(settings, "REMINDER_STAGE_LIMITS", {})}["whatsapp"]
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whatsapp-dispatch")
+        return _executor
+
+
+def reset():
+    """Drops the send pool and the per-sender limiters (settings changes, tests)."""
+    global _executor
+    with _lock:
+        pool, _executor = _executor, None
+        _limiters.clear()
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _on_setting_changed(setting, **kwargs):
+    if setting in ("REMINDER_DISPATCH", "REMINDER_STAGE_LIMITS"):
+        reset()
+
+
+setting_changed.connect(_on_setting_changed)
+
+
+def sender_for(number, senders):
+    if not senders:
+        return None
+    return senders[zlib.crc32(number.encode("utf-8")) % len(senders)]
+
+
+def limiter_for(sender):
+    with _lock:
+        if sender not in _limiters:
+            cfg = config()
+            _limiters[sender] = RateLimiter(rate=cfg["sender_rate"], max_wait=cfg["max_backoff"])
+        return _limiters[sender]
+
+
+def backoff(attempt, retry_after=None):
+    cfg = config()
+    return max(random.uniform(0, min(cfg["max_backoff"], cfg["backoff"] * 2 ** attempt)), retry_after or 0)
+
+
+def send(to_number, video_url, sender=None):
+    """
+    One message under its sender's rate limit, retrying transient failures.
+    Returns the message SID, or None if the provider refused it; raises
+    ProviderUnavailable when retrying isn't worth it any more.
+    """
+    limiter = limiter_for(sender)
+    max_attempts = config()["max_attempts"]
+    for attempt in range(max_attempts):
+        limiter.acquire()
+        try:
+            with metrics.timed("whatsapp"):
+                return send_whatsapp_video(to_number, video_url, sender=sender)
+        except CircuitOpen:
+            raise
+        except ProviderUnavailable as e:
+            limiter.throttled(e.retry_after)
+            delay = backoff(attempt, e.retry_after)
+            if attempt + 1 == max_attempts or delay > config()["max_backoff"]:
+                raise
+            metrics.increment("whatsapp_retries_total")
+            time.sleep(delay)
+
+
+def send_batch(reminders):
+    """
+    Sends the reminders' videos concurrently and sets each outcome on the
+    reminder (not saved): SENT with its message SID, FAILED, or still SCHEDULED
+    with send_after pushed back while the provider is unavailable.
+    """
+    senders = config()["senders"]
+    futures = []
+    for reminder in reminders:
+        number = reminder.customer.whatsapp_number
+        futures.append((reminder, executor().submit(send, number, reminder.video_url, sender_for(number, senders))))
+
+    for reminder, future in futures:
+        try:
+            sid = future.result()
+        except ProviderUnavailable as e:
+            logging.warning(f"Holding reminder {reminder.id}: {e}")
+            reminder.send_after = timezone.now() + timedelta(seconds=e.retry_after or POLL_MAX_INTERVAL)
+            continue
+        except Exception as e:
+            logging.error(f"Could not send reminder {reminder.id}: {e}")
+            reminder.status = 'FAILED'
+            continue
+
+        if sid:
+            reminder.status = 'SENT'
+            reminder.message_sid = sid
+            reminder.delivery_status = 'queued'
+            reminder.dispatched_at = reminder.delivery_updated_at = timezone.now()
+        else:
+            reminder.status = 'FAILED'
+
+
+def release_scheduled(now=None, batch_size=REMINDER_BATCH_SIZE):
+    """
+    Sends SCHEDULED reminders whose slot has come, inside the send window and
+    under the per-minute cap (core_reminders.utils.scheduler).
+    Returns the number of seconds until more can go out, or None if none are waiting.
+    """
+    now = now or timezone.now()
+    ready = scheduler.ready_to_send(now)
+    if not ready.exists():
+        return None
+    allowance, wait = scheduler.send_allowance(now)
+    if allowance == 0:
+        return min(wait, POLL_MAX_INTERVAL)
+
+    limit = batch_size if allowance is None else min(allowance, batch_size)
+    ids = list(ready.order_by('due_date', 'id').values_list('id', flat=True)[:limit])
+    owner = f"send:{uuid.uuid4().hex}"
+    # Conditional-update claim: another poller can't send these too.
+    ready.filter(id__in=ids).update(lease_owner=owner, lease_expires_at=now + timedelta(seconds=SEND_LEASE_SECONDS))
+    claimed = list(Reminder.objects.filter(lease_owner=owner).select_related('customer'))
+
+    send_batch(claimed)
+    updates = ReminderUpdates()
+    for reminder in claimed:
+        reminder.lease_owner = None
+        reminder.lease_expires_at = None
+        if reminder.status != 'SCHEDULED':
+            metrics.outcome(reminder.status)
+        updates.add(reminder)
+    updates.flush()
+    return 0 if len(ids) == limit else None
+
+
+class DispatchStage:
+    """
+    Sends what a send_reminders run has queued every `interval` seconds while it
+    renders, and the rest when it finishes. Does nothing while sends are held
+    for a window or rate; poll_videos releases those.
+    """
+
+    def __init__(self, interval=5):
+        self.interval = interval
+        self.active = not scheduler.holds_sends()
+        self.last = time.monotonic()
+
+    def tick(self, updates):
+        if self.active and time.monotonic() - self.last >= self.interval:
+            # Queued reminders have to be written before they can be claimed.
+            updates.flush()
+            self.drain()
+
+    def drain(self):
+        if self.active:
+            while release_scheduled() == 0:
+                pass
+            self.last = time.monotonic()
+
+
+def record_delivery(message_sid, status, error_code=None, now=None):
+    """Applies a provider status callback to the reminder with that message SID. Returns the rows updated."""
+    rank = DELIVERY_ORDER.get(status)
+    if rank is None:
+        return 0
+    later = [s for s, r in DELIVERY_ORDER.items() if r > rank]
+    return Reminder.objects.filter(message_sid=message_sid).exclude(delivery_status__in=later).update(
+        delivery_status=status, delivery_error=error_code or None, delivery_updated_at=now or timezone.now(),
+    )
+
+
+def verify_callback(url, params, signature):
+    """Checks Twilio's X-Twilio-Signature for a callback to url with the given POST params."""
+    token = getattr(settings, "TWILIO_AUTH_TOKEN", "")
+    if not token or not signature:
+        return False
+    from twilio.request_validator import RequestValidator
+
+    return RequestValidator(token).validate(url, params, signature)
@@ -0,0 +1,168 @@
+"""
+Video downloads.
+
+Files are streamed into "<dest>.part" in large chunks and only renamed into
+place once the byte count (Content-Length) and any checksum we know about
+have been verified, so a failed transfer never leaves a truncated MP4 where
+the admin or WhatsApp would pick it up. Interrupted transfers resume from the
+partial file with an HTTP Range request; a partial file the server says is
+past the end (416) is only kept if its size or checksum matches the remote file.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_RETRIES = 3
+DEFAULT_CONCURRENCY = 4
+
+_plain_md5 = re.compile(r'^"?([0-9a-f]{32})"?$')
+
+
+class DownloadError(Exception):
+    pass
+
+
+def _hash_existing(path, hashers):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            for h in hashers:
+                h.update(chunk)
+
+
+def _expected_total(resp, offset):
+    if resp.status_code == 206:
+        match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", resp.headers.get("Content-Range", ""))
+        if not match or int(match.group(1)) != offset:
+            raise DownloadError(f"Server resumed at the wrong offset: {resp.headers.get('Content-Range')}")
+        if match.group(2) != "*":
+            return int(match.group(2))
+    length = resp.headers.get("Content-Length")
+    if length is None:
+        return None
+    return int(length) + (offset if resp.status_code == 206 else 0)
+
+
+def _complete_for_416(resp, offset, expected_sha256):
+    match = re.match(r"bytes \*/(\d+)$", resp.headers.get("Content-Range", ""))
+    if match:
+        return int(match.group(1)) == offset
+    return bool(expected_sha256)
+
+
+def _looks_like_mp4(path):
+    with open(path, "rb") as f:
+        header = f.read(12)
+    return len(header) >= 8 and header[4:8] == b"ftyp"
+
+
+def fetch_to_file(url, dest_path, session=None, expected_sha256=None, retries=DEFAULT_RETRIES, timeout=300, check_mp4=True):
+    """
+    Downloads url to dest_path atomically. Returns the file's sha256 hex digest.
+    Raises DownloadError if the transfer cannot be completed and verified.
+    """
+    # Imported on first download, so loading the webhook view at startup doesn't pull in requests.
+    import requests
+    if session is None:
+        from core_reminders.utils.http import get_session
+        session = get_session()
+    part_path = f"{dest_path}.part"
+    last_error = None
+
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+                if resp.status_code == 416 and offset:
+                    # Nothing left to send for this range. The .part is only complete if it is
+                    # exactly as long as the file now is (or its checksum, verified below, matches);
+                    # otherwise the remote file changed under it and it starts over.
+                    if not _complete_for_416(resp, offset, expected_sha256):
+                        os.remove(part_path)
+                        raise DownloadError("Partial file doesn't match the remote file; starting over")
+                    total, mode = offset, None
+                elif resp.status_code == 200:
+                    offset, mode = 0, "wb"
+                    total = _expected_total(resp, 0)
+                elif resp.status_code == 206:
+                    mode = "ab"
+                    total = _expected_total(resp, offset)
+                else:
+                    raise DownloadError(f"Download failed with HTTP {resp.status_code}")
+
+                etag = _plain_md5.match(resp.headers.get("ETag", "").lower())
+                sha256 = hashlib.sha256()
+                md5 = hashlib.md5() if etag else None
+                hashers = [h for h in (sha256, md5) if h]
+                if mode == "ab" or mode is None:
+                    _hash_existing(part_path, hashers)
+
+                if mode:
+                    with open(part_path, mode) as f:
+                        for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+                            for h in hashers:
+                                h.update(chunk)
+
+            size = os.path.getsize(part_path)
+            if total is not None and size != total:
+                raise DownloadError(f"Short download: got {size} of {total} bytes")
+            if md5 and md5.hexdigest() != etag.group(1):
+                os.remove(part_path)
+                raise DownloadError("MD5 does not match the server's ETag")
+            if expected_sha256 and sha256.hexdigest() != expected_sha256:
+                os.remove(part_path)
+                raise DownloadError("SHA-256 does not match the expected checksum")
+            if check_mp4 and not _looks_like_mp4(part_path):
+                os.remove(part_path)
+                raise DownloadError("Downloaded file is not an MP4")
+
+            os.replace(part_path, dest_path)
+            return sha256.hexdigest()
+
+        except (requests.RequestException, DownloadError) as e:
+            last_error = e
+            logging.warning(f"Download attempt {attempt} of {url} failed: {e}")
+
+    raise DownloadError(f"Giving up on {url} after {retries} attempts: {last_error}")
+
+
+class DownloadPool:
+    """
+    Runs downloads on a bounded thread pool so the caller (the poller) can keep
+    tracking other jobs. Size comes from VIDEO_DOWNLOAD_CONCURRENCY.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or getattr(settings, "VIDEO_DOWNLOAD_CONCURRENCY", DEFAULT_CONCURRENCY)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="video-download")
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self.lock:
+            self.in_flight += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.in_flight -= 1
+        if future.exception():
+            logging.error(f"Download task failed: {future.exception()}")
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -0,0 +1,125 @@
+"""
+Incremental event detection.
+
+EMI_DUE reminders follow the calendar, so scheduler.queue_backlog() finds them
+with an indexed due-date range. NACH_REMINDER and BOUNCE_REMINDER follow
+changes to loans instead, and detect() only reads the loans that changed since
+its last run rather than the whole loan book:
+
+- Loan.updated_at moves on every save and every import_loans upsert, but not
+  on QuerySet.update(), which never touches auto_now fields. Code that
+  updates loans in bulk has to set it itself, or detection won't see the change:
+
+      Loan.objects.filter(...).update(bounce_count=F('bounce_count') + 1, updated_at=Now())
+
+  An EventCursor row remembers the latest updated_at handled, and each run
+  reads the rows after it a batch at a time, in (updated_at, id) order, so it
+  stays on the loan_updated_idx index.
+- BOUNCE_REMINDER: bounce_count has gone up since the last bounce reminder
+  (Loan.bounces_reminded). Goes out straight away, at most once per cycle.
+- NACH_REMINDER: a loan with a NACH mandate (nach_active) is in a cycle with no
+  NACH reminder yet, e.g. its due date just moved on. It is rendered and sent
+  nach_lead_days before the presentation, inside the send window.
+
+The reads start overlap_seconds before the cursor, so a transaction that
+committed late (or a host with a slow clock) isn't skipped. Re-reading a loan
+is harmless: both checks look at what has already been queued.
+
+Everything is queued as PENDING reminders, so send_reminders processes all
+three event types in the same pass.
+
+Settings go in REMINDER_EVENTS; anything left out keeps DEFAULTS.
+"""
+import logging
+from collections import Counter
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from core_reminders.models import EventCursor, Loan
+from core_reminders.utils import job_queue, scheduler
+
+
+DEFAULTS = {
+    # Days before the due date (the NACH presentation) that the NACH reminder goes out.
+    "nach_lead_days": 1,
+    # How far before the cursor each run starts reading again.
+    "overlap_seconds": 60,
+    "batch_size": 1000,
+}
+
+CURSOR_NAME = "loan_events"
+EVENT_TYPES = ('NACH_REMINDER', 'BOUNCE_REMINDER')
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "REMINDER_EVENTS", {})}
+
+
+def changed_loans(since, batch_size):
+    """Yields [(id, updated_at)] batches of loans changed at or after since (all loans if None)."""
+    loans = Loan.objects.order_by('updated_at', 'id')
+    if since is not None:
+        loans = loans.filter(updated_at__gte=since)
+    last = None
+    while True:
+        page = loans
+        if last is not None:
+            page = page.filter(Q(updated_at__gt=last[1]) | Q(updated_at=last[1], id__gt=last[0]))
+        batch = list(page.values_list('id', 'updated_at')[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def queue_bounces(changed):
+    """Queues a BOUNCE_REMINDER for changed loans whose bounce_count went up. Returns how many."""
+    bounced = changed.filter(bounce_count__gt=F('bounces_reminded'))
+    loan_ids = list(bounced.without_reminder('BOUNCE_REMINDER').values_list('id', flat=True))
+    queued = job_queue.enqueue(loan_ids, 'BOUNCE_REMINDER')
+    # Bounces in a cycle that already had its reminder are marked too, so they can't
+    # come back as a "new" bounce once the due date moves on.
+    bounced.update(bounces_reminded=F('bounce_count'))
+    return queued
+
+
+def queue_nach(changed, now):
+    """Queues a NACH_REMINDER for changed NACH loans in a cycle without one. Returns how many."""
+    lead_days = config()["nach_lead_days"]
+    upcoming = changed.filter(nach_active=True).needing_reminder_between(
+        'NACH_REMINDER', timezone.localdate(now), date.max,
+    )
+    loan_ids = list(upcoming.values_list('id', flat=True))
+    return job_queue.enqueue(
+        loan_ids, 'NACH_REMINDER',
+        send_after=lambda due_date: scheduler.send_after_for(due_date, now, lead_days=lead_days),
+        defer=True,
+    )
+
+
+def detect(now=None):
+    """
+    Queues NACH and bounce reminders for loans changed since the last run and
+    moves the cursor on. Returns {event_type: queued}.
+    """
+    now = now or timezone.now()
+    cfg = config()
+    cursor, _ = EventCursor.objects.get_or_create(name=CURSOR_NAME)
+    since = cursor.position - timedelta(seconds=cfg["overlap_seconds"]) if cursor.position else None
+
+    queued = Counter(dict.fromkeys(EVENT_TYPES, 0))
+    scanned = 0
+    for batch in changed_loans(since, cfg["batch_size"]):
+        changed = Loan.objects.filter(id__in=[loan_id for loan_id, _ in batch])
+        # Reminders and the cursor move together, so a crash never skips or repeats a batch.
+        with transaction.atomic():
+            queued['BOUNCE_REMINDER'] += queue_bounces(changed)
+            queued['NACH_REMINDER'] += queue_nach(changed, now)
+            cursor.position = max(cursor.position or batch[-1][1], batch[-1][1])
+            cursor.save(update_fields=['position', 'updated_at'])
+        scanned += len(batch)
+
+    logging.info(f"Event detection read {scanned} changed loans and queued {dict(queued)}")
+    return dict(queued)
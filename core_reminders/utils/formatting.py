@@ -0,0 +1,68 @@
+"""
+Locale formatting for reminder scripts.
+
+Amounts use the rupee sign and Indian digit grouping (lakh / crore:
+12,34,567) in every language, and dates spell the month out in the
+customer's language where we have the names, English otherwise. Nothing here
+depends on the process locale, and results are memoized because a run
+formats the same few amounts and due dates over and over.
+"""
+from decimal import Decimal
+from functools import lru_cache
+
+
+ENGLISH_MONTHS = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+
+# preferred_language -> month names. Languages not listed use ENGLISH_MONTHS.
+MONTHS = {
+    "Hindi": (
+        "जनवरी", "फ़रवरी", "मार्च", "अप्रैल", "मई", "जून",
+        "जुलाई", "अगस्त", "सितंबर", "अक्टूबर", "नवंबर", "दिसंबर",
+    ),
+    "Tamil": (
+        "ஜனவரி", "பிப்ரவரி", "மார்ச்", "ஏப்ரல்", "மே", "ஜூன்",
+        "ஜூலை", "ஆகஸ்ட்", "செப்டம்பர்", "அக்டோபர்", "நவம்பர்", "டிசம்பர்",
+    ),
+    "Kannada": (
+        "ಜನವರಿ", "ಫೆಬ್ರವರಿ", "ಮಾರ್ಚ್", "ಏಪ್ರಿಲ್", "ಮೇ", "ಜೂನ್",
+        "ಜುಲೈ", "ಆಗಸ್ಟ್", "ಸೆಪ್ಟೆಂಬರ್", "ಅಕ್ಟೋಬರ್", "ನವೆಂಬರ್", "ಡಿಸೆಂಬರ್",
+    ),
+    "Telugu": (
+        "జనవరి", "ఫిబ్రవరి", "మార్చి", "ఏప్రిల్", "మే", "జూన్",
+        "జులై", "ఆగస్టు", "సెప్టెంబర్", "అక్టోబర్", "నవంబర్", "డిసెంబర్",
+    ),
+}
+
+CURRENCY_SYMBOL = "₹"
+
+
+def group_indian(digits):
+    """"1234567" -> "12,34,567": the last three digits, then groups of two."""
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return ",".join(groups + [tail])
+
+
+@lru_cache(maxsize=4096)
+def format_amount(amount):
+    """Decimal("1234567.50") -> "₹12,34,567.50"; whole rupees drop the paise."""
+    amount = Decimal(amount).quantize(Decimal("0.01"))
+    sign = "-" if amount < 0 else ""
+    rupees, paise = f"{abs(amount):.2f}".split(".")
+    text = f"{sign}{CURRENCY_SYMBOL}{group_indian(rupees)}"
+    return text if paise == "00" else f"{text}.{paise}"
+
+
+@lru_cache(maxsize=4096)
+def format_date(day, language="en"):
+    """date(2025, 10, 27) -> "27 October 2025", with the month in `language` where known."""
+    months = MONTHS.get(language, ENGLISH_MONTHS)
+    return f"{day.day:02d} {months[day.month - 1]} {day.year}"
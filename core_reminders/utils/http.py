@@ -0,0 +1,215 @@
+"""
+One pooled requests.Session for every provider call.
+
+Connections are kept alive and reused per host instead of paying a TCP + TLS
+handshake for each POST and status check. Each host gets at most
+HTTP_POOL_MAXSIZE connections (HTTP_HOST_POOL_LIMITS overrides per host);
+callers beyond that wait for a free connection rather than opening more.
+
+stats() reports, per host, how many requests were sent, how many new
+connections had to be opened, how many requests reused a pooled connection
+and the total time spent connecting (handshakes).
+
+The async pipeline uses get_async_client() instead: one httpx.AsyncClient per
+event loop, built from the same settings and counted in the same stats(). It
+speaks HTTP/2 where the server offers it (and h2 is installed), so concurrent
+calls to one host share a connection. httpx caps connections per transport, not
+per host: hosts in HTTP_HOST_POOL_LIMITS get a transport of their own, and all
+other hosts share HTTP_POOL_MAXSIZE between them.
+"""
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from django.conf import settings
+from core_reminders.providers.base import ProviderUnavailable
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+DEFAULT_POOL_MAXSIZE = 20
+
+_stats = defaultdict(lambda: {"requests": 0, "connections_opened": 0, "handshake_seconds": 0.0})
+_stats_lock = threading.Lock()
+
+
+def _record(host, **counts):
+    with _stats_lock:
+        entry = _stats[host]
+        for key, value in counts.items():
+            entry[key] += value
+
+
+def stats():
+    with _stats_lock:
+        return {
+            host: {**entry, "connections_reused": max(0, entry["requests"] - entry["connections_opened"])}
+            for host, entry in _stats.items()
+        }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class _TimedConnectMixin:
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            _record(self.host, connections_opened=1, handshake_seconds=time.perf_counter() - start)
+
+
+class TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _record(urlsplit(request.url).hostname, requests=1)
+        return super().send(request, **kwargs)
+
+
+def _pool_maxsize():
+    return getattr(settings, "HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE)
+
+
+def _host_limits():
+    return getattr(settings, "HTTP_HOST_POOL_LIMITS", {})
+
+
+def _build_session():
+    maxsize = _pool_maxsize()
+    session = requests.Session()
+    # pool_block makes maxsize a hard per-host cap instead of a soft "connections kept".
+    session.mount("https://", PooledAdapter(pool_connections=10, pool_maxsize=maxsize, pool_block=True))
+    session.mount("http://", PooledAdapter(pool_connections=10, pool_maxsize=maxsize, pool_block=True))
+    for host, limit in _host_limits().items():
+        adapter = PooledAdapter(pool_connections=1, pool_maxsize=limit, pool_block=True)
+        session.mount(f"https://{host}/", adapter)
+        session.mount(f"http://{host}/", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+async def _count_async_request(request):
+    """httpx request hook: the same per-host counters as PooledAdapter and _TimedConnectMixin."""
+    host = request.url.host
+    _record(host, requests=1)
+    started = {}
+
+    # httpcore reports each new connection's TCP connect and TLS handshake through this trace hook.
+    async def trace(event, info):
+        step = event.rsplit(".", 1)[0]
+        if event.endswith(".started"):
+            started[step] = time.perf_counter()
+        elif event.endswith(".complete") and step in started:
+            elapsed = time.perf_counter() - started.pop(step)
+            if step == "connection.connect_tcp":
+                _record(host, connections_opened=1, handshake_seconds=elapsed)
+            elif step == "connection.start_tls":
+                _record(host, handshake_seconds=elapsed)
+
+    request.extensions = {**request.extensions, "trace": trace}
+
+
+def _build_async_client():
+    import httpx
+
+    http2 = importlib.util.find_spec("h2") is not None
+    maxsize = _pool_maxsize()
+    mounts = {
+        f"all://{host}": httpx.AsyncHTTPTransport(
+            http2=http2, limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+        )
+        for host, limit in _host_limits().items()
+    }
+    return httpx.AsyncClient(
+        timeout=60,
+        http2=http2,
+        limits=httpx.Limits(max_connections=maxsize, max_keepalive_connections=maxsize),
+        mounts=mounts,
+        event_hooks={"request": [_count_async_request]},
+    )
+
+
+def get_async_client():
+    """The running event loop's shared httpx.AsyncClient."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = _build_async_client()
+    return client
+
+
+async def aclose_async_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def retry_after(headers):
+    """Seconds the server asked us to wait (Retry-After as seconds or an HTTP date), or None."""
+    value = (headers or {}).get("Retry-After") or (headers or {}).get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_if_unavailable(response, what):
+    """Turns 429 and 5xx responses into ProviderUnavailable so callers can back off."""
+    if response.status_code == 429 or response.status_code >= 500:
+        raise ProviderUnavailable(
+            f"{what} returned HTTP {response.status_code}",
+            retry_after=retry_after(response.headers),
+            status_code=response.status_code,
+        )
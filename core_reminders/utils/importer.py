@@ -0,0 +1,239 @@
+"""
+Bulk loan-book import.
+
+Rows are read a chunk at a time (csv module, or pyarrow for Parquet), checked,
+and upserted with bulk_create(update_conflicts=True): Customer by
+whatsapp_number, Loan by loan_number. Each chunk is one transaction, so
+memory stays flat however large the file, and a bad row only rejects itself:
+rows that fail the checks are left out, and if the database still refuses a
+chunk it is split in halves and retried until only the offending rows remain.
+
+Columns: whatsapp_number, customer_name, loan_number, emi_amount, due_date
+(YYYY-MM-DD), and optionally preferred_language, is_active, nach_active and
+bounce_count. Optional columns missing from the file leave existing values alone.
+Every upserted loan gets a new updated_at, so event detection looks at it again.
+"""
+import csv
+import logging
+import os
+import time
+from collections import Counter
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.db import DatabaseError, transaction
+from core_reminders.models import Customer, Loan
+
+
+REQUIRED_COLUMNS = ("whatsapp_number", "customer_name", "loan_number", "emi_amount", "due_date")
+OPTIONAL_COLUMNS = ("preferred_language", "is_active", "nach_active", "bounce_count")
+DEFAULT_CHUNK_SIZE = 2000
+
+# Loan.emi_amount is DecimalField(max_digits=10, decimal_places=2).
+MAX_EMI_AMOUNT = Decimal("99999999.99")
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f"}
+
+
+class RejectedRow(ValueError):
+    pass
+
+
+def read_csv(path, chunk_size):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        yield reader.fieldnames or []
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def read_parquet(path, chunk_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet files needs pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(path)
+    yield parquet.schema_arrow.names
+    for batch in parquet.iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields the column names, then lists of row dicts of up to chunk_size rows."""
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        return read_parquet(path, chunk_size)
+    return read_csv(path, chunk_size)
+
+
+def _text(row, column):
+    value = row.get(column)
+    return "" if value is None else str(value).strip()
+
+
+def parse_row(row, columns):
+    """Returns (customer fields, loan fields) for one row or raises RejectedRow."""
+    whatsapp_number = _text(row, "whatsapp_number").replace(" ", "")
+    if not whatsapp_number:
+        raise RejectedRow("missing whatsapp_number")
+    if len(whatsapp_number) > 20:
+        raise RejectedRow("whatsapp_number too long")
+    name = _text(row, "customer_name")
+    if not name:
+        raise RejectedRow("missing customer_name")
+    loan_number = _text(row, "loan_number")
+    if not loan_number:
+        raise RejectedRow("missing loan_number")
+    if len(loan_number) > 100:
+        raise RejectedRow("loan_number too long")
+
+    try:
+        emi_amount = Decimal(_text(row, "emi_amount").replace(",", "")).quantize(Decimal("0.01"))
+        # NaN gets through quantize() and would only raise at the range check.
+        if not emi_amount.is_finite() or not 0 <= emi_amount <= MAX_EMI_AMOUNT:
+            raise RejectedRow("bad emi_amount")
+    except InvalidOperation:
+        raise RejectedRow("bad emi_amount")
+
+    due_date = row.get("due_date")
+    if not isinstance(due_date, date):
+        try:
+            due_date = date.fromisoformat(_text(row, "due_date"))
+        except ValueError:
+            raise RejectedRow("bad due_date")
+
+    customer = {"whatsapp_number": whatsapp_number, "name": name[:255]}
+    loan = {"loan_number": loan_number, "emi_amount": emi_amount, "due_date": due_date}
+
+    if "preferred_language" in columns:
+        customer["preferred_language"] = _text(row, "preferred_language") or "en"
+        if len(customer["preferred_language"]) > 50:
+            raise RejectedRow("preferred_language too long")
+    for field in ("is_active", "nach_active"):
+        if field in columns:
+            flag = _text(row, field).lower()
+            if flag not in TRUE_VALUES | FALSE_VALUES:
+                raise RejectedRow(f"bad {field}")
+            loan[field] = flag in TRUE_VALUES
+    if "bounce_count" in columns:
+        try:
+            loan["bounce_count"] = int(_text(row, "bounce_count") or 0)
+        except ValueError:
+            raise RejectedRow("bad bounce_count")
+        if loan["bounce_count"] < 0:
+            raise RejectedRow("bad bounce_count")
+    return customer, loan
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.customers = 0
+        self.loans = 0
+        self.rejected = Counter()
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def write_entries(entries, customer_fields, loan_fields):
+    """Upserts [(row, customer fields, loan fields)] in one transaction."""
+    customers = {customer["whatsapp_number"]: customer for _, customer, _ in entries}
+    with transaction.atomic():
+        Customer.objects.bulk_create(
+            [Customer(**fields) for fields in customers.values()],
+            update_conflicts=True,
+            unique_fields=["whatsapp_number"],
+            update_fields=customer_fields,
+        )
+        # Primary keys aren't returned for upserted rows on every backend, so look them up.
+        customer_ids = dict(
+            Customer.objects.filter(whatsapp_number__in=list(customers)).values_list("whatsapp_number", "id")
+        )
+        Loan.objects.bulk_create(
+            [Loan(customer_id=customer_ids[customer["whatsapp_number"]], **loan) for _, customer, loan in entries],
+            update_conflicts=True,
+            unique_fields=["loan_number"],
+            update_fields=loan_fields,
+        )
+
+
+def write_or_split(entries, customer_fields, loan_fields, stats, on_reject=None):
+    """
+    write_entries(), halving the batch whenever the database refuses it, so only
+    the rows it actually refuses are rejected. Returns the entries written.
+    """
+    try:
+        write_entries(entries, customer_fields, loan_fields)
+        return entries
+    except DatabaseError as e:
+        if len(entries) == 1:
+            row = entries[0][0]
+            logging.warning(f"Database refused loan {entries[0][2]['loan_number']}: {e}")
+            stats.rejected["rejected by the database"] += 1
+            if on_reject:
+                on_reject(row, "rejected by the database")
+            return []
+    middle = len(entries) // 2
+    return (
+        write_or_split(entries[:middle], customer_fields, loan_fields, stats, on_reject)
+        + write_or_split(entries[middle:], customer_fields, loan_fields, stats, on_reject)
+    )
+
+
+def upsert_chunk(rows, columns, stats, on_reject=None):
+    customers, loans = {}, {}
+    for row in rows:
+        stats.rows += 1
+        try:
+            customer, loan = parse_row(row, columns)
+        except RejectedRow as e:
+            stats.rejected[str(e)] += 1
+            if on_reject:
+                on_reject(row, str(e))
+            continue
+        # Later rows win, as they would with one UPDATE per row.
+        customers[customer["whatsapp_number"]] = customer
+        loans[loan["loan_number"]] = (row, customer["whatsapp_number"], loan)
+
+    if not customers:
+        return
+    customer_fields = [f for f in ("name", "preferred_language") if f in next(iter(customers.values()))]
+    loan_fields = ["customer", "emi_amount", "due_date", "updated_at"] + [
+        f for f in ("is_active", "nach_active", "bounce_count") if f in columns
+    ]
+
+    entries = [(row, customers[number], loan) for row, number, loan in loans.values()]
+    written = write_or_split(entries, customer_fields, loan_fields, stats, on_reject)
+    stats.customers += len({customer["whatsapp_number"] for _, customer, _ in written})
+    stats.loans += len(written)
+
+
+def import_file(path, chunk_size=DEFAULT_CHUNK_SIZE, on_reject=None, on_chunk=None):
+    """Imports a CSV or Parquet loan book and returns ImportStats."""
+    chunks = read_chunks(path, chunk_size)
+    columns = set(next(chunks))
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+
+    stats = ImportStats()
+    for rows in chunks:
+        upsert_chunk(rows, columns, stats, on_reject)
+        if on_chunk:
+            on_chunk(stats)
+    logging.info(
+        f"Imported {stats.rows} rows from {path} in {stats.seconds:.1f}s "
+        f"({stats.rows_per_second:.0f} rows/s), rejected {sum(stats.rejected.values())}"
+    )
+    return stats
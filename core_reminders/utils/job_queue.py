@@ -0,0 +1,178 @@
+"""
+DB-backed work queue on the Reminder table.
+
+send_reminders enqueues one PENDING reminder per loan that needs one, then
+any number of processes claim batches of them under a lease. A claimed
+reminder is GENERATING with lease_owner set; a heartbeat thread extends the
+lease while the owner is alive. If the owner dies, the lease runs out and the
+reminder becomes claimable again, up to MAX_ATTEMPTS times.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED where the database has it.
+Elsewhere (SQLite) candidates are claimed with a conditional UPDATE that
+re-checks claimability row by row, so two workers can never both win a row.
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from core_reminders.models import Loan, Reminder
+
+
+DEFAULT_LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+ENQUEUE_BATCH_SIZE = 1000
+# Reminders leased per worker (loan in flight) at a time, unless REMINDER_CLAIM_SIZE says otherwise.
+CLAIM_PER_WORKER = 2
+
+
+def lease_seconds():
+    return getattr(settings, "REMINDER_LEASE_SECONDS", DEFAULT_LEASE_SECONDS)
+
+
+def claim_size(workers):
+    """
+    How many reminders a process leases at once. Kept to what its workers can
+    start on soon, so a slow host doesn't sit on work other hosts could drain.
+    """
+    return getattr(settings, "REMINDER_CLAIM_SIZE", None) or max(1, workers) * CLAIM_PER_WORKER
+
+
+def new_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def enqueue(loan_ids, event_type='EMI_DUE', send_after=None, defer=False):
+    """
+    Creates a PENDING reminder for each loan's current cycle and returns how many
+    were created. Already-queued loans are skipped.
+    send_after, if given, maps a due date to the reminder's earliest send time; with
+    defer, the reminder also isn't claimed (rendered) before then.
+    """
+    already_queued = Reminder.objects.filter(loan=OuterRef('pk'), event_type=event_type, due_date=OuterRef('due_date'))
+    created = 0
+    for start in range(0, len(loan_ids), ENQUEUE_BATCH_SIZE):
+        rows = (
+            Loan.objects.filter(id__in=loan_ids[start:start + ENQUEUE_BATCH_SIZE])
+            .filter(~Exists(already_queued))
+            .values_list('id', 'customer_id', 'due_date')
+        )
+        reminders = []
+        for loan_id, customer_id, due_date in rows:
+            after = send_after(due_date) if send_after else None
+            reminders.append(Reminder(
+                loan_id=loan_id, customer_id=customer_id, event_type=event_type, due_date=due_date, status='PENDING',
+                send_after=after, available_at=after if defer else None,
+            ))
+        # Conflicts can still come from another process queueing the same loans at
+        # the same moment; those rows are skipped and counted by that process.
+        Reminder.objects.bulk_create(reminders, ignore_conflicts=True)
+        created += len(reminders)
+    return created
+
+
+def claimable(now=None):
+    now = now or timezone.now()
+    ready = Q(status='PENDING') & (Q(available_at__isnull=True) | Q(available_at__lte=now))
+    # Claimed before but never got as far as a HeyGen job, and the owner stopped heart-beating.
+    abandoned = (
+        Q(status='GENERATING', heygen_video_id__isnull=True)
+        & (Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now))
+    )
+    return (ready | abandoned) & Q(attempts__lt=MAX_ATTEMPTS)
+
+
+def fail_exhausted(now=None):
+    """Gives up on reminders whose lease expired MAX_ATTEMPTS times."""
+    now = now or timezone.now()
+    failed = Reminder.objects.filter(
+        Q(status='PENDING') | Q(status='GENERATING', heygen_video_id__isnull=True, lease_expires_at__lt=now),
+        attempts__gte=MAX_ATTEMPTS,
+    ).update(status='FAILED', lease_owner=None, lease_expires_at=None)
+    if failed:
+        logging.error(f"{failed} reminders failed after {MAX_ATTEMPTS} attempts")
+    return failed
+
+
+def claim_batch(owner, limit):
+    """Leases up to `limit` reminders to owner and returns them with loan and customer loaded."""
+    now = timezone.now()
+    lease = dict(
+        status='GENERATING',
+        lease_owner=owner,
+        lease_expires_at=now + timedelta(seconds=lease_seconds()),
+        heartbeat_at=now,
+        attempts=F('attempts') + 1,
+    )
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                Reminder.objects.select_for_update(skip_locked=True)
+                .filter(claimable(now)).order_by('id').values_list('id', flat=True)[:limit]
+            )
+            Reminder.objects.filter(id__in=ids).update(**lease)
+    else:
+        ids = list(Reminder.objects.filter(claimable(now)).order_by('id').values_list('id', flat=True)[:limit])
+        # claimable() is re-evaluated by the UPDATE itself, so rows taken by someone
+        # else in the meantime are simply not updated (and not returned below).
+        Reminder.objects.filter(claimable(now), id__in=ids).update(**lease)
+
+    return list(
+        Reminder.objects.filter(id__in=ids, lease_owner=owner, status='GENERATING')
+        .select_related('customer', 'loan__customer')
+        .order_by('id')
+    )
+
+
+def iter_claimed(owner, batch_size):
+    """Yields (loan, reminder) pairs, claiming the next batch only when the previous one is used up."""
+    while True:
+        fail_exhausted()
+        batch = claim_batch(owner, batch_size)
+        if not batch:
+            return
+        for reminder in batch:
+            yield reminder.loan, reminder
+
+
+def release(reminder):
+    """Drops the lease in memory; it is written with the reminder's other changes."""
+    reminder.lease_owner = None
+    reminder.lease_expires_at = None
+
+
+class Heartbeat:
+    """Background thread that keeps extending the owner's leases until stopped."""
+
+    def __init__(self, owner, interval=None):
+        self.owner = owner
+        self.interval = interval or max(1, lease_seconds() / 3)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"lease-heartbeat-{owner}", daemon=True)
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                now = timezone.now()
+                Reminder.objects.filter(lease_owner=self.owner, status='GENERATING').update(
+                    lease_expires_at=now + timedelta(seconds=lease_seconds()),
+                    heartbeat_at=now,
+                )
+        except Exception:
+            logging.exception("Lease heartbeat stopped")
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
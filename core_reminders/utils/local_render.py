@@ -0,0 +1,200 @@
+"""
+Local fallback renderer.
+
+When HeyGen is saturated (renders time out or fail, or its circuit is open) a
+reminder doesn't have to fail: the script is spoken by the voice provider and
+ffmpeg muxes the audio with a pre-rendered avatar loop or still image into an
+MP4 on our own cores. It is plainer than an avatar render but goes out on time.
+
+- Speech is cached per (script, voice) under MEDIA_ROOT/voice_cache, so a
+  repeated script is only synthesized once.
+- Encodes run on a pool sized to the CPU count. Each ffmpeg process encodes
+  single-threaded, so the pool keeps every core busy without oversubscribing;
+  the pool threads themselves only wait on ffmpeg.
+- Every render has a deadline, time spent waiting for a free worker included,
+  and ffmpeg is killed when it runs out.
+- Finished videos go through video_storage and the render cache under a key of
+  their own, so they never stand in for a later HeyGen render of the same script.
+
+Configure with REMINDER_LOCAL_RENDER; anything left out keeps DEFAULTS.
+"""
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextlib import contextmanager
+from django.conf import settings
+from core_reminders.providers.base import ProviderUnavailable
+from core_reminders.utils import metrics, render_cache, video_storage
+from core_reminders.utils.composition import ffmpeg_binary
+from core_reminders.utils.reminder_utils import HEYGEN_DIMENSION, generate_voice, voice_id_for
+
+
+DEFAULTS = {
+    "enabled": False,
+    # Still image (.png, .jpg) or short avatar loop (.mp4). None renders a plain background.
+    "avatar": None,
+    # Concurrent encodes. None uses the CPU count.
+    "workers": None,
+    # Seconds a render may take, waiting for a free worker included.
+    "deadline": 120,
+}
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+BACKGROUND_COLOUR = "0x1f3a5f"
+FRAME_RATE = 25
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "REMINDER_LOCAL_RENDER", {})}
+
+
+def enabled():
+    return bool(config()["enabled"])
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = config()["workers"] or os.cpu_count() or 1
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-render")
+        return _executor
+
+
+def shutdown(wait=True):
+    global _executor
+    with _executor_lock:
+        pool, _executor = _executor, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+@contextmanager
+def covers_outages():
+    """Swallows ProviderUnavailable from the block when a local render can stand in for the provider."""
+    try:
+        yield
+    except ProviderUnavailable as e:
+        if not enabled():
+            raise
+        logging.warning(f"Video provider unavailable, rendering locally instead: {e}")
+
+
+def render_key_for(script, customer):
+    avatar = config()["avatar"]
+    avatar_id = f"local:{os.path.basename(avatar) if avatar else 'plain'}"
+    return render_cache.render_key(script, voice_id_for(customer), avatar_id, HEYGEN_DIMENSION)
+
+
+def audio_for(script, voice_id):
+    """Speech for the script, synthesized once per (script, voice) and reused after that."""
+    cache_dir = os.path.join(settings.MEDIA_ROOT, "voice_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = hashlib.sha256(f"{voice_id}\n{script}".encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, f"{digest}.audio")
+    if os.path.exists(path):
+        return path
+
+    partial = f"{path}.{threading.get_ident()}.part"
+    try:
+        if not generate_voice(script, partial):
+            return None
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return path
+
+
+def mux_command(audio_path, output_path, avatar=None):
+    width, height = HEYGEN_DIMENSION["width"], HEYGEN_DIMENSION["height"]
+    if avatar is None:
+        video_input = ["-f", "lavfi", "-i", f"color=c={BACKGROUND_COLOUR}:s={width}x{height}:r={FRAME_RATE}"]
+        tune = ["-tune", "stillimage"]
+    elif avatar.lower().endswith(IMAGE_EXTENSIONS):
+        video_input = ["-loop", "1", "-framerate", str(FRAME_RATE), "-i", avatar]
+        tune = ["-tune", "stillimage"]
+    else:
+        video_input = ["-stream_loop", "-1", "-i", avatar]
+        tune = []
+    fit = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,fps={FRAME_RATE}"
+    )
+    return [
+        ffmpeg_binary(), "-y", "-loglevel", "error",
+        *video_input, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0", "-vf", fit,
+        "-c:v", "libx264", "-preset", "veryfast", *tune, "-pix_fmt", "yuv420p", "-threads", "1",
+        "-c:a", "aac", "-b:a", "96k", "-shortest", "-movflags", "+faststart",
+        output_path,
+    ]
+
+
+def encode(script, voice_id, key, deadline_at):
+    """Pool job: speech plus avatar into a local MP4. Returns its path, or None. Touches no database."""
+    if time.monotonic() >= deadline_at:
+        logging.error("Local render missed its deadline waiting for a worker.")
+        return None
+    output_path = os.path.join(video_storage.incoming_dir(), f"local_{key[:32]}_{threading.get_ident()}.mp4")
+    try:
+        with metrics.timed("local_render"):
+            audio_path = audio_for(script, voice_id)
+            if not audio_path:
+                logging.error("Local render has no audio: voice synthesis failed.")
+                return None
+            subprocess.run(
+                mux_command(audio_path, output_path, config()["avatar"]),
+                check=True,
+                timeout=max(1, deadline_at - time.monotonic()),
+            )
+        return output_path
+    except (ProviderUnavailable, OSError, subprocess.SubprocessError) as e:
+        logging.error(f"Local render failed: {e}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+
+
+def render_many(jobs, deadline=None):
+    """
+    Renders [(script, customer)] on the pool and returns their URLs in the same
+    order, None where a render failed or missed the deadline.
+    """
+    deadline_at = time.monotonic() + (deadline if deadline is not None else config()["deadline"])
+    keys = [render_key_for(script, customer) for script, customer in jobs]
+    urls = {}
+    futures = {}
+    for key, (script, customer) in zip(keys, jobs):
+        if key in urls or key in futures:
+            continue
+        urls[key] = render_cache.lookup(key)
+        if not urls[key]:
+            futures[key] = executor().submit(encode, script, voice_id_for(customer), key, deadline_at)
+
+    for key, future in futures.items():
+        try:
+            # A second of grace: ffmpeg itself is stopped at the deadline.
+            path = future.result(timeout=max(0, deadline_at - time.monotonic()) + 1)
+        except TimeoutError:
+            logging.error("Local render missed its deadline.")
+            continue
+        if path:
+            stored = video_storage.save(path)
+            render_cache.store(key, stored)
+            urls[key] = stored.url
+    return [urls.get(key) for key in keys]
+
+
+def fallback(script, customer):
+    """A local render of the script when REMINDER_LOCAL_RENDER is enabled, else None."""
+    if not enabled():
+        return None
+    return render_many([(script, customer)])[0]
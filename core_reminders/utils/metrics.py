@@ -0,0 +1,149 @@
+"""
+In-process pipeline metrics.
+
+- Stage timings: every timed(stage) block lands in a cumulative histogram
+  (for Prometheus) and in a bounded window of raw samples (for percentiles).
+- In-flight gauges: how many blocks of each stage are running right now.
+- Counters with labels, e.g. provider errors by provider and reason.
+
+core_reminders.utils.prometheus renders all of this as Prometheus text;
+core_reminders.utils.runs stores per-run summaries for other processes to see.
+"""
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from django.conf import settings
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Raw samples kept per stage for percentiles; older ones fall off.
+MAX_SAMPLES = 50_000
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_histograms = {}
+_in_flight = defaultdict(int)
+_counters = defaultdict(float)
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+def record(stage, seconds):
+    with _lock:
+        _samples[stage].append(seconds)
+        _histograms.setdefault(stage, Histogram()).observe(seconds)
+
+
+@contextmanager
+def timed(stage):
+    with _lock:
+        _in_flight[stage] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+        with _lock:
+            _in_flight[stage] -= 1
+
+
+def increment(name, amount=1, **labels):
+    with _lock:
+        _counters[(name, tuple(sorted(labels.items())))] += amount
+
+
+def outcome(status, count=1):
+    """Counts reminders leaving a pipeline step in `status` (SENT, FAILED, parked as PENDING, ...)."""
+    increment("reminders_total", count, status=status)
+
+
+def snapshot():
+    with _lock:
+        return {stage: list(values) for stage, values in _samples.items()}
+
+
+def histograms():
+    with _lock:
+        return {
+            stage: {"buckets": list(zip(BUCKETS, h.buckets)), "count": h.count, "sum": h.sum}
+            for stage, h in _histograms.items()
+        }
+
+
+def in_flight():
+    with _lock:
+        return dict(_in_flight)
+
+
+def counters():
+    """{(name, ((label, value), ...)): total}"""
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _histograms.clear()
+        _counters.clear()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": values[-1],
+    }
+
+
+def summaries():
+    """summarize() for every stage, with count and mean over all samples, not just the retained window."""
+    result = {}
+    totals = histograms()
+    for stage, values in sorted(snapshot().items()):
+        summary = summarize(values)
+        if stage in totals and totals[stage]["count"]:
+            summary["count"] = totals[stage]["count"]
+            summary["mean"] = totals[stage]["sum"] / totals[stage]["count"]
+        result[stage] = summary
+    return result
+
+
+def log_payload(message):
+    """
+    Logs a full request/response body for a sample of calls only
+    (PAYLOAD_LOG_SAMPLE_RATE), or for every call when DEBUG logging is on.
+    """
+    rate = getattr(settings, "PAYLOAD_LOG_SAMPLE_RATE", 0.01)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(message)
+    elif rate and random.random() < rate:
+        logging.info(f"[sampled] {message}")
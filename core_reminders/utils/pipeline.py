@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from core_reminders.models import Reminder
+from core_reminders.providers.base import ProviderUnavailable
+from core_reminders.utils import local_render, metrics, render_cache
+from core_reminders.utils.composition import compose_video
+from core_reminders.utils.reminder_utils import (
+    agenerate_script,
+    agenerate_video,
+    arun_steps,
+    asubmit_video,
+    generate_script,
+    generate_video,
+    render_key_for,
+    run_steps,
+    submit_video,
+)
+
+
+# Max number of loans allowed inside each stage at the same time, across all workers.
+# HeyGen is the tightest quota, so video is kept low. Override with REMINDER_STAGE_LIMITS.
+DEFAULT_STAGE_LIMITS = {
+    "script": 32,
+    "video": 4,
+    "whatsapp": 10,
+}
+
+# Status changes are written back in batches of this size. (How many reminders are
+# claimed at a time follows the concurrency: see job_queue.claim_size.)
+REMINDER_BATCH_SIZE = 500
+
+# Status polling backoff for in-flight renders: 8s, 12s, 18s, ... capped at 2 minutes.
+POLL_MIN_INTERVAL = 8
+POLL_MAX_INTERVAL = 120
+POLL_BACKOFF = 1.5
+
+# How long a reminder is parked when a provider is down and didn't say for how long.
+PARK_SECONDS = 300
+
+_stage_semaphores = {}
+_stage_lock = threading.Lock()
+# Same limits for the async runner, as asyncio semaphores belonging to each event loop.
+_async_stage_semaphores = weakref.WeakKeyDictionary()
+
+# render_key -> video_id for renders submitted by this process whose reminders
+# may not be written yet, so batched writes don't defeat in-flight sharing.
+_inflight_renders = {}
+_inflight_lock = threading.Lock()
+
+
+def _stage_limits():
+    return {**DEFAULT_STAGE_LIMITS, **getattr(settings, "REMINDER_STAGE_LIMITS", {})}
+
+
+def stage_limit(stage):
+    with _stage_lock:
+        if stage not in _stage_semaphores:
+            _stage_semaphores[stage] = threading.BoundedSemaphore(_stage_limits()[stage])
+        return _stage_semaphores[stage]
+
+
+@contextmanager
+def stage(name):
+    """Holds the stage's concurrency slot and records how long the work inside took."""
+    with stage_limit(name), metrics.timed(name):
+        yield
+
+
+@asynccontextmanager
+async def astage(name):
+    """stage() for coroutines: waits for the slot without blocking the event loop."""
+    semaphores = _async_stage_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if name not in semaphores:
+        semaphores[name] = asyncio.BoundedSemaphore(_stage_limits()[name])
+    async with semaphores[name]:
+        with metrics.timed(name):
+            yield
+
+
+def next_poll_delay(attempts):
+    if getattr(settings, "HEYGEN_WEBHOOK_SECRET", ""):
+        # Completion arrives by webhook; polling is only a sweep for lost callbacks.
+        return timedelta(seconds=getattr(settings, "VIDEO_POLL_FALLBACK_INTERVAL", 300))
+    return timedelta(seconds=min(POLL_MAX_INTERVAL, POLL_MIN_INTERVAL * POLL_BACKOFF ** attempts))
+
+
+class ReminderUpdates:
+    """
+    Collects modified reminders and writes them with one bulk_update per batch.
+    Batches are also flushed after max_delay seconds, which bounds how much
+    finished work a crash can lose (and later redo).
+    """
+
+    fields = [
+        'status', 'video_url', 'heygen_video_id', 'submitted_at', 'next_poll_at', 'poll_attempts', 'render_key',
+        'lease_owner', 'lease_expires_at', 'available_at', 'attempts', 'send_after', 'dispatched_at',
+        'message_sid', 'delivery_status', 'delivery_error', 'delivery_updated_at',
+    ]
+
+    def __init__(self, batch_size=REMINDER_BATCH_SIZE, max_delay=5):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.pending = []
+        self.oldest = None
+
+    def add(self, reminder):
+        if not self.pending:
+            self.oldest = time.monotonic()
+        self.pending.append(reminder)
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.oldest >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            Reminder.objects.bulk_update(self.pending, self.fields)
+            self.pending = []
+
+
+def _shared_render(render_key):
+    with _inflight_lock:
+        video_id = _inflight_renders.get(render_key)
+    if video_id:
+        return video_id
+    return (
+        Reminder.objects.filter(status='GENERATING', render_key=render_key, heygen_video_id__isnull=False)
+        .values_list('heygen_video_id', flat=True)
+        .first()
+    )
+
+
+def forget_render(render_key):
+    with _inflight_lock:
+        _inflight_renders.pop(render_key, None)
+
+
+def park(reminder, error):
+    """
+    Puts a reminder back in the queue until the provider is expected to be
+    back, without counting it as a failed attempt. Updates in memory only.
+    """
+    delay = error.retry_after or PARK_SECONDS
+    reminder.status = 'PENDING'
+    reminder.available_at = timezone.now() + timedelta(seconds=delay)
+    reminder.attempts = max(0, reminder.attempts - 1)
+    return False, f'Parked reminder {reminder.id} for {round(delay)}s: {error}'
+
+
+def loan_steps(loan, reminder, wait=True):
+    """
+    The pipeline for one loan, as steps (see reminder_utils.run_steps) so that
+    process_loan() and aprocess_loan() share every decision. Returns (ok, message).
+    """
+    customer = loan.customer
+    try:
+        script = yield "script", reminder.event_type, customer, loan
+
+        if getattr(settings, "REMINDER_VIDEO_MODE", "full") == "composed":
+            video_url = yield "compose", reminder.event_type, customer, loan
+            if video_url:
+                return complete_reminder(reminder, video_url)
+            # Not composable (e.g. language not translated yet): fall through to a full render.
+
+        if not wait:
+            reminder.render_key = render_key_for(script, customer)
+            cached_url = yield "lookup", reminder.render_key
+            if cached_url:
+                return complete_reminder(reminder, cached_url)
+
+            # Same script already rendering for someone else: share that job instead of paying twice.
+            video_id = yield "shared", reminder.render_key
+            if not video_id:
+                video_id = yield "submit", script, customer
+                if video_id:
+                    with _inflight_lock:
+                        _inflight_renders[reminder.render_key] = video_id
+            if not video_id:
+                video_url = yield "fallback", script, customer
+                if video_url:
+                    return complete_reminder(reminder, video_url)
+                reminder.status = 'FAILED'
+                return False, 'Video generation failed.'
+
+            now = timezone.now()
+            reminder.heygen_video_id = video_id
+            reminder.submitted_at = now
+            reminder.next_poll_at = now + next_poll_delay(0)
+            return True, f'Submitted video {video_id} for {customer.name}.'
+
+        video_url = yield "render", script, customer
+        if not video_url:
+            # HeyGen timed out, failed or is down: render on our own cores if enabled.
+            video_url = yield "fallback", script, customer
+
+        if not video_url:
+            reminder.status = 'FAILED'
+            return False, 'Video generation failed.'
+
+        return complete_reminder(reminder, video_url)
+
+    except ProviderUnavailable as e:
+        logging.warning(f"Provider unavailable for loan {loan.loan_number}: {e}")
+        return park(reminder, e)
+    except Exception as e:
+        logging.exception(f"Reminder pipeline failed for loan {loan.loan_number}")
+        reminder.status = 'FAILED'
+        return False, f'An error occurred for loan {loan.loan_number}: {e}'
+
+
+def _staged(name, func, covers_outages=False):
+    def call(*args):
+        with stage(name), (local_render.covers_outages() if covers_outages else nullcontext()):
+            return func(*args)
+    return call
+
+
+def _astaged(name, func, covers_outages=False):
+    async def call(*args):
+        async with astage(name):
+            with local_render.covers_outages() if covers_outages else nullcontext():
+                return await func(*args)
+    return call
+
+
+# How each of loan_steps()' steps is carried out, blocking and on the event loop.
+LOAN_CALLS = {
+    "script": _staged("script", generate_script),
+    "compose": _staged("video", compose_video),
+    "lookup": render_cache.lookup,
+    "shared": _shared_render,
+    "submit": _staged("video", submit_video, covers_outages=True),
+    "render": _staged("video", generate_video, covers_outages=True),
+    "fallback": local_render.fallback,
+}
+
+ALOAN_CALLS = {
+    "script": _astaged("script", agenerate_script),
+    # Composition and local renders are ffmpeg work, so they run in a thread.
+    "compose": _astaged("video", sync_to_async(compose_video, thread_sensitive=False)),
+    "lookup": sync_to_async(render_cache.lookup),
+    "shared": sync_to_async(_shared_render),
+    "submit": _astaged("video", asubmit_video, covers_outages=True),
+    "render": _astaged("video", agenerate_video, covers_outages=True),
+    "fallback": sync_to_async(local_render.fallback, thread_sensitive=False),
+}
+
+
+def process_loan(item, wait=True):
+    """
+    Runs one (loan, reminder) pair through script -> video -> WhatsApp and
+    returns (ok, message). The reminder is only updated in memory; the caller
+    persists it, normally through ReminderUpdates.
+    With wait=False the render is only submitted; poll_videos finishes the job.
+    """
+    loan, reminder = item
+    return run_steps(loan_steps(loan, reminder, wait), LOAN_CALLS)
+
+
+async def aprocess_loan(item, wait=True):
+    """process_loan() for the async runner. Same steps and result, without tying up a thread per loan."""
+    loan, reminder = item
+    return await arun_steps(loan_steps(loan, reminder, wait), ALOAN_CALLS)
+
+
+def complete_reminder(reminder, video_url):
+    """
+    Queues a finished video for the dispatch stage (core_reminders.utils.dispatcher),
+    which sends it in a batch once its send slot comes round. Updates in memory only.
+    """
+    reminder.status = 'SCHEDULED'
+    reminder.video_url = video_url
+    return True, f'Video ready for {reminder.customer.name}; queued for sending.'
+
+
+def run_pool(items, handler, workers, on_result=None):
+    """
+    Feeds items to `workers` threads. Each thread keeps its own DB connection
+    for its whole life and closes it on exit, so nothing leaks between workers.
+    on_result(item, result) is always called from the calling thread.
+    """
+    tasks = queue.Queue(maxsize=workers * 2)
+    results = queue.Queue()
+    done = object()
+
+    def worker():
+        try:
+            while True:
+                item = tasks.get()
+                if item is done:
+                    return
+                results.put((item, handler(item)))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, name=f"reminder-worker-{i}", daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+
+    def drain(block=False):
+        while True:
+            try:
+                item, result = results.get(block=block, timeout=0.1 if block else None)
+            except queue.Empty:
+                return
+            if on_result:
+                on_result(item, result)
+
+    for item in items:
+        tasks.put(item)
+        drain()
+    for _ in threads:
+        tasks.put(done)
+    while any(t.is_alive() for t in threads):
+        drain(block=True)
+    drain()
+
+
+async def run_async(items, handler, concurrency, on_result=None):
+    """
+    Keeps up to `concurrency` handler(item) coroutines in flight on the running
+    event loop. items may be a DB-backed iterator and on_result(item, result)
+    may touch the database: both run on Django's single sync thread, never on
+    the loop itself.
+    """
+    items = iter(items)
+    next_item = sync_to_async(lambda: next(items, None))
+    report = sync_to_async(on_result) if on_result else None
+    running = {}
+    exhausted = False
+
+    while running or not exhausted:
+        while not exhausted and len(running) < concurrency:
+            item = await next_item()
+            if item is None:
+                exhausted = True
+            else:
+                running[asyncio.create_task(handler(item))] = item
+        if not running:
+            break
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            item = running.pop(task)
+            if report:
+                await report(item, task.result())
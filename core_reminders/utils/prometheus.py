@@ -0,0 +1,137 @@
+"""
+Prometheus text exposition (format 0.0.4) for the reminder pipeline, served by
+the /reminders/metrics/ view and printed by the reminder_metrics command.
+
+Live figures (stage histograms, in-flight gauges, provider counters, HTTP pool
+stats) are this process's own. Reminder counts by status come from the
+database, and the latest send_reminders / poll_videos runs from ReminderRun,
+so the web process can also report on work done by the commands.
+"""
+import sys
+from django.db.models import Count
+from core_reminders.models import Reminder, ReminderRun
+from core_reminders.utils import metrics, throttle
+
+
+PREFIX = "emi_"
+RUN_COMMANDS = ("send_reminders", "poll_videos")
+COUNTER_HELP = {
+    "reminders_total": "Reminders leaving a pipeline step, by resulting status.",
+    "provider_calls_total": "Calls made to each external provider.",
+    "provider_errors_total": "Provider errors by provider and reason (HTTP status, circuit_open, ...).",
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Exposition:
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        self.lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    def sample(self, name, value, **labels):
+        self.lines.append(f"{PREFIX}{name}{_labels(labels.items())} {value}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def _stage_metrics(out):
+    out.family("stage_seconds", "histogram", "Time spent in each pipeline stage.")
+    for stage, h in sorted(metrics.histograms().items()):
+        for bound, count in h["buckets"]:
+            out.sample("stage_seconds_bucket", count, stage=stage, le=f"{bound:g}")
+        out.sample("stage_seconds_bucket", h["count"], stage=stage, le="+Inf")
+        out.sample("stage_seconds_sum", float(h["sum"]), stage=stage)
+        out.sample("stage_seconds_count", h["count"], stage=stage)
+
+    out.family("stage_in_flight", "gauge", "Pipeline stage blocks running right now.")
+    for stage, value in sorted(metrics.in_flight().items()):
+        out.sample("stage_in_flight", value, stage=stage)
+
+
+def _counter_metrics(out):
+    families = {}
+    for (name, labels), total in metrics.counters().items():
+        families.setdefault(name, []).append((labels, total))
+    for name, samples in sorted(families.items()):
+        out.family(name, "counter", COUNTER_HELP.get(name, name))
+        for labels, total in sorted(samples):
+            out.sample(name, int(total), **dict(labels))
+
+
+def _provider_metrics(out):
+    guards = throttle.counters()
+    out.family("provider_rate", "gauge", "Current allowed calls per second for rate-limited providers.")
+    for provider, c in guards.items():
+        if c["rate"] is not None:
+            out.sample("provider_rate", float(c["rate"]), provider=provider)
+    out.family("provider_circuit_open", "gauge", "1 while the provider's circuit breaker is open or probing.")
+    for provider, c in guards.items():
+        out.sample("provider_circuit_open", int(c["circuit"] != "closed"), provider=provider)
+
+    # Only a process that has made provider calls has pool stats; don't import requests just to report none.
+    http = sys.modules.get("core_reminders.utils.http")
+    pool = http.stats() if http else {}
+    out.family("http_requests_total", "counter", "Requests sent through the shared HTTP session.")
+    for host, s in sorted(pool.items()):
+        out.sample("http_requests_total", s["requests"], host=host)
+    out.family("http_connections_opened_total", "counter", "New connections opened (the rest reused a pooled one).")
+    for host, s in sorted(pool.items()):
+        out.sample("http_connections_opened_total", s["connections_opened"], host=host)
+    out.family("http_connect_seconds_total", "counter", "Time spent opening connections (TCP + TLS).")
+    for host, s in sorted(pool.items()):
+        out.sample("http_connect_seconds_total", float(s["handshake_seconds"]), host=host)
+
+
+def _database_metrics(out):
+    out.family("reminders", "gauge", "Reminders in the database by status (queue depth, in flight, ...).")
+    for row in Reminder.objects.values('status').annotate(n=Count('id')).order_by('status'):
+        out.sample("reminders", row['n'], status=row['status'])
+
+    runs = [r for r in (ReminderRun.objects.filter(command=c).order_by('-started_at').first() for c in RUN_COMMANDS) if r]
+    out.family("run_started_timestamp_seconds", "gauge", "Start of the latest run of each command.")
+    for run in runs:
+        out.sample("run_started_timestamp_seconds", float(run.started_at.timestamp()), command=run.command)
+    out.family("run_finished_timestamp_seconds", "gauge", "End of the latest run of each command (absent while running).")
+    for run in runs:
+        if run.finished_at:
+            out.sample("run_finished_timestamp_seconds", float(run.finished_at.timestamp()), command=run.command)
+    out.family("run_outcomes", "gauge", "Reminders by resulting status in the latest run of each command.")
+    for run in runs:
+        for status, count in sorted(run.outcomes.items()):
+            out.sample("run_outcomes", count, command=run.command, status=status)
+    out.family("run_errors", "gauge", "Provider errors in the latest run of each command.")
+    for run in runs:
+        for error, count in sorted(run.errors.items()):
+            out.sample("run_errors", count, command=run.command, error=error)
+    out.family("run_stage_seconds", "summary", "Stage timings in the latest run of each command.")
+    for run in runs:
+        for stage, s in sorted(run.stages.items()):
+            for quantile in ("p50", "p90", "p99"):
+                if s.get(quantile) is not None:
+                    out.sample(
+                        "run_stage_seconds", float(s[quantile]),
+                        command=run.command, stage=stage, quantile=f"0.{quantile[1:]}",
+                    )
+            out.sample("run_stage_seconds_count", s.get("count", 0), command=run.command, stage=stage)
+
+
+def render():
+    out = Exposition()
+    _stage_metrics(out)
+    _counter_metrics(out)
+    _provider_metrics(out)
+    _database_metrics(out)
+    return out.text()
@@ -1,22 +1,17 @@
-import requests
-import json
+import asyncio
 import time
 import os
 import logging
-import mimetypes
-from django.conf import settings
-from openai import OpenAI
-from elevenlabs import ElevenLabs
-from datetime import date
+from asgiref.sync import sync_to_async
+from core_reminders.providers import get_provider
+from core_reminders.providers.base import ProviderUnavailable
+from core_reminders.utils import render_cache, video_storage
+from core_reminders.utils.formatting import format_amount, format_date
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
 
-openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
-eleven_client = ElevenLabs(api_key=settings.ELEVENLABS_API_KEY)
-
-
 INDIAN_AVATAR_ID = "Aditya_public_1"
 
 BASE_SCRIPTS = {
@@ -25,78 +20,52 @@ BASE_SCRIPTS = {
     "BOUNCE_REMINDER": "Hello {customer_name}, your recent EMI payment for loan {loan_number} has bounced. A penalty of {penalty_amount} has been applied. Please make the payment immediately. Thank you.",
 }
 
-def translate_text_openai(text, target_lang):
-    # try:
-    #     response = openai_client.chat.completions.create(
-    #         model="gpt-4o-mini",
-    #         messages=[
-    #             {
-    #                 "role": "system",
-    #                 "content": f"Translate this sentence into {target_lang}. Use polite and natural tone with numerals in {target_lang} script.",
-    #             },
-    #             {"role": "user", "content": text},
-    #         ],
-    #         timeout=30,
-    #     )
-    #     return response.choices[0].message.content.strip()
-    # except Exception as e:
-    #     logging.error(f"Translation failed: {e}")
-    #     return text
-    text='''வணக்கம் கிற்னா, நான் உங்கள் நிதி உதவியாளர் பேசுகிறேன். 
-    உங்கள் கடன் எண் EMI-123467ற்கான மாத தவணை ₹50,000.00, 27 அக்டோபர் 2025 அன்று செலுத்த வேண்டியுள்ளது. 
-      தயவுசெய்து அதை நேரத்தில் செலுத்துங்கள்.EMI-யின் நன்மைகள்: பெரிய தொகையை ஒரே நேரத்தில் செலுத்த தேவையில்லை,
-     மாதாந்திர கட்டணங்களால் நிதி சுமை குறையும்.குறைபாடுகள்: மாதந்தோறும் பொறுப்பு இருக்கும், தாமதம் ஏற்பட்டால் அபராதமும் க்ரெடிட் மதிப்பீட்டிலும் பாதிப்பும் ஏற்படும்.  நேரத்தில் செலுத்தி உங்கள் நிதி நலனை காப்பாற்றுங்கள்.  
-நன்றி!'''
-    return text  
+def translate_text(text, target_lang):
+    return get_provider("translate").translate_text(text, target_lang)
+
+
+def translate_templates(templates, target_lang):
+    """Translates {event_type: template} into target_lang in a single request, placeholders untouched."""
+    return get_provider("translate").translate_templates(templates, target_lang)
+
+
+PENALTY_AMOUNT = 500
+
+# Loan fields generate_scripts() reads, for callers passing a values() stream.
+SCRIPT_FIELDS = ("id", "loan_number", "emi_amount", "due_date", "customer__name", "customer__preferred_language")
+SCRIPT_CHUNK_SIZE = 2000
+
+
+def context_for(customer_name, loan_number, emi_amount, due_date, language="en"):
+    return {
+        "customer_name": customer_name,
+        "emi_amount": format_amount(emi_amount),
+        "due_date": format_date(due_date, language),
+        "loan_number": loan_number,
+        "penalty_amount": format_amount(PENALTY_AMOUNT),
+    }
+
+
+def script_context(customer, loan):
+    language = getattr(customer, "preferred_language", "en")
+    return context_for(customer.name, loan.loan_number, loan.emi_amount, loan.due_date, language)
 
 
 def generate_script(event_type, customer, loan):
-    template = BASE_SCRIPTS.get(event_type)
-    if not template:
-        return "Default reminder: Please pay your EMI."
-
-    english_script = template.format(
-        customer_name=customer.name,
-        emi_amount=loan.emi_amount,
-        due_date=loan.due_date.strftime("%d %B %Y"),
-        loan_number=loan.loan_number,
-        penalty_amount="₹500",
-    )
-
-    customer_lang = getattr(customer, "preferred_language", "en")
-    if customer_lang != "en":
-        translated = translate_text_openai(english_script, customer_lang)
-        logging.info(f"Translated Script ({customer_lang}): {translated}")
-        return translated
-    else:
-        logging.info(f"English Script: {english_script}")
-        return english_script
-
-
-# def generate_voice(script):
-#     try:
-#         voice_id = "KSsyodh37PbfWy29kPtx"
-#         output_path = "reminder_voice.mp3"
-
-#         audio = eleven_client.text_to_speech.convert(
-#             voice_id=voice_id,
-#             model_id="eleven_multilingual_v2",
-#             text=script
-#         )
-
-#         with open(output_path, "wb") as f:
-#             for chunk in audio:
-#                 f.write(chunk)
-
-#         if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-#             logging.info(f"Voice generated successfully: {output_path}")
-#             return output_path
-#         else:
-#             logging.error("Voice file was not created or is empty.")
-#             return None
-#     except Exception as e:
-#         logging.error(f"ElevenLabs voice generation failed: {e}")
-#         return None
+    return get_provider("script").generate_script(event_type, customer, loan)
+
+
+def generate_scripts(event_type, loans, chunk_size=SCRIPT_CHUNK_SIZE):
+    """
+    Yields (loan_id, script) for a Loan queryset, a values() queryset or any
+    iterable of dicts with SCRIPT_FIELDS, without loading model instances.
+    """
+    return get_provider("script").generate_scripts(event_type, loans, chunk_size=chunk_size)
+
+
+def generate_voice(script, output_path):
+    return get_provider("voice").synthesize(script, output_path)
+
 
 # def upload_audio_to_heygen(mp3_path, retries=3, delay=3):
 #     if not os.path.exists(mp3_path) or os.path.getsize(mp3_path) == 0:
@@ -134,61 +103,122 @@ def generate_script(event_type, customer, loan):
 #     logging.error("All attempts to upload audio failed.")
 #     return None
 
-def generate_video(script, customer, timeout=480, poll_interval=8):
+HEYGEN_AVATAR_ID = "Adriana_Business_Front_public"
+HEYGEN_DIMENSION = {"width": 640, "height": 360}
+
+
+def voice_id_for(customer):
+    lang=getattr(customer, "preferred_language", "en")
+    if lang =='Tamil':
+        return "f37bfc7d0be8494c8fa103a4a47eed33"  # Tamil voice ID
+    elif lang =='Hindi':
+        return "dcf69bbbab5b41f2b75b9f86316c06c5"  # Hindi voice ID
+    elif lang =='Kannada':
+        return "7d7d4ebc1c164e71a0542ecab97fdb43"  # Kannada voice ID
+    elif lang =='Telugu':
+        return "8b06642340ad474e8d32b040928fe459"  # Telugu voice ID
+    return "97dd67ab8ce242b6a9e7689cb00c6414"  # Default to English
+
+
+def render_key_for(script, customer):
+    return render_cache.render_key(script, voice_id_for(customer), HEYGEN_AVATAR_ID, HEYGEN_DIMENSION)
+
+
+# Rendering is written once, as generators of steps: each yields the next call
+# to make as (name, *args) and is sent its result (or has its exception thrown
+# in). run_steps() makes the calls blocking; arun_steps() awaits them, so the
+# event-loop runner (send_reminders --async) follows exactly the same logic.
+
+def run_steps(steps, calls):
+    """Drives a step generator with calls[name](*args) and returns what it returns."""
+    result, error = None, None
+    while True:
+        try:
+            name, *args = steps.throw(error) if error else steps.send(result)
+        except StopIteration as done:
+            return done.value
+        try:
+            result, error = calls[name](*args), None
+        except Exception as e:
+            result, error = None, e
+
+
+async def arun_steps(steps, calls):
+    """run_steps() for coroutines: each calls[name](*args) is awaited."""
+    result, error = None, None
+    while True:
+        try:
+            name, *args = steps.throw(error) if error else steps.send(result)
+        except StopIteration as done:
+            return done.value
+        try:
+            result, error = await calls[name](*args), None
+        except Exception as e:
+            result, error = None, e
+
+
+def video_calls():
+    video = get_provider("video")
+    return {
+        "submit": video.submit,
+        "status": video.status,
+        "download": video.download,
+        "save": video_storage.save,
+        "lookup": render_cache.lookup,
+        "store": render_cache.store,
+        "sleep": time.sleep,
+    }
+
+
+def avideo_calls():
+    video = get_provider("video")
+    return {
+        "submit": video.asubmit,
+        "status": video.astatus,
+        "download": video.adownload,
+        # Hashing and storing are blocking file work.
+        "save": sync_to_async(video_storage.save, thread_sensitive=False),
+        "lookup": sync_to_async(render_cache.lookup),
+        "store": sync_to_async(render_cache.store),
+        "sleep": asyncio.sleep,
+    }
+
+
+def submit_steps(script, customer):
     try:
-        lang=getattr(customer, "preferred_language", "en")
-        if lang =='Tamil':
-            voice_id="f37bfc7d0be8494c8fa103a4a47eed33"  # Tamil voice ID
-        elif lang =='Hindi':
-            voice_id="dcf69bbbab5b41f2b75b9f86316c06c5"  # Hindi voice ID
-        elif lang =='Kannada':
-            voice_id="7d7d4ebc1c164e71a0542ecab97fdb43"  # Kannada voice ID
-        elif lang =='Telugu':
-            voice_id="8b06642340ad474e8d32b040928fe459"  # Telugu voice ID
-        else:
-            voice_id="97dd67ab8ce242b6a9e7689cb00c6414"  # Default to English
-
-        logging.info("Step 1: Preparing HeyGen video generation payload...")
-        url = "https://api.heygen.com/v2/video/generate"
-        headers = {
-            "X-Api-Key": settings.HEYGEN_API_KEY,
-            "Content-Type": "application/json",
-        }
-        payload = {
-            "video_inputs": [
-                {
-                    "character": {
-                        "type": "avatar",
-                        "avatar_id": "Adriana_Business_Front_public"
-                    },
-                    "voice": {
-                        "type": "text",
-                        "input_text": script,
-                        "voice_id": voice_id,
-                    }
-                }
-            ],
-            "dimension": {"width": 640, "height": 360},
-            "aspect_ratio": "16:9",
-            "test": True
-        }
-        logging.info("Step 2: Requesting video generation from HeyGen...")
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
-        logging.info(f"Video generation response: {resp.status_code} {resp.text}")
-
-        if resp.status_code not in [200, 201]:
-            logging.error(f"Video generation request failed: {resp.text}")
-            return None
+        logging.info("Requesting video generation...")
+        video_id = yield "submit", script, voice_id_for(customer), HEYGEN_AVATAR_ID, HEYGEN_DIMENSION
+        if video_id:
+            logging.info(f"Video generation started. Video ID: {video_id}")
+        return video_id
+    except ProviderUnavailable:
+        raise
+    except Exception as e:
+        logging.error(f"Unexpected error submitting video: {e}")
+        return None
+
 
-        data = resp.json().get("data", {})
-        video_id = data.get("video_id")
+def download_steps(video_id, video_url, cache_key=None):
+    video_path = os.path.join(video_storage.incoming_dir(), f"{video_id}.mp4")
+    yield "download", video_url, video_path
+
+    stored = yield "save", video_path
+    if cache_key:
+        yield "store", cache_key, stored
+    return stored.url
+
+
+def video_steps(script, customer, timeout=480, poll_interval=8):
+    try:
+        cache_key = render_key_for(script, customer)
+        cached_url = yield "lookup", cache_key
+        if cached_url:
+            return cached_url
+
+        video_id = yield from submit_steps(script, customer)
         if not video_id:
-            logging.error("No video_id returned from HeyGen.")
             return None
 
-        logging.info(f"Video generation started. Video ID: {video_id}")
-        status_url = f"https://api.heygen.com/v1/video_status.get?video_id={video_id}"
-
         elapsed = 0
         attempt = 0
 
@@ -196,65 +226,62 @@ def generate_video(script, customer, timeout=480, poll_interval=8):
             attempt += 1
             logging.info(f"Polling attempt {attempt} (elapsed {elapsed}s)...")
 
-            status_resp = requests.get(status_url, headers=headers, timeout=30)
-            logging.info(f"Status response code: {status_resp.status_code}")
-
-            if status_resp.status_code == 404:
-                logging.warning("404 - Video not ready yet. Retrying...")
-                time.sleep(poll_interval)
-                elapsed += poll_interval
-                continue
-
-            if status_resp.status_code != 200:
-                logging.error(f"Status check failed: {status_resp.text}")
-                time.sleep(poll_interval)
-                elapsed += poll_interval
-                continue
-
-            status_data = status_resp.json().get("data", {})
-            status = status_data.get("status")
-            video_url = status_data.get("video_url")
-
-            logging.info(f"Video status: {status}")
-
-            if status == "completed" and video_url:
-                save_dir = os.path.join(settings.MEDIA_ROOT, "reminder_videos")
-                os.makedirs(save_dir, exist_ok=True)
-                clean_filename = f"{video_id}.mp4"
-                video_path = os.path.join(save_dir, clean_filename)
-
-                logging.info(f"Downloading video from {video_url} ...")
-                video_resp = requests.get(video_url, stream=True, timeout=300)
-                with open(video_path, "wb") as f:
-                    for chunk in video_resp.iter_content(chunk_size=8192):
-                        f.write(chunk)
-
-                logging.info(f"Video saved: {video_path}")
-                web_url = f"{settings.MEDIA_URL}reminder_videos/{clean_filename}"
-                return web_url
-
-            elif status in ["failed", "error"]:
-                logging.error(f"Video generation failed: {status_data}")
+            status, video_url = yield "status", video_id
+            if status == "completed":
+                return (yield from download_steps(video_id, video_url, cache_key=cache_key))
+            if status == "failed":
                 return None
 
-            elif status in ["processing", "pending"]:
-                logging.info("Video still processing...")
-
-            time.sleep(poll_interval)
+            yield "sleep", poll_interval
             elapsed += poll_interval
 
         logging.error("Video generation timed out.")
         return None
 
+    except ProviderUnavailable:
+        raise
     except Exception as e:
-        import traceback
-        logging.error(f"Unexpected error in video generation: {e}")
-        logging.error(traceback.format_exc())
+        logging.exception(f"Unexpected error in video generation: {e}")
         return None
 
-def send_whatsapp_video(to_number, video_url):
-    logging.info(f"Sending WhatsApp video to {to_number}")
-    logging.info(f"Video URL: {video_url}")
-    return "simulated_message_sid"
+
+def submit_video(script, customer):
+    """Starts a render and returns its video_id without waiting for it."""
+    return run_steps(submit_steps(script, customer), video_calls())
+
+
+def get_video_status(video_id):
+    """
+    Returns (status, video_url) for a render. status is one of
+    "completed", "failed", "pending" or "unknown" (transient error, try again later).
+    """
+    return get_provider("video").status(video_id)
+
+
+def download_video(video_id, video_url, cache_key=None):
+    return run_steps(download_steps(video_id, video_url, cache_key=cache_key), video_calls())
+
+
+def generate_video(script, customer, timeout=480, poll_interval=8):
+    """Blocking submit + poll + download. Kept for callers that want the video inline."""
+    return run_steps(video_steps(script, customer, timeout, poll_interval), video_calls())
+
+def send_whatsapp_video(to_number, video_url, sender=None):
+    return get_provider("messaging").send_video(to_number, video_url, sender=sender)
+
+
+# Async variants for the event-loop runner (send_reminders --async). They run
+# the same steps as the functions above; database work goes through
+# sync_to_async, provider calls await the providers' a-prefixed methods.
+
+async def agenerate_script(event_type, customer, loan):
+    # Templates are memoized, so this is almost always CPU-only; the DB is only hit on a miss.
+    return await sync_to_async(generate_script)(event_type, customer, loan)
+
+
+async def asubmit_video(script, customer):
+    return await arun_steps(submit_steps(script, customer), avideo_calls())
 
 
+async def agenerate_video(script, customer, timeout=480, poll_interval=8):
+    return await arun_steps(video_steps(script, customer, timeout, poll_interval), avideo_calls())
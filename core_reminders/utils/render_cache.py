@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import threading
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+from core_reminders.models import RenderCacheEntry, StoredVideo
+from core_reminders.utils import video_storage
+
+
+# 0 disables that limit. Override with RENDER_CACHE_MAX_BYTES / RENDER_CACHE_MAX_ENTRIES.
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+DEFAULT_MAX_ENTRIES = 0
+# Eviction scans the whole table, so only run it every this many stores.
+EVICT_EVERY = 100
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_stores_since_evict = 0
+_stats_lock = threading.Lock()
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def render_key(script, voice_id, avatar_id, dimension):
+    raw = json.dumps([script, voice_id, avatar_id, dimension], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def lookup(key):
+    """Returns the web URL of a cached render, or None on a miss."""
+    entry = RenderCacheEntry.objects.filter(key=key).first()
+    if entry is None:
+        _count("misses")
+        return None
+
+    storage = video_storage.get_storage()
+    if not storage.exists(entry.filename):
+        # File was removed behind our back, drop the stale entry.
+        entry.delete()
+        _count("misses")
+        return None
+
+    RenderCacheEntry.objects.filter(pk=entry.pk).update(hits=F("hits") + 1, last_used_at=timezone.now())
+    _count("hits")
+    logging.info(f"Render cache hit: {key[:12]} -> {entry.filename}")
+    return storage.url(entry.filename)
+
+
+def store(key, stored):
+    """Caches a StoredVideo (see core_reminders.utils.video_storage) under a render key."""
+    filename, size = stored.name, stored.size_bytes
+    RenderCacheEntry.objects.bulk_create(
+        [RenderCacheEntry(key=key, filename=filename, size_bytes=size, last_used_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=["key"],
+        update_fields=["filename", "size_bytes", "last_used_at"],
+    )
+    _count("stores")
+
+    global _stores_since_evict
+    with _stats_lock:
+        _stores_since_evict += 1
+        due = _stores_since_evict >= EVICT_EVERY
+        if due:
+            _stores_since_evict = 0
+    if due:
+        evict()
+
+
+def evict(max_bytes=None, max_entries=None):
+    """
+    Drops least-recently-used entries until both limits are met, deleting their
+    files unless another entry or an unfinished reminder still uses them.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, "RENDER_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+    if max_entries is None:
+        max_entries = getattr(settings, "RENDER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+
+    entries = RenderCacheEntry.objects.all()
+    total_bytes = entries.aggregate(total=Sum("size_bytes"))["total"] or 0
+    total_entries = entries.count()
+
+    evicted = 0
+    for entry in entries.order_by("last_used_at").iterator():
+        over_bytes = max_bytes and total_bytes > max_bytes
+        over_entries = max_entries and total_entries > max_entries
+        if not (over_bytes or over_entries):
+            break
+        # Deduplicated renders can sit under several keys; keep the file while any still uses it.
+        shared = RenderCacheEntry.objects.filter(filename=entry.filename).exclude(pk=entry.pk).exists()
+        entry.delete()
+        stored = StoredVideo.objects.filter(name=entry.filename, archived_at__isnull=True).first()
+        if not shared and stored and not video_storage.in_use(stored.url):
+            video_storage.remove(stored)
+        total_bytes -= entry.size_bytes
+        total_entries -= 1
+        evicted += 1
+
+    if evicted:
+        _count("evictions", evicted)
+        logging.info(f"Render cache evicted {evicted} entries")
+    return evicted
@@ -0,0 +1,49 @@
+"""
+Per-run summaries. Commands wrap their work in RunRecorder, which writes a
+ReminderRun row with outcome counts, stage timings and provider errors when
+the run ends (and on checkpoint(), for long-running pollers), so the metrics
+endpoint in the web process can report on runs in other processes.
+"""
+import logging
+import os
+import socket
+from django.utils import timezone
+from core_reminders.models import ReminderRun
+from core_reminders.utils import metrics
+
+
+class RunRecorder:
+    def __init__(self, command):
+        self.command = command
+        self.run = None
+
+    def summary(self):
+        outcomes, errors = {}, {}
+        for (name, labels), total in metrics.counters().items():
+            labels = dict(labels)
+            if name == "reminders_total":
+                outcomes[labels["status"]] = int(total)
+            elif name == "provider_errors_total":
+                errors[f"{labels['provider']}/{labels['reason']}"] = int(total)
+        return {"outcomes": outcomes, "stages": metrics.summaries(), "errors": errors}
+
+    def checkpoint(self, finished=False):
+        try:
+            for field, value in self.summary().items():
+                setattr(self.run, field, value)
+            if finished:
+                self.run.finished_at = timezone.now()
+            self.run.save()
+        except Exception:
+            # Reporting must never take the run down with it.
+            logging.exception(f"Could not save the {self.command} run summary")
+
+    def __enter__(self):
+        # Each run reports its own numbers, not whatever this process did before.
+        metrics.reset()
+        self.run = ReminderRun.objects.create(command=self.command, host=f"{socket.gethostname()}:{os.getpid()}")
+        return self
+
+    def __exit__(self, *exc):
+        self.checkpoint(finished=True)
+        logging.info(f"{self.command} run {self.run.id}: {self.run.outcomes}")
@@ -0,0 +1,189 @@
+"""
+Windowed reminder scheduling.
+
+send_reminders used to queue only loans due exactly three days out, so a missed
+cron day dropped those customers and month-end due-date spikes arrived as one
+burst. Every run now looks at the whole backlog due within `window_days` and
+spreads generation over the days before each send date:
+
+- A reminder should go out `lead_days` before the loan's due date. Loans already
+  past that point (e.g. after a missed day) are due today.
+- Each day renders about `daily_capacity` videos, measured from recent
+  send_reminders runs unless configured. plan() fills each day as late as
+  possible and moves overflow onto earlier days, so a spike is rendered ahead
+  of time instead of all at once.
+- Sends are released in slots: on `send_weekdays` between `send_hours` (local
+  time, TIME_ZONE) and at most `sends_per_minute`. Finished videos wait as
+  SCHEDULED until their slot; the dispatch stage (core_reminders.utils.dispatcher)
+  sends them from poll_videos, or from send_reminders itself when sends aren't held.
+
+Settings go in REMINDER_SCHEDULE; anything left out keeps DEFAULT_SCHEDULE.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from core_reminders.models import Loan, Reminder, ReminderRun
+from core_reminders.utils import job_queue
+
+
+DEFAULT_SCHEDULE = {
+    "lead_days": 3,
+    "window_days": 10,
+    # Renders per day. None measures it from recent runs (see measured_capacity).
+    "daily_capacity": None,
+    # Hours a day send_reminders is expected to spend rendering, for the measured capacity.
+    "generation_hours": 8,
+    # (first hour, end hour) in local time, e.g. (9, 20). None sends at any hour.
+    "send_hours": None,
+    "send_weekdays": (0, 1, 2, 3, 4, 5, 6),
+    "sends_per_minute": None,
+}
+
+# Used until there is enough run history to measure throughput.
+FALLBACK_DAILY_CAPACITY = 1000
+CAPACITY_HISTORY_DAYS = 7
+MIN_MEASURED_RENDERS = 50
+
+
+def config():
+    return {**DEFAULT_SCHEDULE, **getattr(settings, "REMINDER_SCHEDULE", {})}
+
+
+def plan(demand, capacity, today):
+    """
+    Spreads {target_day: count} over the days from today on, returning {day: count}.
+
+    Days are filled from the last one backwards, at most `capacity` each, and
+    whatever doesn't fit moves to the day before. Today takes everything that is
+    left (including targets already in the past), so nothing is ever dropped.
+    """
+    if not demand:
+        return {}
+    planned = {}
+    carry = 0
+    day = max(max(demand), today)
+    while day > today:
+        load = carry + demand.get(day, 0)
+        planned[day] = min(load, capacity)
+        carry = load - planned[day]
+        day -= timedelta(days=1)
+    planned[today] = carry + sum(n for d, n in demand.items() if d <= today)
+    return {day: n for day, n in sorted(planned.items()) if n}
+
+
+def measured_capacity(now=None):
+    """Renders per day at the throughput of recent send_reminders runs, or None without enough history."""
+    now = now or timezone.now()
+    runs = ReminderRun.objects.filter(
+        command='send_reminders',
+        started_at__gte=now - timedelta(days=CAPACITY_HISTORY_DAYS),
+        finished_at__isnull=False,
+    )
+    renders, seconds = 0, 0.0
+    for run in runs:
+        renders += run.stages.get("video", {}).get("count", 0)
+        seconds += (run.finished_at - run.started_at).total_seconds()
+    if renders < MIN_MEASURED_RENDERS or seconds <= 0:
+        return None
+    return int(renders / seconds * config()["generation_hours"] * 3600)
+
+
+def daily_capacity(now=None):
+    configured = config()["daily_capacity"]
+    if configured:
+        return configured
+    return measured_capacity(now) or FALLBACK_DAILY_CAPACITY
+
+
+def in_send_window(moment):
+    cfg = config()
+    local = timezone.localtime(moment)
+    if local.weekday() not in cfg["send_weekdays"]:
+        return False
+    if cfg["send_hours"] is None:
+        return True
+    start, end = cfg["send_hours"]
+    return start <= local.hour < end
+
+
+def next_send_window(moment):
+    """`moment` if sends are allowed then, otherwise when the next send window opens."""
+    if in_send_window(moment):
+        return moment
+    cfg = config()
+    first_hour = cfg["send_hours"][0] if cfg["send_hours"] else 0
+    day = timezone.localdate(moment)
+    for offset in range(8):
+        opening = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time(first_hour)))
+        if opening > moment and in_send_window(opening):
+            return opening
+    raise ValueError("REMINDER_SCHEDULE has no send window")
+
+
+def send_after_for(due_date, now, lead_days=None):
+    """When a reminder for a loan due on due_date may go out; None if it already may."""
+    send_day = due_date - timedelta(days=config()["lead_days"] if lead_days is None else lead_days)
+    opening = next_send_window(timezone.make_aware(datetime.combine(send_day, time.min)))
+    return opening if opening > now else None
+
+
+def holds_sends():
+    """True if sends are limited to windows or a rate, so they are left to poll_videos."""
+    cfg = config()
+    return bool(cfg["send_hours"] or cfg["sends_per_minute"] or len(cfg["send_weekdays"]) < 7)
+
+
+def ready_to_send(now):
+    """SCHEDULED reminders whose send_after has passed and that nobody is sending right now."""
+    return Reminder.objects.filter(
+        Q(send_after__isnull=True) | Q(send_after__lte=now),
+        Q(lease_owner__isnull=True) | Q(lease_expires_at__lt=now),
+        status='SCHEDULED',
+    )
+
+
+def send_allowance(now):
+    """
+    (how many reminders may be sent now, seconds until more may) for the send
+    window and the per-minute cap, counted across every process. None means no cap.
+    """
+    if not in_send_window(now):
+        return 0, (next_send_window(now) - now).total_seconds()
+    per_minute = config()["sends_per_minute"]
+    if not per_minute:
+        return None, 0
+    minute_ago = now - timedelta(minutes=1)
+    recent = Reminder.objects.filter(dispatched_at__gt=minute_ago).order_by('dispatched_at')
+    allowance = per_minute - recent.count()
+    if allowance > 0:
+        return allowance, 0
+    oldest = recent.values_list('dispatched_at', flat=True).first()
+    return 0, max(1, (oldest - minute_ago).total_seconds())
+
+
+def queue_backlog(now=None):
+    """
+    Queues today's share of the reminder backlog and returns (queued, plan).
+    Safe to run several times a day: queued loans leave the backlog, so later
+    runs only pick up what is still due today.
+    """
+    now = now or timezone.now()
+    cfg = config()
+    today = timezone.localdate(now)
+    lead = timedelta(days=cfg["lead_days"])
+    backlog = Loan.objects.needing_reminder_between('EMI_DUE', today, today + timedelta(days=cfg["window_days"]))
+
+    demand = defaultdict(int)
+    for row in backlog.values('due_date').annotate(n=Count('id')):
+        demand[max(today, row['due_date'] - lead)] += row['n']
+    capacity = daily_capacity(now)
+    schedule = plan(demand, capacity, today)
+    logging.info(f"Reminder plan at {capacity}/day: { {str(day): n for day, n in schedule.items()} }")
+
+    # Earliest due dates first, so reminders that can't wait any longer always make the cut.
+    loan_ids = list(backlog.order_by('due_date', 'id').values_list('id', flat=True)[:schedule.get(today, 0)])
+    queued = job_queue.enqueue(loan_ids, send_after=lambda due_date: send_after_for(due_date, now))
+    return queued, schedule
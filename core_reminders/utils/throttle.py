@@ -0,0 +1,286 @@
+"""
+Rate limiting and circuit breaking for calls to external providers.
+
+get_provider() wraps every provider in a GuardedProvider, so each call first
+takes a token from the provider's RateLimiter and is refused outright while
+its CircuitBreaker is open. Providers raise ProviderUnavailable for 429s, 5xx
+responses and connection errors; that halves the allowed rate (and pauses all
+callers for Retry-After, when given) and counts against the breaker. Successful
+calls slowly raise the rate back to the configured maximum.
+
+Limits are configured per provider in REMINDER_PROVIDERS:
+
+    "video": {
+        "class": "core_reminders.providers.heygen.HeyGenVideoProvider",
+        "rate_limit": {"rate": 2, "burst": 4},
+        "circuit_breaker": {"failure_threshold": 0.5, "window": 20, "reset_after": 60},
+    }
+
+Without "rate_limit" calls are not rate limited; the breaker is always on.
+Callers wait for tokens and for short Retry-After pauses; a pause longer than
+max_wait raises ProviderUnavailable instead, so the reminder is parked.
+counters() reports what each guard has done since the providers were loaded.
+"""
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from core_reminders.providers.base import ProviderUnavailable
+from core_reminders.utils import metrics
+
+
+class CircuitOpen(ProviderUnavailable):
+    reason = "circuit_open"
+
+
+class Deferred(ProviderUnavailable):
+    reason = "retry_after"
+
+
+class RateLimiter:
+    """
+    Token bucket whose rate backs off multiplicatively on throttling responses
+    and recovers additively on success (AIMD). rate=None means unlimited.
+    """
+
+    def __init__(self, rate=None, burst=None, min_rate=None, recovery=0.05, max_wait=10):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1, rate or 1)
+        self.min_rate = min_rate or (rate / 20 if rate else None)
+        self.recovery = recovery
+        self.max_wait = max_wait
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+        self.waited = 0.0
+        self.deferred = 0
+
+    def _reserve(self):
+        """Takes a token and returns None, or returns how long to wait before trying again."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                delay = self.paused_until - now
+                if delay > self.max_wait:
+                    # A long Retry-After: let the caller park the work rather than hold a worker.
+                    self.deferred += 1
+                    raise Deferred("Waiting out Retry-After", retry_after=delay)
+            elif self.rate is None:
+                return None
+            else:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return None
+                delay = (1 - self.tokens) / self.rate
+            self.waited += delay
+            return delay
+
+    def acquire(self):
+        while (delay := self._reserve()) is not None:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        while (delay := self._reserve()) is not None:
+            await asyncio.sleep(delay)
+
+    def throttled(self, retry_after=None):
+        with self.lock:
+            if self.rate is not None:
+                self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        if self.rate is None or self.rate >= self.max_rate:
+            return
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+
+class CircuitBreaker:
+    """
+    Opens when at least failure_threshold of the last `window` calls failed
+    (once min_calls have been seen). After reset_after seconds one probe call
+    is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name="provider", failure_threshold=0.5, window=20, min_calls=5, reset_after=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_after = reset_after
+        self.outcomes = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0
+        self.probing = False
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    def check(self):
+        with self.lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_after - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return
+            self.rejected += 1
+            raise CircuitOpen(f"{self.name} circuit is open", retry_after=max(remaining, 1))
+
+    def skipped(self):
+        """The call allowed by check() never went out; frees the probe slot if it had it."""
+        with self.lock:
+            self.probing = False
+
+    def record(self, ok):
+        with self.lock:
+            if self.state == "half_open":
+                self.probing = False
+                if ok:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            self.outcomes.append(ok)
+            failures = self.outcomes.count(False)
+            if (
+                self.state == "closed"
+                and len(self.outcomes) >= self.min_calls
+                and failures / len(self.outcomes) >= self.failure_threshold
+            ):
+                self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.opened += 1
+        logging.error(f"{self.name} circuit opened after {self.outcomes.count(False)} failures in {len(self.outcomes)} calls")
+
+
+class GuardedProvider:
+    """Proxies a provider, running each method call through its limiter and breaker."""
+
+    def __init__(self, kind, provider, rate_limit=None, circuit_breaker=None):
+        self.kind = kind
+        self.provider = provider
+        self.limiter = RateLimiter(**(rate_limit or {}))
+        self.breaker = CircuitBreaker(name=kind, **(circuit_breaker or {}))
+        self.calls = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        _guards[kind] = self
+
+    def __getattr__(self, name):
+        attr = getattr(self.provider, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        if inspect.iscoroutinefunction(attr):
+            async def guarded_async(*args, **kwargs):
+                return await self.acall(attr, *args, **kwargs)
+
+            return guarded_async
+
+        def guarded(*args, **kwargs):
+            return self.call(attr, *args, **kwargs)
+
+        return guarded
+
+    def call(self, fn, *args, **kwargs):
+        self._admit()
+        try:
+            self.limiter.acquire()
+        except ProviderUnavailable as e:
+            self.breaker.skipped()
+            self._count_error(e)
+            raise
+        self._started()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._succeeded()
+        return result
+
+    async def acall(self, fn, *args, **kwargs):
+        self._admit()
+        try:
+            await self.limiter.acquire_async()
+        except ProviderUnavailable as e:
+            self.breaker.skipped()
+            self._count_error(e)
+            raise
+        self._started()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._succeeded()
+        return result
+
+    def _admit(self):
+        try:
+            self.breaker.check()
+        except CircuitOpen as e:
+            self._count_error(e)
+            raise
+
+    def _started(self):
+        with self.lock:
+            self.calls += 1
+        metrics.increment("provider_calls_total", provider=self.kind)
+
+    def _count_error(self, error):
+        reason = getattr(error, "reason", None) or getattr(error, "status_code", None) or type(error).__name__
+        metrics.increment("provider_errors_total", provider=self.kind, reason=str(reason))
+
+    def _failed(self, error):
+        self._count_error(error)
+        if isinstance(error, ProviderUnavailable):
+            with self.lock:
+                self.failures += 1
+            self.limiter.throttled(error.retry_after)
+            self.breaker.record(False)
+        else:
+            # The service answered; this is our problem, not an outage.
+            self.breaker.record(True)
+
+    def _succeeded(self):
+        self.limiter.succeeded()
+        self.breaker.record(True)
+
+    def counters(self):
+        return {
+            "calls": self.calls,
+            "unavailable": self.failures,
+            "rate": self.limiter.rate,
+            "max_rate": self.limiter.max_rate,
+            "seconds_waited": round(self.limiter.waited, 3),
+            "deferred": self.limiter.deferred,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "rejected": self.breaker.rejected,
+        }
+
+
+_guards = {}
+
+
+def counters():
+    return {kind: guard.counters() for kind, guard in sorted(_guards.items())}
+
+
+def reset():
+    _guards.clear()
@@ -0,0 +1,136 @@
+"""
+Translated script templates.
+
+Templates are translated before the customer's details are substituted, so one
+translation serves every customer with that (event_type, language). Results
+are memoized in-process and persisted in TranslatedTemplate; misses for a
+language are translated together in a single request.
+
+There is no per-customer fallback. A language whose batch hit a provider
+outage isn't retried until the provider should be back (retry_in() says when),
+and a translation that came back unusable is replaced by the English template.
+"""
+import hashlib
+import logging
+import string
+import threading
+import time
+from core_reminders.models import TranslatedTemplate
+from core_reminders.providers.base import ProviderUnavailable
+from core_reminders.utils import metrics
+
+
+# Bump when the translation prompt changes so stored translations are redone.
+PROMPT_VERSION = 1
+# How long a language's batch waits after an outage when the provider didn't say.
+RETRY_SECONDS = 300
+
+_memo = {}
+# Keys whose translation failed in this process; not retried per customer, only on the next run.
+_failed = set()
+# language -> time.monotonic() before which its batch is not sent again, after an outage.
+_retry_at = {}
+_memo_lock = threading.Lock()
+
+
+def source_hash(template):
+    return hashlib.sha256(f"{PROMPT_VERSION}:{template}".encode("utf-8")).hexdigest()
+
+
+def placeholders(template):
+    return {field for _, field, _, _ in string.Formatter().parse(template) if field}
+
+
+def _base_scripts():
+    from core_reminders.utils.reminder_utils import BASE_SCRIPTS
+    return BASE_SCRIPTS
+
+
+def get_template(event_type, language):
+    """Returns the template for this language, or None if it has not been translated yet."""
+    template = _base_scripts().get(event_type)
+    if template is None or language == "en":
+        return template
+
+    memo_key = (event_type, language, source_hash(template))
+    with _memo_lock:
+        if memo_key in _memo:
+            return _memo[memo_key]
+
+    text = (
+        TranslatedTemplate.objects.filter(event_type=event_type, language=language, source_hash=memo_key[2])
+        .values_list("text", flat=True)
+        .first()
+    )
+    if text is not None:
+        with _memo_lock:
+            _memo[memo_key] = text
+    return text
+
+
+def prefetch(languages, event_types=None, translate_batch=None):
+    """
+    Makes sure every (event_type, language) template is translated. Misses are
+    sent as one batched request per language. Returns the number of new translations.
+    """
+    if translate_batch is None:
+        from core_reminders.utils.reminder_utils import translate_templates
+        translate_batch = translate_templates
+
+    base = _base_scripts()
+    event_types = list(event_types or base)
+    created = 0
+
+    for language in set(languages) - {"en"}:
+        if retry_in(language):
+            continue
+        missing = {
+            et: base[et] for et in event_types
+            if et in base and (et, language) not in _failed and get_template(et, language) is None
+        }
+        if not missing:
+            continue
+
+        logging.info(f"Translating {len(missing)} templates into {language} in one request")
+        try:
+            with metrics.timed("translate"):
+                translated = translate_batch(missing, language) or {}
+        except ProviderUnavailable as e:
+            # Not the translation's fault; retried once the provider should be back.
+            logging.warning(f"Skipping {language} templates for now: {e}")
+            with _memo_lock:
+                _retry_at[language] = time.monotonic() + (e.retry_after or RETRY_SECONDS)
+            continue
+
+        rows = []
+        for event_type, template in missing.items():
+            text = translated.get(event_type)
+            if not text or placeholders(text) != placeholders(template):
+                logging.error(f"Discarding {language} translation of {event_type}: placeholders do not match")
+                with _memo_lock:
+                    _failed.add((event_type, language))
+                continue
+            rows.append(TranslatedTemplate(
+                event_type=event_type,
+                language=language,
+                source_hash=source_hash(template),
+                text=text,
+            ))
+        TranslatedTemplate.objects.bulk_create(rows, ignore_conflicts=True)
+        created += len(rows)
+
+    return created
+
+
+def retry_in(language):
+    """Seconds until this language's batch may be sent again after an outage, or None."""
+    with _memo_lock:
+        remaining = _retry_at.get(language, 0) - time.monotonic()
+    return remaining if remaining > 0 else None
+
+
+def clear_memo():
+    with _memo_lock:
+        _memo.clear()
+        _failed.clear()
+        _retry_at.clear()
@@ -0,0 +1,223 @@
+import logging
+import uuid
+from datetime import timedelta
+from django.db import connection
+from django.db.models import Min, Q
+from django.utils import timezone
+from core_reminders.models import Reminder
+from core_reminders.providers.base import ProviderUnavailable
+from core_reminders.utils import dispatcher, local_render, metrics, render_cache
+from core_reminders.utils.pipeline import (
+    POLL_MAX_INTERVAL,
+    ReminderUpdates,
+    complete_reminder,
+    forget_render,
+    next_poll_delay,
+    park,
+)
+from core_reminders.utils.reminder_utils import download_video, generate_script, get_video_status
+
+
+# A download (and send) still unfinished after this long is assumed lost with its process.
+DOWNLOAD_LEASE_SECONDS = 1800
+
+
+def in_flight():
+    return Reminder.objects.filter(status='GENERATING', heygen_video_id__isnull=False)
+
+
+def requeue_interrupted_downloads(now=None):
+    """Downloads lost with their process go back to polling, which fetches a fresh video URL."""
+    now = now or timezone.now()
+    return Reminder.objects.filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now), status='DOWNLOADING',
+    ).update(status='GENERATING', next_poll_at=None, lease_owner=None, lease_expires_at=None)
+
+
+def claim_for_download(reminders):
+    """
+    Moves GENERATING reminders to DOWNLOADING under a lease and returns the ones
+    this caller won. The poller and the webhook can both see a render finish;
+    only one of them may download and send it.
+    """
+    if not reminders:
+        return []
+    owner = f"download:{uuid.uuid4().hex[:12]}"
+    expires = timezone.now() + timedelta(seconds=DOWNLOAD_LEASE_SECONDS)
+    ids = [r.id for r in reminders]
+    Reminder.objects.filter(id__in=ids, status='GENERATING').update(
+        status='DOWNLOADING', lease_owner=owner, lease_expires_at=expires,
+    )
+    won = set(Reminder.objects.filter(id__in=ids, lease_owner=owner).values_list('id', flat=True))
+    claimed = [r for r in reminders if r.id in won]
+    for reminder in claimed:
+        reminder.status = 'DOWNLOADING'
+        reminder.lease_owner = owner
+        reminder.lease_expires_at = expires
+    return claimed
+
+
+def hand_off(claimed, downloads=None):
+    """
+    Downloads and sends [(reminder, video_url)] won by claim_for_download, on
+    `downloads` (a DownloadPool) when given, otherwise inline.
+    """
+    updates = ReminderUpdates()
+    for reminder, video_url in claimed:
+        if downloads is None:
+            finish(reminder, video_url)
+            updates.add(reminder)
+        else:
+            downloads.submit(finish_in_background, reminder, video_url)
+    updates.flush()
+    if claimed and downloads is None:
+        dispatcher.release_scheduled()
+
+
+def finish(reminder, video_url):
+    """Downloads a completed render (unless a shared job already did) and sends it. Updates in memory only."""
+    try:
+        # Jobs shared between reminders only need downloading once.
+        web_url = reminder.render_key and render_cache.lookup(reminder.render_key)
+        if not web_url:
+            with metrics.timed("download"):
+                web_url = download_video(reminder.heygen_video_id, video_url, cache_key=reminder.render_key)
+        if reminder.submitted_at:
+            metrics.record("render_wait", (timezone.now() - reminder.submitted_at).total_seconds())
+        complete_reminder(reminder, web_url)
+    except ProviderUnavailable as e:
+        # The video is cached under render_key, so the retry only has to send it.
+        logging.warning(f"Parking reminder {reminder.id}: {e}")
+        park(reminder, e)
+    except Exception as e:
+        logging.error(f"Could not finish reminder {reminder.id}: {e}")
+        reminder.status = 'FAILED'
+    reminder.lease_owner = None
+    reminder.lease_expires_at = None
+    forget_render(reminder.render_key)
+    metrics.outcome(reminder.status)
+
+
+def finish_locally(claimed):
+    """
+    Renders reminders HeyGen didn't deliver on our own cores (see local_render)
+    and sends them; FAILED where that doesn't work either. Updates in memory only.
+    """
+    jobs = [(generate_script(r.event_type, r.customer, r.loan), r.customer) for r in claimed]
+    for reminder, web_url in zip(claimed, local_render.render_many(jobs)):
+        try:
+            if web_url:
+                complete_reminder(reminder, web_url)
+            else:
+                reminder.status = 'FAILED'
+        except ProviderUnavailable as e:
+            park(reminder, e)
+        reminder.lease_owner = None
+        reminder.lease_expires_at = None
+        forget_render(reminder.render_key)
+        metrics.outcome(reminder.status)
+
+
+def render_locally(undelivered, downloads=None):
+    """
+    Claims renders HeyGen didn't deliver (failed or timed out) and renders them
+    locally, on `downloads` (a DownloadPool) when given, otherwise inline.
+    Returns the reminders claimed. Claimed like a download, so a late webhook or
+    poll for the same render can't send it twice.
+    """
+    claimed = claim_for_download(undelivered)
+    if claimed and downloads is not None:
+        downloads.submit(render_locally_in_background, claimed)
+    elif claimed:
+        finish_locally(claimed)
+        updates = ReminderUpdates()
+        for reminder in claimed:
+            updates.add(reminder)
+        updates.flush()
+        dispatcher.release_scheduled()
+    return claimed
+
+
+def render_locally_in_background(claimed):
+    try:
+        finish_locally(claimed)
+        for reminder in claimed:
+            reminder.save(update_fields=ReminderUpdates.fields)
+        dispatcher.release_scheduled()
+    finally:
+        connection.close()
+
+
+def finish_in_background(reminder, video_url):
+    try:
+        finish(reminder, video_url)
+        reminder.save(update_fields=ReminderUpdates.fields)
+        # Webhook-finished renders go out now rather than at the poller's next sweep.
+        dispatcher.release_scheduled()
+    finally:
+        connection.close()
+
+
+def poll_once(timeout=480, downloads=None):
+    """
+    Checks every in-flight render whose next poll is due, once. Finished renders,
+    and failed ones being rendered locally, are handed to `downloads` (a
+    DownloadPool) when given, so slow transfers and encodes don't hold up status
+    checks; otherwise they are done inline.
+    Returns the number of seconds until the next render needs checking, or None if nothing is in flight.
+    """
+    now = timezone.now()
+    requeue_interrupted_downloads(now)
+    due = in_flight().filter(Q(next_poll_at__isnull=True) | Q(next_poll_at__lte=now)).select_related('customer', 'loan')
+    updates = ReminderUpdates()
+    completed = []
+    undelivered = []
+
+    for reminder in due:
+        try:
+            with metrics.timed("poll"):
+                status, video_url = get_video_status(reminder.heygen_video_id)
+        except ProviderUnavailable as e:
+            # Check again once the provider should be back; doesn't count as a poll.
+            reminder.next_poll_at = now + timedelta(seconds=e.retry_after or POLL_MAX_INTERVAL)
+            updates.add(reminder)
+            continue
+        except Exception as e:
+            logging.error(f"Status check errored for {reminder.heygen_video_id}: {e}")
+            status, video_url = "unknown", None
+
+        if status == "completed":
+            completed.append((reminder, video_url))
+            continue
+
+        if status == "failed" or (reminder.submitted_at and now - reminder.submitted_at > timedelta(seconds=timeout)):
+            if status != "failed":
+                logging.error(f"Video {reminder.heygen_video_id} timed out.")
+            if local_render.enabled():
+                undelivered.append(reminder)
+                continue
+            updates.add(reminder)
+            reminder.status = 'FAILED'
+            forget_render(reminder.render_key)
+            metrics.outcome('FAILED')
+            continue
+
+        updates.add(reminder)
+        reminder.poll_attempts += 1
+        reminder.next_poll_at = now + next_poll_delay(reminder.poll_attempts)
+
+    updates.flush()
+    # Local renders run ffmpeg for as long as a render takes; keep them off the polling loop too.
+    render_locally(undelivered, downloads)
+    # A webhook may have claimed some of these already.
+    urls = {reminder.id: video_url for reminder, video_url in completed}
+    claimed = claim_for_download([reminder for reminder, _ in completed])
+    hand_off([(reminder, urls[reminder.id]) for reminder in claimed], downloads)
+
+    remaining = in_flight()
+    if not remaining.exists():
+        return None
+    next_at = remaining.aggregate(next_at=Min('next_poll_at'))['next_at']
+    if next_at is None:
+        return 0
+    return min(POLL_MAX_INTERVAL, max(0, (next_at - timezone.now()).total_seconds()))
@@ -0,0 +1,249 @@
+"""
+Storage for rendered reminder videos.
+
+Videos go through a Django storage backend: STORAGES["reminder_videos"] when
+configured (e.g. S3), otherwise a FileSystemStorage under
+MEDIA_ROOT/reminder_videos. Downloads and compositions are first written to a
+local incoming directory, then saved under their content hash in one
+directory per day:
+
+    2026/10/18/3f/3f9a...e1.mp4
+
+Identical content is stored once (StoredVideo is keyed by SHA-256), and no
+directory grows past one day's renders spread over 256 hash prefixes.
+
+prune() deletes or archives files that only SENT (or FAILED) reminders older
+than the retention period still point at; the prune_videos command runs it.
+Files are served by the video view, which hands the transfer to the web server
+with X-Sendfile or X-Accel-Redirect when REMINDER_VIDEO_SENDFILE is set.
+"""
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from urllib.parse import unquote
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from core_reminders.models import Reminder, RenderCacheEntry, StoredVideo
+
+
+STORAGE_ALIAS = "reminder_videos"
+ARCHIVE_ALIAS = "reminder_videos_archive"
+DEFAULT_URL = "/reminders/videos/"
+DEFAULT_RETENTION_DAYS = 30
+HASH_CHUNK_SIZE = 1024 * 1024
+# Reminders in these states have finished with their video.
+DONE_STATUSES = ('SENT', 'FAILED')
+
+
+class _LocalFile(File):
+    """A file already on local disk; FileSystemStorage moves it into place instead of copying."""
+
+    def temporary_file_path(self):
+        return self.name
+
+
+def get_storage():
+    if STORAGE_ALIAS in settings.STORAGES:
+        return storages[STORAGE_ALIAS]
+    return FileSystemStorage(
+        location=os.path.join(settings.MEDIA_ROOT, "reminder_videos"),
+        base_url=getattr(settings, "REMINDER_VIDEO_URL", DEFAULT_URL),
+    )
+
+
+def get_archive_storage():
+    if ARCHIVE_ALIAS in settings.STORAGES:
+        return storages[ARCHIVE_ALIAS]
+    return FileSystemStorage(
+        location=getattr(settings, "REMINDER_VIDEO_ARCHIVE_ROOT", None)
+        or os.path.join(settings.MEDIA_ROOT, "reminder_videos_archive"),
+    )
+
+
+def incoming_dir():
+    """Local scratch space for downloads and compositions before they are stored."""
+    path = os.path.join(settings.MEDIA_ROOT, "incoming")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shard_name(sha256, moment):
+    return f"{timezone.localtime(moment):%Y/%m/%d}/{sha256[:2]}/{sha256}.mp4"
+
+
+def _discard_local(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def save(local_path, moment=None):
+    """
+    Stores a finished local video and returns its StoredVideo. If the same
+    content is already stored, the local file is dropped and the existing copy
+    is returned; either way local_path is gone afterwards.
+    """
+    storage = get_storage()
+    sha256 = file_sha256(local_path)
+    existing = StoredVideo.objects.filter(sha256=sha256, archived_at__isnull=True).first()
+    if existing and storage.exists(existing.name):
+        _discard_local(local_path)
+        return existing
+
+    size = os.path.getsize(local_path)
+    with open(local_path, "rb") as f:
+        name = storage.save(shard_name(sha256, moment or timezone.now()), _LocalFile(f, name=local_path))
+    _discard_local(local_path)
+
+    fields = {"name": name, "url": storage.url(name), "size_bytes": size, "archived_at": None}
+    stored, created = StoredVideo.objects.get_or_create(sha256=sha256, defaults=fields)
+    if not created:
+        if stored.archived_at is None and stored.name != name and storage.exists(stored.name):
+            # Another process stored the same content a moment ago; keep theirs.
+            storage.delete(name)
+            return stored
+        # Archived or missing: this copy becomes the live one again.
+        for field, value in fields.items():
+            setattr(stored, field, value)
+        stored.save()
+    logging.info(f"Video stored: {name}")
+    return stored
+
+
+def name_for_url(url):
+    """Storage name behind a video URL, including files stored before StoredVideo existed."""
+    name = StoredVideo.objects.filter(url=url).values_list("name", flat=True).first()
+    if name:
+        return name
+    base = get_storage().url("")
+    for prefix in (base, f"{settings.MEDIA_URL}reminder_videos/"):
+        if url.startswith(prefix):
+            return unquote(url[len(prefix):])
+    return os.path.basename(url)
+
+
+def local_path(url):
+    """A local file with the video behind url, fetching it when the storage isn't local disk."""
+    storage = get_storage()
+    name = name_for_url(url)
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        path = os.path.join(incoming_dir(), name.replace("/", "_"))
+        if not os.path.exists(path):
+            with storage.open(name) as src, open(path, "wb") as dst:
+                for chunk in src.chunks():
+                    dst.write(chunk)
+        return path
+
+
+def in_use(url, cutoff=None):
+    """
+    True while some reminder may still need the video: it hasn't finished, or
+    (with cutoff) it was sent after cutoff.
+    """
+    reminders = Reminder.objects.filter(video_url=url)
+    if cutoff is None:
+        return reminders.exclude(status__in=DONE_STATUSES).exists()
+    done_before_cutoff = Q(status='FAILED') | Q(status='SENT', finished_at__lt=cutoff)
+    return reminders.annotate(finished_at=Coalesce('dispatched_at', 'sent_at')).exclude(done_before_cutoff).exists()
+
+
+def remove(stored, archive=False):
+    """Deletes (or moves to the archive storage) one stored video and forgets the URL everywhere."""
+    storage = get_storage()
+    if storage.exists(stored.name):
+        if archive:
+            with storage.open(stored.name) as f:
+                get_archive_storage().save(stored.name, f)
+        storage.delete(stored.name)
+    RenderCacheEntry.objects.filter(filename=stored.name).delete()
+    Reminder.objects.filter(video_url=stored.url).update(video_url=None)
+    if archive:
+        stored.archived_at = timezone.now()
+        stored.save(update_fields=["archived_at"])
+    else:
+        stored.delete()
+
+
+def prune(days=None, archive=False, dry_run=False, now=None):
+    """
+    Removes videos stored more than `days` ago that no reminder still needs and
+    the render cache hasn't reused since. Returns (videos, bytes) removed.
+    """
+    days = days if days is not None else getattr(settings, "REMINDER_VIDEO_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    recently_reused = RenderCacheEntry.objects.filter(last_used_at__gte=cutoff).values("filename")
+    candidates = (
+        StoredVideo.objects.filter(created_at__lt=cutoff, archived_at__isnull=True)
+        .exclude(name__in=recently_reused)
+        .order_by("id")
+    )
+
+    removed = removed_bytes = 0
+    for stored in candidates.iterator(chunk_size=500):
+        if in_use(stored.url, cutoff):
+            continue
+        if not dry_run:
+            remove(stored, archive=archive)
+        removed += 1
+        removed_bytes += stored.size_bytes
+    return removed, removed_bytes
+
+
+def compact(now=None):
+    """
+    Tidies a filesystem video store: adopts flat files from before sharding into
+    StoredVideo (so prune() covers them) and removes empty day directories.
+    Returns (adopted, directories removed).
+    """
+    storage = get_storage()
+    try:
+        root = storage.path("")
+    except NotImplementedError:
+        return 0, 0
+    if not os.path.isdir(root):
+        return 0, 0
+
+    adopted = 0
+    _, files = storage.listdir("")
+    for name in files:
+        if not name.endswith(".mp4"):
+            continue
+        path = storage.path(name)
+        url = f"{settings.MEDIA_URL}reminder_videos/{name}"
+        if StoredVideo.objects.filter(url=url).exists():
+            continue
+        sha256 = file_sha256(path)
+        if StoredVideo.objects.filter(sha256=sha256).exists():
+            # Same content is already stored under a sharded name; repoint and drop the copy.
+            stored = StoredVideo.objects.get(sha256=sha256)
+            Reminder.objects.filter(video_url=url).update(video_url=stored.url)
+            RenderCacheEntry.objects.filter(filename=name).update(filename=stored.name)
+            storage.delete(name)
+        else:
+            stored = StoredVideo.objects.create(sha256=sha256, name=name, url=url, size_bytes=os.path.getsize(path))
+            created_at = timezone.make_aware(datetime.fromtimestamp(os.path.getmtime(path)))
+            StoredVideo.objects.filter(pk=stored.pk).update(created_at=created_at)
+        adopted += 1
+
+    removed_dirs = 0
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        if dirpath != root and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+            removed_dirs += 1
+    return adopted, removed_dirs
@@ -0,0 +1,89 @@
+"""
+HeyGen video-completion callbacks.
+
+HeyGen POSTs a JSON event to the webhook endpoint when a render finishes:
+
+    {"event_type": "avatar_video.success", "event_data": {"video_id": "...", "url": "..."}}
+    {"event_type": "avatar_video.fail", "event_data": {"video_id": "...", "msg": "..."}}
+
+The raw body is signed with HMAC-SHA256 using HEYGEN_WEBHOOK_SECRET, hex
+encoded in the Signature header. A success moves every reminder sharing that
+render straight to download and send; a failure fails them, or has them
+rendered locally when REMINDER_LOCAL_RENDER is enabled. Status polling then
+only runs as a slow fallback sweep (VIDEO_POLL_FALLBACK_INTERVAL) for callbacks
+that never arrive.
+"""
+import hashlib
+import hmac
+import logging
+import threading
+from django.conf import settings
+from core_reminders.utils import local_render, metrics
+from core_reminders.utils.downloads import DownloadPool
+from core_reminders.utils.pipeline import forget_render
+from core_reminders.utils.video_poller import claim_for_download, hand_off, in_flight, render_locally
+
+
+SIGNATURE_HEADER = "Signature"
+SUCCESS_EVENT = "avatar_video.success"
+FAIL_EVENT = "avatar_video.fail"
+
+_downloads = None
+_downloads_lock = threading.Lock()
+
+
+def signature(body, secret=None):
+    secret = secret if secret is not None else settings.HEYGEN_WEBHOOK_SECRET
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify(body, received):
+    secret = getattr(settings, "HEYGEN_WEBHOOK_SECRET", "")
+    if not secret or not received:
+        return False
+    return hmac.compare_digest(signature(body, secret), received)
+
+
+def download_pool():
+    """Downloads started by callbacks run here, so the endpoint answers HeyGen straight away."""
+    global _downloads
+    with _downloads_lock:
+        if _downloads is None:
+            _downloads = DownloadPool()
+        return _downloads
+
+
+def drain():
+    """Waits for callback downloads to finish (tests, shutdown)."""
+    global _downloads
+    with _downloads_lock:
+        pool, _downloads = _downloads, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def handle_event(event, downloads=None):
+    """Applies one callback. Returns how many reminders it moved along; repeats are no-ops."""
+    data = event.get("event_data") or {}
+    video_id = data.get("video_id")
+    if not video_id:
+        return 0
+    reminders = list(in_flight().filter(heygen_video_id=video_id).select_related('customer', 'loan'))
+
+    if event.get("event_type") == SUCCESS_EVENT and data.get("url"):
+        claimed = claim_for_download(reminders)
+        hand_off([(reminder, data["url"]) for reminder in claimed], downloads)
+        return len(claimed)
+
+    if event.get("event_type") == FAIL_EVENT:
+        logging.error(f"HeyGen reported render {video_id} failed: {data.get('msg')}")
+        if local_render.enabled():
+            # As the poller does: render it ourselves rather than fail the reminders.
+            return len(render_locally(reminders, downloads))
+        failed = in_flight().filter(heygen_video_id=video_id).update(status='FAILED', next_poll_at=None)
+        for reminder in reminders:
+            forget_render(reminder.render_key)
+        metrics.outcome('FAILED', failed)
+        return failed
+
+    return 0
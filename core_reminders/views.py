@@ -1,3 +1,78 @@
-from django.shortcuts import render
+import hmac
+import json
+import logging
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from core_reminders.utils import dispatcher, prometheus, video_storage, webhooks
 
-# Create your views here.
+
+@csrf_exempt
+@require_POST
+def heygen_webhook(request):
+    if not webhooks.verify(request.body, request.headers.get(webhooks.SIGNATURE_HEADER)):
+        logging.warning("Rejected HeyGen callback with a bad or missing signature")
+        return HttpResponseForbidden("Invalid signature")
+    try:
+        event = json.loads(request.body)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid JSON")
+    if not isinstance(event, dict):
+        return HttpResponseBadRequest("Expected a JSON object")
+
+    # Unknown or repeated events are acknowledged too, so HeyGen stops retrying them.
+    moved = webhooks.handle_event(event, downloads=webhooks.download_pool())
+    return JsonResponse({"reminders": moved})
+
+
+@csrf_exempt
+@require_POST
+def twilio_status(request):
+    url = getattr(settings, "TWILIO_STATUS_CALLBACK_URL", "") or request.build_absolute_uri()
+    if not dispatcher.verify_callback(url, request.POST.dict(), request.headers.get("X-Twilio-Signature")):
+        logging.warning("Rejected Twilio status callback with a bad or missing signature")
+        return HttpResponseForbidden("Invalid signature")
+    sid, status = request.POST.get("MessageSid"), request.POST.get("MessageStatus")
+    if not sid or not status:
+        return HttpResponseBadRequest("Expected MessageSid and MessageStatus")
+    # Unknown SIDs are acknowledged too, so Twilio stops retrying them.
+    dispatcher.record_delivery(sid, status, request.POST.get("ErrorCode"))
+    return HttpResponse(status=204)
+
+
+@require_GET
+def metrics(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        # Host names, error reasons and queue depth aren't for the public: without a
+        # token the endpoint only exists in development.
+        if not settings.DEBUG:
+            raise Http404("Metrics are disabled")
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden("Invalid token")
+    return HttpResponse(prometheus.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@require_GET
+def video(request, name):
+    storage = video_storage.get_storage()
+    try:
+        if not storage.exists(name):
+            raise Http404("No such video")
+    except SuspiciousFileOperation:
+        raise Http404("No such video")
+
+    mode = getattr(settings, "REMINDER_VIDEO_SENDFILE", "")
+    if mode == "x-accel-redirect":
+        # nginx streams the file from its internal location; Django only sends headers.
+        response = HttpResponse(content_type="video/mp4")
+        prefix = getattr(settings, "REMINDER_VIDEO_ACCEL_PREFIX", "/internal/reminder_videos/")
+        response["X-Accel-Redirect"] = f"{prefix.rstrip('/')}/{name}"
+        return response
+    if mode == "x-sendfile":
+        response = HttpResponse(content_type="video/mp4")
+        response["X-Sendfile"] = storage.path(name)
+        return response
+    return FileResponse(storage.open(name), content_type="video/mp4")
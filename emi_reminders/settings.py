@@ -77,6 +77,11 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # send_reminders --workers writes from several threads; wait for the lock instead of failing.
+        "OPTIONS": {"timeout": 20, "transaction_mode": "IMMEDIATE"},
+        # The default in-memory test database uses shared-cache table locks that ignore
+        # the timeout above, which breaks threaded tests. Use a throwaway file instead.
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
@@ -130,4 +135,120 @@ OPENAI_API_KEY="sk-proj-RMoFB0X7Lf_hcRlWilJdHXSC_RLzVQWUXqSnKSng310x2uygBH5yVvvO
 import os 
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+
+# Per-stage concurrency caps for send_reminders --workers (see core_reminders.utils.pipeline).
+REMINDER_STAGE_LIMITS = {
+    "script": 32,
+    "video": 4,
+    "whatsapp": 10,
+}
+
+# Rendered videos (core_reminders.utils.video_storage) are stored once per content hash
+# under YYYY/MM/DD/<hash prefix>/. Set STORAGES["reminder_videos"] to keep them elsewhere
+# (e.g. S3), and STORAGES["reminder_videos_archive"] for prune_videos --archive.
+# Local files are served from REMINDER_VIDEO_URL; with REMINDER_VIDEO_SENDFILE set to
+# "x-accel-redirect" (nginx, internal location at REMINDER_VIDEO_ACCEL_PREFIX) or
+# "x-sendfile" (Apache/lighttpd) the web server streams them instead of Django.
+REMINDER_VIDEO_URL = "/reminders/videos/"
+REMINDER_VIDEO_SENDFILE = ""
+REMINDER_VIDEO_ACCEL_PREFIX = "/internal/reminder_videos/"
+# prune_videos removes videos of reminders sent more than this many days ago.
+REMINDER_VIDEO_RETENTION_DAYS = 30
+
+# Rendered videos are reused for identical (script, voice, avatar, dimension) inputs.
+# Least-recently-used renders are deleted once the cache grows past this size.
+RENDER_CACHE_MAX_BYTES = 5 * 1024 ** 3
+
+# "full" renders one avatar video per customer. "composed" renders each template's
+# static text once and only the name/amount/date/loan-number slots per customer,
+# then joins the clips locally with ffmpeg (see core_reminders.utils.composition).
+REMINDER_VIDEO_MODE = "full"
+FFMPEG_BINARY = "ffmpeg"
+
+# When HeyGen times out, fails or is unavailable, render the reminder locally instead
+# (core_reminders.utils.local_render): synthesized speech over the avatar image or loop,
+# encoded with ffmpeg on up to `workers` cores (None = all of them) within `deadline` seconds.
+REMINDER_LOCAL_RENDER = {
+    "enabled": False,
+    "avatar": None,  # e.g. os.path.join(BASE_DIR, "assets", "avatar.png"); None = plain background
+    "workers": None,
+    "deadline": 120,
+}
+
+# Backend per pipeline stage (see core_reminders.providers). Swap in the fakes from
+# core_reminders.providers.fake to run or benchmark the pipeline without network access.
+REMINDER_PROVIDERS = {
+    "script": "core_reminders.providers.templates.TemplateScriptProvider",
+    "translate": "core_reminders.providers.openai.OpenAITranslationProvider",
+    "voice": "core_reminders.providers.elevenlabs.ElevenLabsVoiceProvider",
+    "video": {
+        "class": "core_reminders.providers.heygen.HeyGenVideoProvider",
+        # Calls per second; halved on 429/5xx and recovered gradually (core_reminders.utils.throttle).
+        "rate_limit": {"rate": 2, "burst": 4},
+        "circuit_breaker": {"failure_threshold": 0.5, "window": 20, "reset_after": 60},
+    },
+    # "core_reminders.providers.twilio.TwilioMessagingProvider" sends for real (TWILIO_* below).
+    "messaging": "core_reminders.providers.fake.FakeMessagingProvider",
+}
+
+# WhatsApp through Twilio. Delivery receipts are posted to TWILIO_STATUS_CALLBACK_URL, which
+# should be the public address of /reminders/webhooks/twilio/status/ (signatures are checked
+# against it). REMINDER_PUBLIC_BASE_URL turns site-relative video URLs into ones Twilio can fetch.
+TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID", "")
+TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN", "")
+TWILIO_WHATSAPP_FROM = os.environ.get("TWILIO_WHATSAPP_FROM", "")
+TWILIO_STATUS_CALLBACK_URL = os.environ.get("TWILIO_STATUS_CALLBACK_URL", "")
+REMINDER_PUBLIC_BASE_URL = os.environ.get("REMINDER_PUBLIC_BASE_URL", "")
+
+# WhatsApp dispatch stage (core_reminders.utils.dispatcher): REMINDER_STAGE_LIMITS["whatsapp"]
+# concurrent sends, at most sender_rate messages per second from each sender number, and
+# transient failures retried max_attempts times with jittered exponential backoff.
+REMINDER_DISPATCH = {
+    "senders": [],  # e.g. ["+14155550100", "+14155550101"]; empty = TWILIO_WHATSAPP_FROM
+    "sender_rate": 20,
+    "max_attempts": 4,
+}
+
+# Finished renders are downloaded on a separate pool so the poller never waits on a transfer.
+VIDEO_DOWNLOAD_CONCURRENCY = 4
+
+# Shared keep-alive HTTP pool for provider calls (core_reminders.utils.http).
+HTTP_POOL_MAXSIZE = 20
+HTTP_HOST_POOL_LIMITS = {
+    "api.heygen.com": 10,
+}
+
+# HeyGen completion callbacks (core_reminders.utils.webhooks), posted to /reminders/webhooks/heygen/.
+# While a secret is set, renders are expected to finish by callback and status
+# polling drops to a slow fallback sweep every VIDEO_POLL_FALLBACK_INTERVAL seconds.
+HEYGEN_WEBHOOK_SECRET = os.environ.get("HEYGEN_WEBHOOK_SECRET", "")
+VIDEO_POLL_FALLBACK_INTERVAL = 300
+
+# /reminders/metrics/ (Prometheus text). Scrapers must send "Authorization: Bearer <token>".
+# Unset, the endpoint is only served with DEBUG on and is a 404 otherwise.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+# Share of provider request/response bodies written to the log (all of them with DEBUG logging).
+PAYLOAD_LOG_SAMPLE_RATE = 0.01
+
+# send_reminders scheduling (core_reminders.utils.scheduler). Each run queues today's share
+# of every loan due within window_days: reminders go out lead_days before the due date,
+# and generation is spread over earlier days when a day would exceed daily_capacity
+# (None = measured from recent runs). With send_hours / sends_per_minute set, finished
+# videos wait as SCHEDULED and poll_videos releases them in slots.
+REMINDER_SCHEDULE = {
+    "lead_days": 3,
+    "window_days": 10,
+    "daily_capacity": None,
+    "send_hours": None,  # e.g. (9, 20): 09:00-20:00 in TIME_ZONE
+    "sends_per_minute": None,
+}
+
+# NACH and bounce reminders (core_reminders.utils.events), detected from loans changed since
+# the last send_reminders run. NACH reminders go to nach_active loans nach_lead_days before
+# the due date; bounce reminders go out as soon as a loan's bounce_count goes up.
+REMINDER_EVENTS = {
+    "nach_lead_days": 1,
+    "overlap_seconds": 60,
+}